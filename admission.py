@@ -0,0 +1,152 @@
+import collections
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class Busy(Exception):
+    """Raised when a request is not admitted; ``retry_after`` is in seconds.
+
+    ``session`` is the session that was turned away, when there is one.
+    """
+    def __init__(self, retry_after: float, reason: str, session: Optional[str] = None):
+        super().__init__(f"Busy ({reason}), retry in {math.ceil(retry_after)} s")
+        self.retry_after = retry_after
+        self.reason = reason
+        self.session = session
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average, and bursts of up to ``burst``."""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens; returns 0, or the seconds until they are available (taking none)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+class FairScheduler:
+    """Admission control and weighted fair queuing across sessions.
+
+    A request is rejected with Busy when its session's token bucket
+    (``rate`` per second, ``burst``) is empty, or when ``max_queue``
+    requests are already waiting. Admitted requests wait in a single queue
+    ordered by self-clocked weighted fair queuing: each gets a virtual
+    finish time of ``max(virtual now, session's last finish) + cost /
+    weight``, so a session with a backlog does not delay sessions that
+    only ask now and then. ``concurrency`` requests run at once, which
+    leaves room for the micro-batcher or decode scheduler behind it to
+    batch them.
+    """
+    def __init__(self, concurrency: int = 16, max_queue: int = 64, rate: float = 1.0, burst: float = 5,
+                 max_sessions: int = 10000, window: int = 10000):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.rate = rate
+        self.burst = burst
+        self.max_sessions = max_sessions
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, str, Callable, Future, float]] = []
+        self._sequence = itertools.count()
+        self._buckets: "collections.OrderedDict[str, TokenBucket]" = collections.OrderedDict()
+        self._last_finish: Dict[str, float] = {}
+        self._virtual = 0.0
+        self._running = 0
+        self._service = 0.0
+        self._waits: Deque[float] = collections.deque(maxlen=window)
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_queue = 0
+        for n in range(concurrency):
+            threading.Thread(target=self._work, name=f"fair-scheduler-{n}", daemon=True).start()
+
+    def _bucket(self, session: str) -> TokenBucket:
+        bucket = self._buckets.get(session)
+        if bucket is None:
+            bucket = self._buckets[session] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(session)
+        return bucket
+
+    def retry_after(self) -> float:
+        """Estimate the seconds until the queue has room, from the mean service time."""
+        return max(1.0, (len(self._heap) + self._running) / self.concurrency * (self._service or 1.0))
+
+    def queue_depth(self) -> int:
+        """Requests admitted and waiting to run."""
+        return len(self._heap)
+
+    def submit(self, session: str, fn: Callable[[], T], cost: float = 1.0, weight: float = 1.0) -> Future:
+        """Admit ``fn()`` for a session, or raise Busy; the future resolves to its result."""
+        with self._cond:
+            if len(self._heap) >= self.max_queue:
+                self.rejected_queue += 1
+                raise Busy(self.retry_after(), "queue full", session)
+            wait = self._bucket(session).take(cost)
+            if wait:
+                self.rejected_rate += 1
+                raise Busy(wait, "rate limit", session)
+            finish = max(self._virtual, self._last_finish.get(session, 0.0)) + cost / weight
+            self._last_finish[session] = finish
+            future = Future()
+            heapq.heappush(self._heap, (finish, next(self._sequence), session, fn, future, time.perf_counter()))
+            self.admitted += 1
+            self._cond.notify()
+        return future
+
+    def run(self, session: str, fn: Callable[[], T], cost: float = 1.0, weight: float = 1.0) -> T:
+        """Admit ``fn()`` for a session and wait for its result; raises Busy if not admitted."""
+        return self.submit(session, fn, cost, weight).result()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                finish, _, session, fn, future, enqueued = heapq.heappop(self._heap)
+                self._virtual = finish
+                # A session with nothing left queued starts afresh from virtual now
+                if self._last_finish.get(session) == finish:
+                    del self._last_finish[session]
+                self._running += 1
+                self._waits.append(time.perf_counter() - enqueued)
+            started = time.perf_counter()
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(fn())
+            except BaseException as e:
+                logger.error(f"Scheduled request failed: {str(e)}")
+                future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    elapsed = time.perf_counter() - started
+                    self._service = elapsed if not self._service else 0.9 * self._service + 0.1 * elapsed
+
+    def stats(self) -> dict:
+        """Get queue depth, admission counters and queue wait percentiles."""
+        with self._cond:
+            waits = sorted(self._waits)
+            queued, running = len(self._heap), self._running
+        p99 = waits[min(len(waits) - 1, int(0.99 * len(waits)))] if waits else 0.0
+        return {"queued": queued, "running": running, "admitted": self.admitted,
+                "rejected_rate": self.rejected_rate, "rejected_queue": self.rejected_queue,
+                "wait_ms_p99": 1000 * p99}
@@ -1,34 +1,239 @@
 import streamlit as st
 import sqlite3
-from transformers import pipeline
+import torch
+from transformers import StoppingCriteriaList
+import concurrent.futures
+import contextlib
+import functools
+import importlib.util
+import math
 import logging
+import time
 import re
 import os
+import uuid
+from typing import List, NamedTuple, Optional
+
+import autotune
+import config
+from admission import Busy, FairScheduler
+from db_pool import ConnectionPool
+from decode_scheduler import DecodeScheduler
+from batcher import MicroBatcher
+from degradation import BASE, CACHE_ONLY, SMALL, DegradationRouter
+from cancellation import CancelStoppingCriteria, CancelToken, GenerationCancelled, GenerationJob, JobRunner
+from engine import T5Engine
+from inference_client import InferenceClient, ServerNotReady
+from model_loader import ModelLoader, ProgressCallback
+from prompt import get_prompt_encoder, prompt_fingerprint
+from schema import get_schema
+from intents import IntentMatcher, intent_slots
+from semantic_cache import SemanticCache, load_entities
+from singleflight import SingleFlight
+from sql_cache import SQLCache, normalize_question, normalize_sql, schema_fingerprint
+from sql_grammar import StatementStoppingCriteria, get_sql_constraint, statement_end
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@st.cache_resource
-def load_model():
-    """Load and cache the NLP model for text-to-SQL conversion."""
+@st.cache_resource(show_spinner=False)
+def load_model(backend: str = config.BACKEND, _progress: Optional[ProgressCallback] = None,
+               draft_model: str = config.DRAFT_MODEL, model_name: str = config.MODEL_NAME,
+               threads: Optional[int] = None):
+    """Load and cache the NLP model for text-to-SQL conversion.
+
+    ``backend`` selects the inference runtime: "torch" builds the lean
+    T5Engine, "torch-int8" additionally applies dynamic int8 quantization to
+    its Linear layers, and "onnx" runs int8 quantized ONNX
+    graphs through onnxruntime, exporting them on first use and reusing
+    them afterwards. ``draft_model`` (e.g. "google/flan-t5-small") turns on
+    speculative greedy decoding with that draft on the torch backends.
+    ``model_name`` defaults to NL2SQL_MODEL. ``threads`` sets the ONNX
+    Runtime intra-op threads (default NL2SQL_NUM_THREADS, else the CPU
+    quota); torch threads are process-wide, see load_default_model().
+    ``_progress(fraction, stage)`` is called as loading advances (the
+    leading underscore keeps it out of the cache key).
+    """
     try:
-        model = pipeline("text2text-generation", 
-                        model="google/flan-t5-base",
-                        max_length=256)
+        if draft_model and backend not in ("torch", "torch-int8"):
+            raise ValueError(f"Speculative decoding needs a torch backend, not {backend}")
+        if backend == "onnx" and (config.DECODING == "beam" or config.CANDIDATES > 1):
+            raise ValueError("Beam search and multiple candidates need a torch backend, not onnx")
+        if backend == "onnx":
+            from onnx_backend import load_onnx_pipeline
+            model = load_onnx_pipeline(model_name, config.ONNX_DIR, progress=_progress,
+                                       threads=threads or config.NUM_THREADS or autotune.default_threads(),
+                                       seed=config.SEED)
+        elif backend in ("torch", "torch-int8"):
+            model = T5Engine.from_pretrained(model_name, quantize=backend == "torch-int8",
+                                             progress=_progress, draft_model_name=draft_model or None,
+                                             draft_tokens=config.DRAFT_TOKENS)
+        else:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        # Tokenize the prompt pieces once, at load time
+        if _progress:
+            _progress(0.95, "Preparing the prompt")
+        get_prompt_encoder(model.tokenizer)
+        logger.info(f"Loaded {model_name} with the {backend} backend"
+                    + (f" and draft model {draft_model}" if draft_model else ""))
         return model
     except Exception as e:
         logger.error(f"Error loading model: {str(e)}")
         raise
 
+def get_host_profile(progress: Optional[ProgressCallback] = None, recalibrate: bool = False) -> dict:
+    """Get the backend, thread count and batch size calibrated for this host, calibrating on first use."""
+    backends = [backend for backend in config.AUTOTUNE_BACKENDS
+                if backend != "onnx" or importlib.util.find_spec("onnxruntime")]
+    if config.DRAFT_MODEL:
+        # Speculative decoding needs a torch backend
+        backends = [backend for backend in backends if backend in ("torch", "torch-int8")]
+    thread_counts = [config.NUM_THREADS] if config.NUM_THREADS else autotune.thread_candidates(autotune.cpu_quota())
+    signature = autotune.host_signature(config.MODEL_NAME, backends, thread_counts, config.AUTOTUNE_BATCH_SIZES)
+
+    def load(backend, threads):
+        # One calibration model in memory at a time
+        load_model.clear()
+        return load_model(backend, draft_model="", threads=threads)
+
+    def run_calibration():
+        try:
+            return autotune.calibrate(load, lambda model, questions, batch_size: generate_batch(
+                                          model, questions, "greedy", batch_size),
+                                      backends, thread_counts, config.AUTOTUNE_BATCH_SIZES, progress=progress)
+        finally:
+            load_model.clear()
+
+    return autotune.get_profile(config.PROFILE_PATH, signature, run_calibration, recalibrate)
+
+def load_default_model(progress: Optional[ProgressCallback] = None, backend: Optional[str] = None):
+    """Load the default model with the backend, threads and batch size tuned for this host.
+
+    With NL2SQL_AUTOTUNE on and no ``backend`` given, the host profile
+    chooses the backend, intra-op threads and batch size and they are
+    written back to ``config``. Otherwise torch uses NL2SQL_NUM_THREADS, or
+    as many threads as the CPU quota allows rather than one per host core.
+    """
+    if config.AUTOTUNE and backend is None:
+        profile = get_host_profile(progress)
+        config.BACKEND = profile["backend"]
+        config.NUM_THREADS = profile["threads"]
+        config.BATCH_MAX_SIZE = profile["batch_size"]
+    torch.set_num_threads(config.NUM_THREADS or autotune.default_threads())
+    return load_model(backend or config.BACKEND, _progress=progress, draft_model=config.DRAFT_MODEL,
+                      model_name=config.MODEL_NAME)
+
+@st.cache_resource
+def get_model_loader() -> ModelLoader:
+    """Get the process-wide background loader for the default model, starting it."""
+    return ModelLoader(load_default_model).start()
+
+@st.cache_resource
+def get_batcher() -> MicroBatcher:
+    """Get the process-wide micro-batcher in front of the default model."""
+    # Items are (question, cancel token) pairs
+    return MicroBatcher(lambda items, decoding: generate_batch(get_model_loader().get(), [q for q, _ in items],
+                                                               decoding, config.BATCH_MAX_SIZE,
+                                                               [cancel for _, cancel in items]),
+                        max_batch_size=config.BATCH_MAX_SIZE,
+                        max_wait_ms=config.BATCH_MAX_WAIT_MS)
+
+@st.cache_resource
+def get_inference_client() -> Optional[InferenceClient]:
+    """Get the shared inference server client, or None when the model runs in-process."""
+    if not config.INFERENCE_URL:
+        return None
+    return InferenceClient(config.INFERENCE_URL, timeout=config.INFERENCE_TIMEOUT)
+
 def get_db_path():
     """Get the correct database path."""
-    # Get the directory containing the current script
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    # Go up one level to the parent directory if needed
-    parent_dir = os.path.dirname(current_dir)
-    db_path = os.path.join(current_dir, 'database.db')
-    return db_path
+    return config.DB_PATH
+
+@st.cache_resource
+def get_db_pool() -> ConnectionPool:
+    """Get the shared pool of read-only database connections."""
+    return ConnectionPool(get_db_path(), size=config.DB_POOL_SIZE)
+
+@st.cache_resource
+def get_admission() -> FairScheduler:
+    """Get the process-wide admission controller in front of the model."""
+    return FairScheduler(concurrency=config.ADMISSION_CONCURRENCY, max_queue=config.ADMISSION_QUEUE_SIZE,
+                         rate=config.SESSION_RATE, burst=config.SESSION_BURST)
+
+@st.cache_resource
+def get_small_model_loader() -> Optional[ModelLoader]:
+    """Get the background loader for the small fallback model, or None without one."""
+    if not config.SMALL_MODEL or get_inference_client():
+        return None
+    default_loader = get_model_loader()
+
+    def load(progress):
+        # After the default model, so it neither slows nor skews its calibration, on the tuned backend
+        progress(0.0, "Waiting for the default model")
+        default_loader.get()
+        return load_model(config.BACKEND, _progress=progress, draft_model="", model_name=config.SMALL_MODEL)
+
+    return ModelLoader(load).start()
+
+def queue_depth() -> int:
+    """Questions waiting for the model in this process."""
+    return get_admission().queue_depth() if config.ADMISSION else 0
+
+@st.cache_resource
+def get_router() -> DegradationRouter:
+    """Get the process-wide SLO degradation router for the default model."""
+    def has_small() -> bool:
+        loader = get_small_model_loader()
+        return loader is not None and loader.ready
+    
+    return DegradationRouter(config.SLO_MS, queue_depth, config.DEGRADE_QUEUE_DEPTH, has_small,
+                             cooldown_s=config.DEGRADE_COOLDOWN_S)
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """Get the shared runner for cancellable generation jobs."""
+    return JobRunner()
+
+@st.cache_resource
+def get_question_flight() -> SingleFlight:
+    """Get the shared coalescer for in-flight question generation."""
+    return SingleFlight()
+
+@st.cache_resource
+def get_query_flight() -> SingleFlight:
+    """Get the shared coalescer for in-flight SQL execution."""
+    return SingleFlight()
+
+def cache_fingerprint() -> str:
+    """Fingerprint what cached SQL was generated from: the schema, the prompt and the model."""
+    return schema_fingerprint(get_db_path(), "\n".join([prompt_fingerprint(), config.MODEL_NAME]))
+
+@st.cache_resource
+def get_sql_cache() -> Optional[SQLCache]:
+    """Get the shared question-to-SQL cache, or None when caching is disabled."""
+    if not config.CACHE_ENABLED:
+        return None
+    return SQLCache(config.CACHE_PATH,
+                    fingerprint=cache_fingerprint,
+                    capacity=config.CACHE_SIZE,
+                    ttl=config.CACHE_TTL)
+
+@st.cache_resource
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Get the shared near-duplicate question cache, or None when disabled."""
+    if not config.SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticCache(lambda: load_entities(get_db_path(), slots=intent_slots()),
+                         threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                         max_entries=config.SEMANTIC_CACHE_SIZE,
+                         fingerprint=cache_fingerprint)
+
+@st.cache_resource
+def get_intent_matcher() -> IntentMatcher:
+    """Get the shared template question matcher."""
+    return IntentMatcher(lambda: load_entities(get_db_path(), slots=intent_slots()),
+                         lambda: get_schema(get_db_path()))
 
 def clean_sql_query(sql_query: str) -> str:
     """Clean and validate the generated SQL query."""
@@ -42,14 +247,19 @@ def clean_sql_query(sql_query: str) -> str:
         if any(word in sql_query.upper() for word in blacklist):
             raise ValueError("Invalid SQL operation detected")
         
-        # Force simple queries for our simple schema
+        # Constrained decoding only produces SELECT statements over the live
+        # schema; anything else comes from unconstrained decoding and is rejected
         if not sql_query.upper().startswith("SELECT"):
-            sql_query = f"SELECT * FROM Departments WHERE {sql_query}"
+            raise ValueError("Generated text is not a SELECT query")
         
-        # Remove any JOINs or complex queries
-        if "JOIN" in sql_query.upper():
-            # Simplify to basic query
-            sql_query = "SELECT * FROM Departments WHERE Name = 'Sales';"
+        # Drop anything decoded after the end of the first statement. Output
+        # cut off inside a literal, or without the ";" the grammar always
+        # ends with, ran out of tokens and is not the query the model meant
+        end = statement_end(sql_query)
+        if end != -1:
+            sql_query = sql_query[:end]
+        elif sql_query.count("'") % 2 or config.CONSTRAINED_DECODING:
+            raise ValueError("Generated SQL is incomplete")
         
         # Ensure proper query termination
         sql_query = sql_query.rstrip(';') + ';'
@@ -59,66 +269,399 @@ def clean_sql_query(sql_query: str) -> str:
         logger.error(f"Error in clean_sql_query: {str(e)}")
         raise ValueError(f"Failed to clean SQL query: {str(e)}")
 
-def generate_sql_query(nl_query: str, model) -> str:
+DETERMINISTIC_DECODING = ("greedy", "beam")
+
+MODEL_LOADING_MESSAGE = "The NLP model is still loading. Please try again in a moment."
+
+GENERATION_CANCELLED = "Generation cancelled"
+
+DEGRADED_MESSAGE = "Only template and cached questions are being answered at the moment"
+
+def get_generation_kwargs(decoding: str = config.DECODING, candidates: Optional[int] = None) -> dict:
+    """Get the ``generate`` arguments for a decoding strategy.
+
+    With more than one candidate per question (``config.CANDIDATES`` by
+    default), greedy decoding becomes a beam search returning the
+    ``candidates`` best beams.
+    """
+    if candidates is None:
+        candidates = config.CANDIDATES
+    if decoding == "greedy" and candidates == 1:
+        return {"do_sample": False, "num_beams": 1}
+    if decoding in ("greedy", "beam"):
+        kwargs = {"do_sample": False, "num_beams": max(config.NUM_BEAMS, candidates)}
+    elif decoding == "sample":
+        kwargs = {
+            "temperature": 0.3,  # Lower temperature for more focused outputs
+            "do_sample": True,
+            "top_p": 0.8,
+        }
+    else:
+        raise ValueError(f"Unknown decoding strategy: {decoding}")
+    if candidates > 1:
+        kwargs["num_return_sequences"] = candidates
+    return kwargs
+
+def get_token_budget(question_tokens: int) -> int:
+    """Get the ``max_new_tokens`` budget for a question of the given length."""
+    budget = config.TOKEN_BUDGET_BASE + config.TOKEN_BUDGET_PER_TOKEN * question_tokens
+    return min(config.MAX_NEW_TOKENS, int(budget))
+
+class SQLResult(NamedTuple):
+    """Outcome of generating SQL for a single question.
+
+    ``cacheable`` is True only when the SQL came from deterministic decoding,
+    i.e. the same question is guaranteed to produce the same SQL again.
+    ``tier`` names what answered it: "template", "cache", "small" or "base".
+    ``valid`` is True when the SQL is known to compile in SQLite: it passed
+    ``EXPLAIN``, or it came from a template or a cache of such SQL.
+    """
+    sql: Optional[str]
+    error: Optional[str]
+    cacheable: bool = False
+    tier: str = ""
+    valid: bool = False
+
+def pick_candidate(texts: List[str], cacheable: bool) -> SQLResult:
+    """Get the first candidate that cleans up and compiles in SQLite.
+
+    Candidates are checked with ``EXPLAIN`` on a pooled connection, which
+    compiles the statement without running it. If none compiles, the first
+    cleaned candidate is returned (not cacheable) so the execution error is
+    reported as before.
+    """
+    cleaned = []
+    error = None
+    for text in texts:
+        try:
+            cleaned.append(clean_sql_query(text))
+        except ValueError as e:
+            error = error or str(e)
+    pool = get_db_pool()
+    for n, sql_query in enumerate(cleaned):
+        if pool.is_valid(sql_query):
+            if n:
+                logger.info(f"Picked SQL candidate {n + 1} of {len(texts)}")
+            return SQLResult(sql_query, None, cacheable, valid=True)
+    if cleaned:
+        return SQLResult(cleaned[0], None, False)
+    return SQLResult(None, error)
+
+def generate_sql_query(nl_query: str, model=None, cache: Optional[SQLCache] = None,
+                       semantic_cache: Optional[SemanticCache] = None,
+                       intents: Optional[IntentMatcher] = None,
+                       wait_for_model: bool = True, cancel: Optional[CancelToken] = None,
+                       session: Optional[str] = None) -> str:
     """Convert natural language query to SQL using the NLP model."""
     try:
-        # More specific context with simple examples matching our schema
-        context = """
-        Convert to simple SQL. Use table 'Departments' with columns: Name, Manager
-        
-        Examples:
-        Question: Who manages Sales?
-        SQL: SELECT Manager FROM Departments WHERE Name = 'Sales';
-        
-        Question: Show all departments
-        SQL: SELECT * FROM Departments;
-        
-        Question: List department names
-        SQL: SELECT Name FROM Departments;
+        def generate() -> SQLResult:
+            return generate_sql_queries([nl_query], model, cache=cache, semantic_cache=semantic_cache,
+                                        intents=intents, wait_for_model=wait_for_model, cancel=cancel,
+                                        session=session)[0]
         
-        Question: Find manager of Marketing
-        SQL: SELECT Manager FROM Departments WHERE Name = 'Marketing';
+        if config.COALESCING:
+            # Questions that normalize alike share a cache entry, so they can share a generation too
+            key = (normalize_question(nl_query), id(model), wait_for_model)
+            try:
+                result = get_question_flight().do(key, generate)
+            except Busy as e:
+                if e.session == session:
+                    raise
+                # The shared generation was turned away for another session; this one tries on its own
+                result = generate()
+            if result.error == GENERATION_CANCELLED and not (cancel and cancel.cancelled):
+                # The shared generation was cancelled by another session; this one still wants it
+                result = generate()
+        else:
+            result = generate()
+        if result.error == GENERATION_CANCELLED:
+            raise GenerationCancelled()
+        if result.error == DEGRADED_MESSAGE:
+            raise Busy(config.DEGRADE_COOLDOWN_S, "degraded to templates and caches")
+        if result.error:
+            raise ValueError(result.error)
         
-        Current question: """
-        
-        full_prompt = context + nl_query
-        
-        output = model(full_prompt, 
-                      temperature=0.3,  # Lower temperature for more focused outputs
-                      do_sample=True,
-                      top_p=0.8,
-                      max_length=128)
+        logger.info(f"Generated SQL query: {result.sql}")
+        return result.sql
+    
+    except GenerationCancelled:
+        logger.info(f"Cancelled SQL generation for: {nl_query}")
+        raise
+    except Busy as e:
+        logger.info(f"Not admitted: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error generating SQL query: {str(e)}")
+        raise
+
+def generate_sql_queries(nl_queries: List[str], model=None, batch_size: Optional[int] = None,
+                         decoding: str = config.DECODING,
+                         cache: Optional[SQLCache] = None,
+                         semantic_cache: Optional[SemanticCache] = None,
+                         intents: Optional[IntentMatcher] = None,
+                         wait_for_model: bool = True,
+                         cancel: Optional[CancelToken] = None,
+                         session: Optional[str] = None) -> List[SQLResult]:
+    """Convert a list of questions to SQL with batched generation.
+
+    Each question is tokenized on its own and joined to the cached few-shot
+    prefix ids, then padded and run through a single ``generate`` call per
+    batch. An explicit ``batch_size`` always runs fixed padded batches of
+    that size; without one, greedy questions go through the continuous
+    batching decode scheduler when NL2SQL_CONTINUOUS_BATCHING is on, and
+    others are batched up to NL2SQL_BATCH_MAX_SIZE. Returns one SQLResult
+    per input, in order;
+    a failure on one question does not affect the others. ``decoding``
+    selects the strategy from get_generation_kwargs().
+
+    Template questions recognised by ``intents`` are answered first, then
+    questions found in ``cache`` or close paraphrases found in
+    ``semantic_cache``; cacheable generated results are stored in both.
+    ``model`` may be None, in which case questions that need a model go to
+    the shared inference server when NL2SQL_INFERENCE_URL is set, and to the
+    background-loaded default model otherwise; with ``wait_for_model`` off,
+    those questions get an error instead of waiting while it still loads.
+    Setting ``cancel`` stops local generation between decoder steps; the
+    questions it stopped get the GENERATION_CANCELLED error. With a
+    ``session``, questions that need the model first go through admission
+    control, which raises Busy instead of queueing without limit. For the
+    default model, the degradation router picks the tier that answers
+    them and records every answer's tier, latency and SQL validity.
+    """
+    results: List[Optional[SQLResult]] = [None] * len(nl_queries)
+    # Seconds each answer took, timed per tier: a lookup for templates and caches, the generation for models
+    latencies = [0.0] * len(nl_queries)
+    pending = []
+    
+    def lookup(nl_query: str) -> Optional[SQLResult]:
+        intent = intents.match(nl_query) if intents else None
+        if intent:
+            return SQLResult(intent.sql, None, True, "template", valid=True)
+        cached_sql = cache.get(nl_query) if cache else None
+        if cached_sql:
+            return SQLResult(cached_sql, None, True, "cache", valid=True)
+        # A paraphrase hit is only as good as the similarity threshold, so it
+        # is not reported as cacheable; only SQL that compiled was cached
+        similar_sql = semantic_cache.get(nl_query) if semantic_cache else None
+        if similar_sql:
+            return SQLResult(similar_sql, None, False, "cache", valid=True)
+        return None
+    
+    for i, nl_query in enumerate(nl_queries):
+        if not nl_query or not nl_query.strip():
+            results[i] = SQLResult(None, "Empty question")
+            continue
+        started = time.perf_counter()
+        results[i] = lookup(nl_query)
+        latencies[i] = time.perf_counter() - started
+        if results[i] is None:
+            pending.append(i)
+    
+    router = get_router() if config.DEGRADATION and model is None else None
+    tier = router.choose() if router and pending else BASE
+    if tier == CACHE_ONLY:
+        for i in pending:
+            results[i] = SQLResult(None, DEGRADED_MESSAGE, False, CACHE_ONLY)
+    elif pending:
+        # The small model is only chosen once it has loaded
+        tier_model = get_small_model_loader().model if tier == SMALL else model
         
-        sql_query = clean_sql_query(output[0]['generated_text'])
+        def generate():
+            if tier_model is None and get_inference_client():
+                generate_remote(get_inference_client(), nl_queries, pending, results, decoding)
+            else:
+                generate_local(tier_model, nl_queries, pending, results, batch_size, decoding, wait_for_model,
+                               cancel)
         
-        # Ensure the query matches our simple schema
-        if "Who" in nl_query and "manager" in nl_query.lower():
-            department = re.search(r'(?:of\s+)(\w+)', nl_query)
-            if department:
-                dept_name = department.group(1)
-                sql_query = f"SELECT Manager FROM Departments WHERE Name = '{dept_name}';"
+        started = time.perf_counter()
+        if session is not None and config.ADMISSION:
+            get_admission().run(session, generate, cost=len(pending))
+        else:
+            generate()
+        generation_latency = time.perf_counter() - started
         
-        logger.info(f"Generated SQL query: {sql_query}")
-        return sql_query
+        for i in pending:
+            latencies[i] += generation_latency
+            # Small-model answers are not cached, so the base model answers them again after the peak
+            results[i] = results[i]._replace(tier=tier, cacheable=results[i].cacheable and tier == BASE)
+            if results[i].sql and results[i].cacheable:
+                if cache:
+                    cache.put(nl_queries[i], results[i].sql)
+                if semantic_cache:
+                    semantic_cache.put(nl_queries[i], results[i].sql)
     
+    if router:
+        for result, latency in zip(results, latencies):
+            if result.tier and result.error not in (MODEL_LOADING_MESSAGE, GENERATION_CANCELLED):
+                router.record(result.tier, latency, result.valid)
+    return results
+
+def generate_remote(client: InferenceClient, nl_queries: List[str], pending: List[int],
+                    results: List[Optional[SQLResult]], decoding: str):
+    """Fill in results for the pending questions from the shared inference server."""
+    try:
+        remote = client.generate([nl_queries[i] for i in pending], decoding)
+        for i, result in zip(pending, remote):
+            results[i] = SQLResult(result["sql"], result["error"], result["cacheable"],
+                                   valid=result.get("valid", False))
+    except ServerNotReady:
+        for i in pending:
+            results[i] = SQLResult(None, MODEL_LOADING_MESSAGE)
     except Exception as e:
-        logger.error(f"Error generating SQL query: {str(e)}")
-        raise
+        for i in pending:
+            results[i] = SQLResult(None, f"Inference server unavailable: {str(e)}")
+
+def generate_local(model, nl_queries: List[str], pending: List[int], results: List[Optional[SQLResult]],
+                   batch_size: Optional[int], decoding: str, wait_for_model: bool,
+                   cancel: Optional[CancelToken] = None):
+    """Fill in results for the pending questions with an in-process model.
+
+    An explicit ``batch_size`` runs fixed batches of that size. Otherwise
+    greedy questions for a T5Engine go through its continuous-batching
+    decode scheduler; other questions for the default model go through the
+    shared micro-batcher, so concurrent sessions are batched together.
+    """
+    questions = [nl_queries[i] for i in pending]
+    default_model = model is None
+    if default_model:
+        loader = get_model_loader()
+        try:
+            model = loader.get() if wait_for_model else loader.model
+        except Exception as e:
+            for i in pending:
+                results[i] = SQLResult(None, f"Model unavailable: {str(e)}")
+            return
+        if model is None:
+            for i in pending:
+                results[i] = SQLResult(None, MODEL_LOADING_MESSAGE)
+            return
+    if batch_size is None and uses_continuous_batching(model, decoding):
+        generated = generate_continuous(model, questions, cancel)
+    elif batch_size is None and default_model and config.MICRO_BATCHING:
+        generated = get_batcher().submit_many([(question, cancel) for question in questions], decoding)
+    else:
+        generated = generate_batch(model, questions, decoding, batch_size or config.BATCH_MAX_SIZE,
+                                   [cancel] * len(questions))
+    for i, result in zip(pending, generated):
+        results[i] = result
+
+def uses_continuous_batching(model, decoding: str) -> bool:
+    """Whether questions for this model and decoding go through the decode scheduler."""
+    # Speculative decoding already checks several tokens per pass, one sequence at a time
+    return (config.CONTINUOUS_BATCHING and decoding == "greedy" and config.CANDIDATES == 1
+            and isinstance(model, T5Engine) and model.draft is None)
+
+@functools.lru_cache(maxsize=None)
+def get_decode_scheduler(model: T5Engine) -> DecodeScheduler:
+    """Get the continuous-batching decode scheduler for a model, starting it on first use."""
+    return DecodeScheduler(model.model, max_batch_size=config.BATCH_MAX_SIZE)
+
+def generate_continuous(model: T5Engine, questions: List[str],
+                        cancel: Optional[CancelToken] = None) -> List[SQLResult]:
+    """Generate SQL for questions with greedy decoding on the model's decode scheduler.
+
+    Each question gets its own token budget and leaves the running batch as
+    soon as it has finished its statement.
+    """
+    tokenizer = model.tokenizer
+    prompt_encoder = get_prompt_encoder(tokenizer)
+    sql_constraint = get_sql_constraint(tokenizer, get_schema(get_db_path()))
+    allowed_tokens = sql_constraint if config.CONSTRAINED_DECODING else None
+    scheduler = get_decode_scheduler(model)
+    futures = []
+    prompts, question_lengths = prompt_encoder.encode_with_lengths(questions)
+    for input_ids, question_tokens in zip(prompts, question_lengths):
+        budget = get_token_budget(question_tokens)
+        futures.append(scheduler.submit(input_ids, budget, allowed_tokens,
+                                        stop=lambda ids: statement_end(sql_constraint.decode(ids)) != -1,
+                                        cancel=cancel))
+    results = []
+    for future in futures:
+        try:
+            text = tokenizer.decode(future.result(), skip_special_tokens=True, clean_up_tokenization_spaces=False)
+        except GenerationCancelled:
+            results.append(SQLResult(None, GENERATION_CANCELLED))
+            continue
+        except Exception as e:
+            results.append(SQLResult(None, f"Generation failed: {str(e)}"))
+            continue
+        results.append(pick_candidate([text], True))
+    return results
+
+def generate_batch(model, questions: List[str], decoding: str = config.DECODING,
+                   batch_size: int = 16, cancels: Optional[List[Optional[CancelToken]]] = None) -> List[SQLResult]:
+    """Generate SQL for questions with a model, as padded batches of ``batch_size``.
+
+    A batch stops between decoder steps once the ``cancels`` tokens of all
+    its questions are set.
+    """
+    results: List[Optional[SQLResult]] = [None] * len(questions)
+    tokenizer = model.tokenizer
+    prompt_encoder = get_prompt_encoder(tokenizer)
+    generation_kwargs = get_generation_kwargs(decoding)
+    sql_constraint = get_sql_constraint(tokenizer, get_schema(get_db_path()))
+    if config.CONSTRAINED_DECODING:
+        generation_kwargs["prefix_allowed_tokens_fn"] = sql_constraint
+    stopping_criteria = [StatementStoppingCriteria(sql_constraint.decode, tokenizer.eos_token_id)]
+    cacheable = decoding in DETERMINISTIC_DECODING
+    for start in range(0, len(questions), batch_size):
+        chunk = range(start, min(start + batch_size, len(questions)))
+        tokens = [cancels[i] for i in chunk] if cancels else []
+        # Only a batch whose every question can be cancelled can stop early
+        cancellable = bool(tokens) and all(token is not None for token in tokens)
+        if cancellable and all(token.cancelled for token in tokens):
+            for i in chunk:
+                results[i] = SQLResult(None, GENERATION_CANCELLED)
+            continue
+        generation_kwargs["stopping_criteria"] = StoppingCriteriaList(
+            stopping_criteria + ([CancelStoppingCriteria(tokens)] if cancellable else []))
+        try:
+            prompts, question_lengths = prompt_encoder.encode_with_lengths([questions[i] for i in chunk])
+            inputs = prompt_encoder.pad(prompts).to(model.device)
+            question_tokens = max(question_lengths)
+            # Sampling gets a fixed seed so its output is reproducible for a given batch; the
+            # global RNG is forked so other torch code in the process keeps its own sequence
+            sampling = decoding == "sample"
+            with torch.inference_mode(), (torch.random.fork_rng() if sampling else contextlib.nullcontext()):
+                if sampling:
+                    torch.manual_seed(config.SEED)
+                output_ids = model.generate(**inputs, **generation_kwargs,
+                                            max_new_tokens=get_token_budget(question_tokens))
+            texts = tokenizer.batch_decode(output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+        except Exception as e:
+            logger.error(f"Error generating SQL batch: {str(e)}")
+            for i in chunk:
+                results[i] = SQLResult(None, f"Generation failed: {str(e)}")
+            continue
+        
+        # Candidates for a question are consecutive; backends without
+        # num_return_sequences return one per question
+        per_question = len(texts) // len(chunk)
+        for n, i in enumerate(chunk):
+            if cancels and cancels[i] is not None and cancels[i].cancelled:
+                results[i] = SQLResult(None, GENERATION_CANCELLED)
+            else:
+                results[i] = pick_candidate(texts[n * per_question:(n + 1) * per_question], cacheable)
+    
+    logger.info(f"Generated SQL for {len(questions)} questions in batches of {batch_size}")
+    return results
 
 def execute_sql_query(query: str):
     """Execute the SQL query and return results."""
-    conn = None
+    if config.COALESCING:
+        return get_query_flight().do(normalize_sql(query), lambda: run_sql_query(query))
+    return run_sql_query(query)
+
+def run_sql_query(query: str):
+    """Run the SQL query on a pooled connection and return results."""
     try:
-        db_path = get_db_path()
-        logger.info(f"Connecting to database at: {db_path}")
-        
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(query)
-        
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        results = cursor.fetchall()
+        with get_db_pool().connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(query)
+            
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            results = cursor.fetchall()
         
         return columns, results
     
@@ -134,10 +677,6 @@ def execute_sql_query(query: str):
     except Exception as e:
         logger.error(f"Error executing query: {str(e)}")
         return None, f"An error occurred: {str(e)}"
-    
-    finally:
-        if conn:
-            conn.close()
 
 def main():
     st.set_page_config(page_title="SQL Query Generator", layout="wide")
@@ -161,13 +700,61 @@ def main():
     if 'error_count' not in st.session_state:
         st.session_state.error_count = 0
     
-    try:
-        with st.spinner("Loading the NLP model..."):
-            model = load_model()
-    except Exception as e:
-        st.error("Failed to load the model. Please refresh the page or contact support.")
-        logger.error(f"Model loading error: {str(e)}")
-        return
+    # Start loading the model in the background; the page renders meanwhile.
+    # With a shared inference server, only its readiness is shown
+    loader = None
+    client = get_inference_client()
+    if client:
+        readiness = client.readiness()
+        st.sidebar.write(f"Inference server: {'ready' if readiness.get('ready') else readiness.get('stage')}")
+    else:
+        loader = get_model_loader()
+        if loader.error:
+            st.error("Failed to load the model. Please refresh the page or contact support.")
+        st.sidebar.write(f"Model: {'ready' if loader.ready else loader.stage}")
+        if loader.ready and getattr(loader.model, "draft", None) is not None:
+            speculative_stats = loader.model.speculative_stats()
+            st.sidebar.write(f"Speculative decoding: {speculative_stats['accepted_per_step']:.2f} "
+                             f"draft tokens accepted per step")
+        if loader.ready and config.AUTOTUNE:
+            st.sidebar.write(f"Tuned for this host: {config.BACKEND}, {config.NUM_THREADS} threads, "
+                             f"batch size {config.BATCH_MAX_SIZE}")
+        # Created once the model has loaded, so the batcher gets the tuned batch size
+        if loader.ready and config.MICRO_BATCHING:
+            batch_stats = get_batcher().stats()
+            st.sidebar.write(f"Micro-batching: mean batch {batch_stats['mean_batch_size']:.1f}, "
+                             f"queue depth {batch_stats['queue_depth']}, "
+                             f"p99 wait {batch_stats['wait_ms_p99']:.0f} ms")
+    
+    cache = get_sql_cache()
+    if cache:
+        cache_stats = cache.stats()
+        st.sidebar.write(f"SQL cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    semantic_cache = get_semantic_cache()
+    if semantic_cache:
+        semantic_stats = semantic_cache.stats()
+        st.sidebar.write(f"Semantic cache: {semantic_stats['hits']} hits, {semantic_stats['misses']} misses")
+    
+    intents = get_intent_matcher()
+    intent_stats = intents.stats()
+    st.sidebar.write(f"Template answers: {intent_stats['hits']} of {intent_stats['hits'] + intent_stats['misses']}")
+    if config.COALESCING:
+        st.sidebar.write(f"Coalesced: {get_question_flight().stats()['coalesced']} questions, "
+                         f"{get_query_flight().stats()['coalesced']} queries")
+    st.sidebar.write(f"Superseded generations cancelled: {get_job_runner().stats()['cancelled']}")
+    if config.DEGRADATION:
+        # The small fallback model loads in the background too, so it is ready for a peak
+        get_small_model_loader()
+        router_stats = get_router().stats()
+        st.sidebar.write(f"Serving level: {router_stats['level']}")
+        for tier, tier_stats in router_stats["tiers"].items():
+            st.sidebar.write(f"{tier}: {tier_stats['requests']} answers, p99 {tier_stats['p99_ms']:.0f} ms, "
+                             f"{tier_stats['valid']:.0%} valid SQL")
+    if config.ADMISSION:
+        admission_stats = get_admission().stats()
+        st.sidebar.write(f"Admission: {admission_stats['queued']} queued, "
+                         f"{admission_stats['rejected_rate'] + admission_stats['rejected_queue']} turned away, "
+                         f"p99 wait {admission_stats['wait_ms_p99']:.0f} ms")
     
     nl_query = st.text_input(
         "Enter your question:",
@@ -175,14 +762,34 @@ def main():
         key="query_input"
     )
     
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    session = st.session_state.session_id
+    
+    # A generation still running for an edited question will never be shown
+    job = st.session_state.get("generation_job")
+    if job and not job.done() and job.question != nl_query:
+        job.cancel()
+    
     if st.button("Generate SQL Query", key="generate_button"):
         if not nl_query.strip():
             st.warning("Please enter a question first.")
             return
         
         try:
+            # Clicking again while the same question is still generating
+            # waits for that generation instead of starting another
+            if not job or job.done() or job.token.cancelled or job.question != nl_query:
+                if job:
+                    job.cancel()
+                # Template and cached questions are answered while the model is
+                # still loading; the rest are asked to retry once it is ready
+                job = get_job_runner().submit(nl_query, lambda token: generate_sql_query(
+                    nl_query, None, cache, semantic_cache, intents, wait_for_model=False, cancel=token,
+                    session=session))
+                st.session_state.generation_job = job
             with st.spinner("Generating SQL query..."):
-                sql_query = generate_sql_query(nl_query, model)
+                sql_query = wait_for_job(job)
             
             st.subheader("Generated SQL Query:")
             st.code(sql_query, language="sql")
@@ -202,10 +809,48 @@ def main():
             else:
                 st.info("No matching results found.")
         
+        except GenerationCancelled:
+            st.info("This generation was superseded.")
+        except Busy as e:
+            st.warning(f"The service is busy, please retry in {math.ceil(e.retry_after)} s.")
         except Exception as e:
-            logger.error(f"Application error: {str(e)}")
-            st.error("An error occurred while processing your request. Please try again.")
-            st.session_state.error_count += 1
+            if str(e) == MODEL_LOADING_MESSAGE:
+                st.info(MODEL_LOADING_MESSAGE)
+            else:
+                logger.error(f"Application error: {str(e)}")
+                st.error("An error occurred while processing your request. Please try again.")
+                st.session_state.error_count += 1
+    
+    if loader and not loader.ready and not loader.error:
+        show_loading_progress(loader)
+
+def wait_for_job(job: GenerationJob, interval: float = 0.1):
+    """Wait for a generation job's result, keeping the page responsive to reruns.
+
+    Updating the page every ``interval`` seconds lets Streamlit stop this
+    script run when the user interacts; the job keeps running until the
+    next run cancels or re-attaches to it.
+    """
+    elapsed = st.empty()
+    start = time.perf_counter()
+    try:
+        while True:
+            try:
+                return job.future.result(timeout=interval)
+            except concurrent.futures.TimeoutError:
+                elapsed.caption(f"{time.perf_counter() - start:.1f} s")
+    finally:
+        elapsed.empty()
+
+def show_loading_progress(loader: ModelLoader, interval: float = 0.5):
+    """Show model loading progress until it finishes, then rerun the page."""
+    progress_bar = st.progress(0)
+    status = st.empty()
+    while not loader.ready and not loader.error:
+        progress_bar.progress(int(100 * loader.progress))
+        status.caption(f"Loading the NLP model: {loader.stage}")
+        time.sleep(interval)
+    st.experimental_rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
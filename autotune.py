@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import platform
+import time
+from typing import Any, Callable, List, Optional, Sequence
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VERSION = 1
+
+CALIBRATION_QUESTIONS = [
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Show departments sorted by name",
+    "List departments whose manager is Sarah",
+    "What is the name of the department with id 2?",
+    "Which department does Bob Wilson run?",
+    "Who manages Engineering?",
+    "List all department names",
+]
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def cpu_quota() -> float:
+    """Get the CPUs this process may use: its cgroup CPU quota, capped by the CPUs it may run on."""
+    try:
+        available = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        available = float(os.cpu_count() or 1)
+    quota = None
+    # cgroup v2: "<quota> <period>", or "max <period>" without a limit
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        limit, _, period = cpu_max.partition(" ")
+        if limit != "max" and period:
+            quota = int(limit) / int(period)
+    else:
+        # cgroup v1: a quota of -1 means no limit
+        for directory in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+            limit, period = _read(f"{directory}/cpu.cfs_quota_us"), _read(f"{directory}/cpu.cfs_period_us")
+            if limit and period and int(limit) > 0:
+                quota = int(limit) / int(period)
+                break
+    return min(quota, available) if quota else available
+
+def default_threads() -> int:
+    """Intra-op threads that fit the CPU quota; a fractional quota rounds down, since extra threads get throttled."""
+    return max(1, int(cpu_quota()))
+
+def thread_candidates(cpus: float) -> List[int]:
+    """Intra-op thread counts worth timing: 1, powers of two below the quota, and the quota itself."""
+    limit = max(1, int(cpus))
+    counts = {1, limit}
+    n = 2
+    while n < limit:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+def host_signature(model_name: str, backends: Sequence[str], thread_counts: Sequence[int],
+                   batch_sizes: Sequence[int]) -> dict:
+    """Describe the host and the calibration grid; a saved profile is only reused when this matches."""
+    try:
+        import onnxruntime
+        onnxruntime_version = onnxruntime.__version__
+    except ImportError:
+        onnxruntime_version = None
+    return {"version": PROFILE_VERSION, "model": model_name, "cpu_quota": cpu_quota(),
+            "cpu_count": os.cpu_count(), "machine": platform.machine(), "processor": platform.processor(),
+            "torch": torch.__version__, "onnxruntime": onnxruntime_version, "backends": list(backends),
+            "threads": list(thread_counts), "batch_sizes": list(batch_sizes)}
+
+def calibrate(load: Callable[[str, int], Any], generate: Callable[[Any, List[str], int], Any],
+              backends: Sequence[str], thread_counts: Sequence[int], batch_sizes: Sequence[int],
+              questions: Sequence[str] = CALIBRATION_QUESTIONS, repeats: int = 2,
+              progress: Optional[Callable[[float, str], None]] = None) -> dict:
+    """Time every backend, intra-op thread count and batch size, and pick the fastest.
+
+    ``load(backend, threads)`` returns a model and ``generate(model,
+    questions, batch_size)`` answers questions with it. Each setting is
+    scored by questions per second over the best of ``repeats`` runs. The
+    choice is the fastest setting, or a setting with fewer threads or a
+    smaller batch (lower latency for a lone question) within 5% of it. A
+    backend that fails to load is skipped.
+    """
+    progress = progress or (lambda fraction, stage: None)
+    measurements = []
+    steps = len(backends) * len(thread_counts)
+    step = 0
+    for backend in backends:
+        for threads in thread_counts:
+            progress(step / steps, f"Calibrating {backend} with {threads} threads (first start only)")
+            step += 1
+            torch.set_num_threads(threads)
+            try:
+                model = load(backend, threads)
+            except Exception as e:
+                logger.warning(f"Skipping the {backend} backend in calibration: {str(e)}")
+                step += len(thread_counts) - thread_counts.index(threads) - 1
+                break
+            # Warm up allocations and lazy initialization before timing
+            generate(model, list(questions[:1]), 1)
+            for batch_size in batch_sizes:
+                batch = [questions[i % len(questions)] for i in range(batch_size)]
+                times = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    generate(model, batch, batch_size)
+                    times.append(time.perf_counter() - start)
+                elapsed = min(times)
+                measurements.append({"backend": backend, "threads": threads, "batch_size": batch_size,
+                                     "questions_per_second": batch_size / elapsed,
+                                     "ms_per_batch": 1000 * elapsed})
+                logger.info(f"Calibration: {backend}, {threads} threads, batch {batch_size}: "
+                            f"{batch_size / elapsed:.2f} questions/s")
+            del model
+    if not measurements:
+        raise RuntimeError("No inference backend could be calibrated")
+    fastest = max(m["questions_per_second"] for m in measurements)
+    best = min((m for m in measurements if m["questions_per_second"] >= 0.95 * fastest),
+               key=lambda m: (m["batch_size"], m["threads"], -m["questions_per_second"]))
+    return {"backend": best["backend"], "threads": best["threads"], "batch_size": best["batch_size"],
+            "measurements": measurements}
+
+def load_profile(path: str, signature: dict) -> Optional[dict]:
+    """Load the saved profile at ``path`` if it was calibrated for this signature."""
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get("signature") != signature:
+        logger.info(f"Ignoring the host profile at {path}: it was calibrated for another host or settings")
+        return None
+    return profile
+
+def save_profile(path: str, profile: dict):
+    """Write a profile atomically, so a crash never leaves a truncated file for the next start."""
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Error saving host profile: {str(e)}")
+
+def get_profile(path: str, signature: dict, run_calibration: Callable[[], dict], recalibrate: bool = False) -> dict:
+    """Get the host profile saved at ``path``, calibrating and saving one when none matches."""
+    profile = None if recalibrate else load_profile(path, signature)
+    if profile is not None:
+        logger.info(f"Using host profile {path}: {profile['backend']}, {profile['threads']} threads, "
+                    f"batch size {profile['batch_size']}")
+        return profile
+    start = time.perf_counter()
+    profile = dict(run_calibration(), signature=signature,
+                   calibrated_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   calibration_seconds=round(time.perf_counter() - start, 1))
+    save_profile(path, profile)
+    logger.info(f"Calibrated host profile {path}: {profile['backend']}, {profile['threads']} threads, "
+                f"batch size {profile['batch_size']}")
+    return profile
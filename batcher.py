@@ -0,0 +1,112 @@
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Hashable, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+class _Request(NamedTuple):
+    item: Any
+    key: Hashable
+    future: Future
+    enqueued: float
+
+class MicroBatcher:
+    """Collects concurrent requests into batches run by one worker thread.
+
+    ``run_batch(items, key)`` returns one result per item; only requests
+    submitted with the same ``key`` (e.g. the decoding strategy) share a
+    batch. A batch is started when ``max_batch_size`` requests are waiting
+    or ``max_wait_ms`` after its first request arrived, whichever comes
+    first. Running every batch on a single thread also stops concurrent
+    callers from competing for torch's intra-op threads.
+    """
+    def __init__(self, run_batch: Callable[[List[Any], Hashable], List[Any]], max_batch_size: int = 16,
+                 max_wait_ms: float = 5, window: int = 10000):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._carry: Deque[_Request] = collections.deque()
+        self._lock = threading.Lock()
+        self._batch_sizes: Dict[int, int] = collections.Counter()
+        self._waits: Deque[float] = collections.deque(maxlen=window)
+        self.items = 0
+        self.batches = 0
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item, key: Hashable = None) -> Future:
+        """Queue one item; the returned future resolves to its result."""
+        future = Future()
+        self._queue.put(_Request(item, key, future, time.perf_counter()))
+        return future
+
+    def submit_many(self, items: List[Any], key: Hashable = None) -> List[Any]:
+        """Queue several items and wait for all their results, in order."""
+        futures = [self.submit(item, key) for item in items]
+        return [future.result() for future in futures]
+
+    def _next_request(self, timeout=None):
+        if self._carry:
+            return self._carry.popleft()
+        if timeout is not None and timeout <= 0:
+            return self._queue.get_nowait()
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self) -> List[_Request]:
+        first = self._next_request()
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        skipped = []
+        # Wait for more requests until the deadline, then only take those
+        # already queued. Requests for other keys are set aside for the
+        # following batches
+        while len(batch) < self.max_batch_size and len(skipped) < self.max_batch_size:
+            try:
+                request = self._next_request(timeout=deadline - time.perf_counter())
+            except queue.Empty:
+                break
+            (batch if request.key == first.key else skipped).append(request)
+        self._carry.extendleft(reversed(skipped))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._waits.extend(started - request.enqueued for request in batch)
+            try:
+                results = self.run_batch([request.item for request in batch], batch[0].key)
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+            except Exception as e:
+                logger.error(f"Micro-batch of {len(batch)} failed: {str(e)}")
+                for request in batch:
+                    request.future.set_exception(e)
+
+    def stats(self) -> dict:
+        """Get queue depth, batch-size distribution and queue wait percentiles (ms)."""
+        with self._lock:
+            waits = sorted(self._waits)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+
+        def percentile(p):
+            return 1000 * waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            "queue_depth": self._queue.qsize() + len(self._carry),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_sizes": batch_sizes,
+            "wait_ms_p50": percentile(0.50),
+            "wait_ms_p99": percentile(0.99),
+        }
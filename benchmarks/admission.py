@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from admission import Busy, FairScheduler
+import app
+
+QUESTIONS = [
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Show departments sorted by name",
+    "List departments whose manager is Sarah",
+    "What is the name of the department with id 2?",
+    "Which department does Bob Wilson run?",
+]
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return 1000 * values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+def load(model, light_sessions: int, flood_threads: int, duration: float, think: float):
+    """Run light sessions (one question every ``think`` s) next to one flooding session.
+
+    Returns light latencies, and the flooding session's answered and turned away counts.
+    """
+    stop = time.perf_counter() + duration
+    latencies, counts = [], {"answered": 0, "busy": 0}
+    lock = threading.Lock()
+
+    def ask(session: str, n: int) -> bool:
+        try:
+            app.generate_sql_queries([QUESTIONS[n % len(QUESTIONS)]], model, session=session)
+            return True
+        except Busy:
+            return False
+
+    def light(i):
+        n = i
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            if ask(f"light-{i}", n):
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            n += 1
+            time.sleep(think)
+
+    def flood(i):
+        n = i
+        while time.perf_counter() < stop:
+            answered = ask("flood", n)
+            with lock:
+                counts["answered" if answered else "busy"] += 1
+            if not answered:
+                # Ignores the retry hint, as a misbehaving client would
+                time.sleep(0.01)
+            n += 1
+
+    threads = ([threading.Thread(target=light, args=(i,)) for i in range(light_sessions)]
+               + [threading.Thread(target=flood, args=(i,)) for i in range(flood_threads)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, counts
+
+def run_benchmark(light_sessions: int = 4, flood_threads: int = 64, duration: float = 8, think: float = 0.5):
+    """Show light sessions' latency with and without one session flooding the model."""
+    model = app.load_model()
+    app.generate_sql_queries(QUESTIONS[:1], model)
+    config.COALESCING = False
+    scenarios = [
+        ("light only", 0, True, config.SESSION_RATE),
+        ("flood, no admission control", flood_threads, False, config.SESSION_RATE),
+        ("flood, fair queuing only", flood_threads, True, 1e9),
+        ("flood, fair queuing + rate limit", flood_threads, True, config.SESSION_RATE),
+    ]
+    print(f"{'scenario':>33} {'light p50 ms':>13} {'light p99 ms':>13} {'flood answered':>15} {'flood busy':>11}")
+    for name, threads, admission, rate in scenarios:
+        config.ADMISSION = admission
+        scheduler = FairScheduler(config.ADMISSION_CONCURRENCY, config.ADMISSION_QUEUE_SIZE, rate,
+                                  config.SESSION_BURST)
+        app.get_admission = lambda: scheduler
+        latencies, counts = load(model, light_sessions, threads, duration, think)
+        print(f"{name:>33} {percentile(latencies, 0.5):>13.0f} {percentile(latencies, 0.99):>13.0f} "
+              f"{counts['answered']:>15} {counts['busy']:>11}")
+
+if __name__ == "__main__":
+    run_benchmark()
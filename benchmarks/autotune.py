@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import app
+from autotune import cpu_quota
+
+def run_benchmark():
+    """Recalibrate the host profile and print every measured setting next to the choice.
+
+    Narrow the grid with NL2SQL_AUTOTUNE_BACKENDS, NL2SQL_NUM_THREADS and
+    NL2SQL_AUTOTUNE_BATCH_SIZES.
+    """
+    print(f"CPU quota: {cpu_quota():.2f} of {os.cpu_count()} CPUs")
+    profile = app.get_host_profile(recalibrate=True)
+    print(f"{'backend':>11} {'threads':>8} {'batch':>6} {'questions/s':>12} {'ms/batch':>9}")
+    for m in sorted(profile["measurements"], key=lambda m: -m["questions_per_second"]):
+        chosen = " <" if (m["backend"], m["threads"], m["batch_size"]) == (
+            profile["backend"], profile["threads"], profile["batch_size"]) else ""
+        print(f"{m['backend']:>11} {m['threads']:>8} {m['batch_size']:>6} {m['questions_per_second']:>12.2f} "
+              f"{m['ms_per_batch']:>9.0f}{chosen}")
+    print(f"Calibration took {profile['calibration_seconds']} s; saved to {config.PROFILE_PATH}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import generate_sql_queries, load_model
+
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+    "Who is the manager of Marketing?",
+    "Find manager of Engineering",
+    "Which department does Jane Doe manage?",
+    "Show the manager of HR",
+    "List departments managed by Mike Brown",
+]
+
+BATCH_SIZES = [1, 4, 16, 64]
+
+def run_benchmark(num_questions: int = 64):
+    """Measure batched generation throughput at several batch sizes."""
+    model = load_model()
+    workload = [QUESTIONS[i % len(QUESTIONS)] for i in range(num_questions)]
+    
+    # Warm up so the first measured batch does not pay one-off setup costs
+    generate_sql_queries(workload[:4], model, batch_size=4)
+    
+    print(f"{'batch':>6} {'seconds':>9} {'questions/s':>12} {'errors':>7}")
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        results = generate_sql_queries(workload, model, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for r in results if r.error)
+        print(f"{batch_size:>6} {elapsed:>9.2f} {num_questions / elapsed:>12.2f} {errors:>7}")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 64)
@@ -0,0 +1,56 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from app import generate_batch, generate_continuous, load_model
+from cancellation import CancelToken
+
+QUESTIONS = [
+    "List departments whose manager is Sarah",
+    "Which managers have a J in their name?",
+    "What is the name of the department with id 2?",
+]
+
+def run(generate, cancel_after_ms=None):
+    """Generate with a cancel token, cancelled after ``cancel_after_ms``; return CPU ms and ms to stop."""
+    token = CancelToken()
+    timer = None
+    if cancel_after_ms is not None:
+        timer = threading.Timer(cancel_after_ms / 1000, token.cancel)
+        timer.start()
+    cpu = time.process_time()
+    generate(token)
+    finished = time.perf_counter()
+    cpu_ms = 1000 * (time.process_time() - cpu)
+    if timer:
+        timer.cancel()
+    stop_ms = 1000 * (finished - token.cancelled_at) if token.cancelled_at else None
+    return cpu_ms, stop_ms
+
+def run_benchmark(cancel_after_ms: float = 20, max_new_tokens: int = 256, repeats: int = 3):
+    """Measure CPU time reclaimed by cancelling superseded generations, for both decoding paths."""
+    model = load_model()
+    # A long budget without the SQL grammar stands in for a slow generation
+    config.CONSTRAINED_DECODING = False
+    config.MAX_NEW_TOKENS = config.TOKEN_BUDGET_BASE = max_new_tokens
+    paths = {
+        "generate": lambda token: generate_batch(model, QUESTIONS, "greedy", len(QUESTIONS),
+                                                 [token] * len(QUESTIONS)),
+        "continuous": lambda token: generate_continuous(model, QUESTIONS, token),
+    }
+    print(f"{'path':>11} {'full cpu ms':>12} {'cancelled cpu ms':>17} {'reclaimed ms':>13} {'stop ms':>8}")
+    for name, generate in paths.items():
+        run(generate)
+        full = sum(run(generate)[0] for _ in range(repeats)) / repeats
+        cancelled = [run(generate, cancel_after_ms) for _ in range(repeats)]
+        cpu = sum(c for c, _ in cancelled) / repeats
+        stops = [s for _, s in cancelled if s is not None]
+        stop = max(stops) if stops else float("nan")
+        print(f"{name:>11} {full:>12.0f} {cpu:>17.0f} {full - cpu:>13.0f} {stop:>8.1f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from app import execute_sql_query, generate_batch, load_model
+
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Show departments sorted by name",
+    "What is the name of the department with id 2?",
+    "List departments whose manager is Sarah",
+]
+
+def run_benchmark(candidates=(1, 2, 3, 5)):
+    """Count questions answered with SQL that executes, and the cost, per number of candidates."""
+    model = load_model()
+    print(f"{'candidates':>10} {'runs':>6} {'ms/question':>12}")
+    for count in candidates:
+        config.CANDIDATES = count
+        start = time.perf_counter()
+        results = generate_batch(model, QUESTIONS, config.DECODING, 1)
+        elapsed = 1000 * (time.perf_counter() - start) / len(QUESTIONS)
+        runs = sum(1 for result in results
+                   if result.sql and not isinstance(execute_sql_query(result.sql)[1], str))
+        print(f"{count:>10} {runs:>3}/{len(QUESTIONS):<2} {elapsed:>12.1f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from app import execute_sql_query, generate_sql_query, get_query_flight, get_question_flight, load_model
+
+# The same question as different sessions type it
+VARIANTS = ["Show all departments", "show all departments", "Show all the departments?", "SHOW ALL DEPARTMENTS"]
+
+def burst(model, sessions: int):
+    """Ask the question from ``sessions`` threads at once; return wall ms and process CPU ms."""
+    barrier = threading.Barrier(sessions)
+
+    def session(i):
+        barrier.wait()
+        sql = generate_sql_query(VARIANTS[i % len(VARIANTS)], model)
+        execute_sql_query(sql)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start, cpu = time.perf_counter(), time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return 1000 * (time.perf_counter() - start), 1000 * (time.process_time() - cpu)
+
+def run_benchmark(concurrency=(1, 8, 32, 64)):
+    """Compare a burst of identical questions with and without single-flight coalescing."""
+    model = load_model()
+    generate_sql_query(VARIANTS[0], model)
+    print(f"{'sessions':>9} {'coalescing':>11} {'wall ms':>8} {'cpu ms':>8} {'generated':>10} {'executed':>9}")
+    for sessions in concurrency:
+        for coalescing in (False, True):
+            config.COALESCING = coalescing
+            questions, queries = get_question_flight().stats(), get_query_flight().stats()
+            wall, cpu = burst(model, sessions)
+            generated = get_question_flight().stats()["executed"] - questions["executed"]
+            executed = get_query_flight().stats()["executed"] - queries["executed"]
+            if not coalescing:
+                generated = executed = sessions
+            print(f"{sessions:>9} {'on' if coalescing else 'off':>11} {wall:>8.0f} {cpu:>8.0f} "
+                  f"{generated:>10} {executed:>9}")
+
+if __name__ == "__main__":
+    run_benchmark()
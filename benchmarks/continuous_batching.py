@@ -0,0 +1,101 @@
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+import config
+from batcher import MicroBatcher
+from decode_scheduler import DecodeScheduler
+from engine import T5Engine
+from prompt import get_prompt_encoder
+
+# (question, output tokens): short answers like "SELECT * FROM Departments;"
+# mixed with longer filtered queries
+TRACE = [
+    ("Show all departments", 8),
+    ("List all department names", 8),
+    ("Who manages Sales?", 16),
+    ("Which departments are managed by someone whose name starts with J or S?", 48),
+    ("Show the names of departments where the manager is Sarah or the name is Marketing", 64),
+    ("How many departments are there?", 12),
+]
+
+def make_trace(requests: int, seed: int = 0):
+    """Pick questions from TRACE at random, reproducibly."""
+    rng = random.Random(seed)
+    return [rng.choice(TRACE) for _ in range(requests)]
+
+def replay(submit, trace, prompt_ids, rate: float, seed: int = 0):
+    """Send the trace with Poisson arrivals at ``rate`` per second; return per-request latencies."""
+    rng = random.Random(seed)
+    latencies = [0.0] * len(trace)
+    threads = []
+
+    def wait(i, future, sent):
+        future.result()
+        latencies[i] = time.perf_counter() - sent
+
+    start = time.perf_counter()
+    for i, (question, length) in enumerate(trace):
+        sent = time.perf_counter()
+        thread = threading.Thread(target=wait, args=(i, submit(prompt_ids[question], length), sent))
+        thread.start()
+        threads.append(thread)
+        time.sleep(rng.expovariate(rate))
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+def summarize(name, latencies, wall):
+    latencies = sorted(latencies)
+    p50 = 1000 * latencies[len(latencies) // 2]
+    p99 = 1000 * latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    print(f"{name:>12} {len(latencies) / wall:>8.1f} {1000 * sum(latencies) / len(latencies):>9.1f} "
+          f"{p50:>9.1f} {p99:>9.1f}")
+
+def run_benchmark(requests: int = 200, rate: float = 50.0):
+    """Compare static micro-batches against continuous batching on a mixed-length trace.
+
+    Output lengths are fixed per question through ``max_new_tokens`` so both
+    schedulers do the same work whatever the model emits. Raise ``rate`` until
+    static batching saturates to see the difference.
+    """
+    engine = T5Engine.from_pretrained(config.MODEL_NAME)
+    prompt_encoder = get_prompt_encoder(engine.tokenizer)
+    questions = [question for question, _ in TRACE]
+    prompt_ids = dict(zip(questions, prompt_encoder.encode(questions)))
+    pad_token_id = engine.config.pad_token_id
+
+    def run_static(items, key):
+        # The whole batch decodes until its longest member is done
+        length = max(len(ids) for ids, _ in items)
+        input_ids = torch.full((len(items), length), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(items), length), dtype=torch.long)
+        for row, (ids, _) in enumerate(items):
+            input_ids[row, :len(ids)] = torch.tensor(ids)
+            attention_mask[row, :len(ids)] = 1
+        output = engine.generate(input_ids, attention_mask, max_new_tokens=max(n for _, n in items))
+        return [output[row, 1:n + 1].tolist() for row, (_, n) in enumerate(items)]
+
+    static = MicroBatcher(run_static, max_batch_size=config.BATCH_MAX_SIZE, max_wait_ms=config.BATCH_MAX_WAIT_MS)
+    continuous = DecodeScheduler(engine.model, max_batch_size=config.BATCH_MAX_SIZE)
+    trace = make_trace(requests)
+
+    # Warm up both paths
+    static.submit((prompt_ids[questions[0]], 4)).result()
+    continuous.submit(prompt_ids[questions[0]], 4).result()
+
+    print(f"{requests} requests at {rate:.0f}/s, batches of up to {config.BATCH_MAX_SIZE}")
+    print(f"{'scheduler':>12} {'req/s':>8} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    summarize("static", *replay(lambda ids, n: static.submit((ids, n)), trace, prompt_ids, rate))
+    summarize("continuous", *replay(lambda ids, n: continuous.submit(ids, n), trace, prompt_ids, rate))
+    stats = continuous.stats()
+    print(f"continuous: {stats['steps']} decoder steps for {stats['sequences']} sequences")
+
+if __name__ == "__main__":
+    run_benchmark()
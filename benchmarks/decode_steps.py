@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import StoppingCriteriaList
+
+import config
+from app import get_db_path, get_token_budget, load_model
+from prompt import get_prompt_encoder
+from schema import get_schema
+from sql_grammar import StatementStoppingCriteria, get_sql_constraint
+
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+    "Who is the manager of Marketing?",
+    "Find manager of Engineering",
+    "Which department does Jane Doe manage?",
+    "Show the manager of HR",
+    "List departments managed by Mike Brown",
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+]
+
+def decoder_steps(model, question: str, **generate_kwargs) -> int:
+    """Run greedy generation for one question and count decoder steps."""
+    prompt_encoder = get_prompt_encoder(model.tokenizer)
+    inputs = prompt_encoder.encode_batch([question])
+    constraint = get_sql_constraint(model.tokenizer, get_schema(get_db_path()))
+    if config.CONSTRAINED_DECODING:
+        generate_kwargs["prefix_allowed_tokens_fn"] = constraint
+    with torch.inference_mode():
+        output_ids = model.generate(**inputs, do_sample=False, **generate_kwargs)
+    # The first position is the decoder start token, not a generated one
+    return output_ids.shape[1] - 1
+
+def run_benchmark():
+    """Compare decoder steps with a fixed max_length against the statement stop and token budget."""
+    model = load_model()
+    constraint = get_sql_constraint(model.tokenizer, get_schema(get_db_path()))
+    stopping = StoppingCriteriaList([StatementStoppingCriteria(constraint.decode, model.tokenizer.eos_token_id)])
+
+    before, after = [], []
+    for question in QUESTIONS:
+        question_tokens = get_prompt_encoder(model.tokenizer).encode_with_lengths([question])[1][0]
+        before.append(decoder_steps(model, question, max_length=128))
+        after.append(decoder_steps(model, question, stopping_criteria=stopping,
+                                   max_new_tokens=get_token_budget(question_tokens)))
+        print(f"{before[-1]:>4} -> {after[-1]:>4}  {question}")
+
+    saved = sum(before) - sum(after)
+    print(f"Average decoder steps: {sum(before) / len(QUESTIONS):.1f} -> {sum(after) / len(QUESTIONS):.1f} "
+          f"({saved / len(QUESTIONS):.1f} saved per question)")
+
+if __name__ == "__main__":
+    run_benchmark()
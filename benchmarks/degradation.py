@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import app
+from admission import Busy
+
+# Questions with the SQL that answers them; answers are compared by their result rows
+EVAL = [
+    ("Who is in charge of Marketing?", "SELECT Manager FROM Departments WHERE Name = 'Marketing';"),
+    ("Show all departments", "SELECT * FROM Departments;"),
+    ("Give me the department names", "SELECT Name FROM Departments;"),
+    ("How many departments do we have?", "SELECT COUNT(*) FROM Departments;"),
+    ("Which department is run by Jane Doe?", "SELECT Name FROM Departments WHERE Manager = 'Jane Doe';"),
+    ("List the managers", "SELECT Manager FROM Departments;"),
+    ("Who manages Engineering?", "SELECT Manager FROM Departments WHERE Name = 'Engineering';"),
+    ("Departments sorted alphabetically", "SELECT * FROM Departments ORDER BY Name;"),
+    ("Which managers have Smith in their name?", "SELECT Manager FROM Departments WHERE Manager LIKE '%Smith%';"),
+    ("Is there a Finance department?", "SELECT * FROM Departments WHERE Name = 'Finance';"),
+]
+
+def rows(sql):
+    columns, result = app.execute_sql_query(sql)
+    return None if isinstance(result, str) else sorted(map(tuple, result))
+
+def accuracy(answers) -> float:
+    """Share of answers whose rows match the expected SQL's rows."""
+    correct = sum(1 for sql, (_, expected) in zip(answers, EVAL) if sql and rows(sql) == rows(expected))
+    return correct / len(EVAL)
+
+def tier_quality():
+    """Execution accuracy and latency of each tier answering the whole evaluation set on its own."""
+    questions = [question for question, _ in EVAL]
+    print(f"{'tier':>9} {'answered':>9} {'accuracy':>9} {'ms/question':>12}")
+    intents = app.get_intent_matcher()
+    start = time.perf_counter()
+    matches = [intents.match(question) for question in questions]
+    elapsed = 1000 * (time.perf_counter() - start) / len(questions)
+    answers = [match.sql if match else None for match in matches]
+    print(f"{'template':>9} {sum(1 for a in answers if a):>9} {accuracy(answers):>9.2f} {elapsed:>12.2f}")
+    models = [("small", config.SMALL_MODEL), ("base", config.MODEL_NAME)]
+    for tier, name in models:
+        if not name:
+            continue
+        model = app.load_model(config.BACKEND, draft_model="", model_name=name)
+        app.generate_batch(model, questions[:1], "greedy")
+        start = time.perf_counter()
+        answers = [app.generate_batch(model, [question], "greedy")[0].sql for question in questions]
+        elapsed = 1000 * (time.perf_counter() - start) / len(questions)
+        print(f"{tier:>9} {sum(1 for a in answers if a):>9} {accuracy(answers):>9.2f} {elapsed:>12.1f}")
+
+def ramp(levels=(1, 8, 32, 8, 1), seconds: float = 4):
+    """Run closed-loop sessions at rising then falling concurrency; print the tier the router picks."""
+    questions = [question for question, _ in EVAL]
+    stop = threading.Event()
+    active = [0]
+
+    def session(i):
+        n = i
+        while not stop.is_set():
+            if i >= active[0]:
+                time.sleep(0.05)
+                continue
+            try:
+                app.generate_sql_query(questions[n % len(questions)], session=f"session-{i}")
+            except Busy:
+                time.sleep(0.1)
+            except ValueError:
+                pass
+            n += 1
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(max(levels))]
+    for thread in threads:
+        thread.start()
+    router = app.get_router()
+    print(f"{'sessions':>9} {'level':>11} {'load':>6}")
+    for sessions in levels:
+        active[0] = sessions
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            time.sleep(1)
+            print(f"{sessions:>9} {router.level:>11} {router.load():>6.2f}")
+    stop.set()
+    print(f"{'tier':>11} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'valid SQL':>10}")
+    for tier, stats in router.stats()["tiers"].items():
+        print(f"{tier:>11} {stats['requests']:>9} {stats['p50_ms']:>8.0f} {stats['p99_ms']:>8.0f} "
+              f"{stats['valid']:>10.2f}")
+
+def run_benchmark():
+    """Measure each tier's accuracy and latency, then watch the router degrade and recover under load.
+
+    Set NL2SQL_SMALL_MODEL for the small tier, and lower NL2SQL_SLO_MS and
+    NL2SQL_DEGRADE_COOLDOWN_S to see the ladder move with a fast model.
+    """
+    # Every ramp request needs the model, so the ladder reacts to it
+    config.COALESCING = False
+    config.SESSION_RATE = 1e9
+    tier_quality()
+    app.get_model_loader().get()
+    if app.get_small_model_loader():
+        app.get_small_model_loader().get()
+    ramp()
+
+if __name__ == "__main__":
+    run_benchmark()
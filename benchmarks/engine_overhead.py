@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import pipeline
+
+import config
+from engine import T5Engine
+from prompt import get_prompt_encoder
+
+QUESTIONS = [
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Show departments sorted by name",
+    "Who manages Sales?",
+]
+
+def time_per_call(fn, repeats: int) -> float:
+    """Mean milliseconds per call of fn over the question set."""
+    fn(QUESTIONS[0])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for question in QUESTIONS:
+            fn(question)
+    return 1000 * (time.perf_counter() - start) / (repeats * len(QUESTIONS))
+
+def run_benchmark(max_new_tokens: int = 32, repeats: int = 10):
+    """Compare the transformers pipeline wrapper against T5Engine on short prompts."""
+    text2text = pipeline("text2text-generation", model=config.MODEL_NAME)
+    engine = T5Engine(text2text.model, text2text.tokenizer)
+    prompt_encoder = get_prompt_encoder(engine.tokenizer)
+
+    def via_pipeline(question):
+        # The pipeline always passes max_length to generate, so the budget is set through it
+        return text2text(prompt_encoder.prompt_text(question), do_sample=False, max_length=max_new_tokens + 1)[0]["generated_text"]
+
+    def via_engine(question):
+        output_ids = engine.generate(**prompt_encoder.encode_batch([question]), max_new_tokens=max_new_tokens)
+        return engine.tokenizer.decode(output_ids[0], skip_special_tokens=True)
+
+    # Same weights and greedy decoding, so the text must match
+    for question in QUESTIONS:
+        assert via_pipeline(question) == via_engine(question), question
+
+    pipeline_ms = time_per_call(via_pipeline, repeats)
+    engine_ms = time_per_call(via_engine, repeats)
+    with torch.inference_mode():
+        generate_ms = time_per_call(
+            lambda q: text2text.model.generate(**prompt_encoder.encode_batch([q]), do_sample=False,
+                                               max_new_tokens=max_new_tokens), repeats)
+    print(f"pipeline:         {pipeline_ms:8.2f} ms/call")
+    print(f"model.generate:   {generate_ms:8.2f} ms/call")
+    print(f"T5Engine:         {engine_ms:8.2f} ms/call ({100 * (1 - engine_ms / pipeline_ms):.0f}% less than pipeline)")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,89 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers import AutoTokenizer
+
+import config
+from examples import Example, ExampleStore, get_example_store
+from prompt import PromptEncoder
+from semantic_cache import embed_question
+from sql_cache import normalize_question
+
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Show departments sorted by name",
+    "What is the name of the department with id 2?",
+    "List departments whose manager is Sarah",
+]
+
+TEMPLATES = [
+    ("Who manages {dept}?", "SELECT Manager FROM Departments WHERE Name = '{dept}';"),
+    ("Which department does {person} run?", "SELECT Name FROM Departments WHERE Manager = '{person}';"),
+    ("Show departments with {word} in the name", "SELECT * FROM Departments WHERE Name LIKE '%{word}%';"),
+    ("List managers whose name starts with {letter}", "SELECT Manager FROM Departments WHERE Manager LIKE '{letter}%';"),
+    ("Is {dept} managed by {person}?", "SELECT * FROM Departments WHERE Name = '{dept}' AND Manager = '{person}';"),
+]
+
+def synthetic_bank(size: int, seed: int = 0):
+    """Generate ``size`` varied question/SQL pairs."""
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ren", "sa", "tor", "vi", "zen", "dar", "el", "fin", "gra"]
+
+    def word():
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).capitalize()
+
+    bank = []
+    for _ in range(size):
+        question, sql = rng.choice(TEMPLATES)
+        values = {"dept": word(), "person": f"{word()} {word()}", "word": word().lower(),
+                  "letter": rng.choice("ABCDEFGHIJKLMNOPRSTW")}
+        bank.append(Example(question.format(**values), sql.format(**values)))
+    return bank
+
+def time_search(store: ExampleStore, queries, k: int):
+    """Mean search latency in ms and the similarity of each retrieved example per query."""
+    vectors = [embed_question(normalize_question(query)) for query in queries]
+    start = time.perf_counter()
+    results = [store.index.search(vector, k) for vector in vectors]
+    return 1000 * (time.perf_counter() - start) / len(queries), results
+
+def run_benchmark(sizes=(1000, 10000, 100000), k: int = config.EXAMPLES_K, queries: int = 200):
+    """Measure IVF retrieval latency and recall, and prompt tokens with and without retrieval."""
+    # Many bank questions tie on similarity, so recall is measured on the
+    # similarity of what is retrieved rather than on ids
+    print(f"{'examples':>9} {'exact ms':>9} {'ivf ms':>7} {'recall@' + str(k):>9} {'similarity':>11}")
+    for size in sizes:
+        bank = synthetic_bank(size)
+        probe = [example.question for example in synthetic_bank(queries, seed=1)]
+        exact = ExampleStore(examples=bank, min_train=size + 1)
+        ivf = ExampleStore(examples=bank)
+        exact_ms, expected = time_search(exact, probe, k)
+        ivf_ms, found = time_search(ivf, probe, k)
+        matched = 0
+        for exact_hits, ivf_hits in zip(expected, found):
+            # A retrieved example counts if it is at least as similar as the exact k-th best
+            cutoff = exact_hits[-1][1] - 1e-6
+            matched += sum(1 for _, score in ivf_hits if score >= cutoff)
+        recall = matched / sum(len(hits) for hits in expected)
+        similarity = (sum(score for hits in found for _, score in hits)
+                      / sum(score for hits in expected for _, score in hits))
+        print(f"{size:>9} {exact_ms:>9.2f} {ivf_ms:>7.2f} {recall:>9.2f} {similarity:>11.3f}")
+
+    tokenizer = AutoTokenizer.from_pretrained(config.MODEL_NAME)
+    static = PromptEncoder(tokenizer)
+    retrieval = PromptEncoder(tokenizer, get_example_store(config.EXAMPLES_PATH), k, config.EXAMPLES_TOKEN_BUDGET)
+    static_tokens = sum(len(ids) for ids in static.encode(QUESTIONS))
+    retrieval_tokens = sum(len(ids) for ids in retrieval.encode(QUESTIONS))
+    print(f"prompt tokens over {len(QUESTIONS)} questions: fixed examples {static_tokens}, "
+          f"retrieved examples {retrieval_tokens} ({retrieval_tokens / static_tokens:.0%})")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import generate_sql_queries, get_db_path, load_model
+from intents import IntentMatcher, intent_slots
+from schema import get_schema
+from semantic_cache import load_entities
+
+# Sample workload, weighted towards the questions users actually repeat
+WORKLOAD = (
+    ["Show all departments"] * 6
+    + ["Who manages Sales?"] * 5
+    + ["List all department names"] * 4
+    + ["Who is the manager of Marketing?", "Find manager of Engineering", "Show the manager of HR",
+       "who runs Finance", "Which department does Jane Doe manage?",
+       "List departments managed by Mike Brown", "Show me the departments"]
+    + ["How many departments are there?", "Which managers have a J in their name?",
+       "Show departments sorted by name", "Who manages Narnia?"]
+)
+
+def run_benchmark():
+    """Report template coverage of the workload and the model latency it avoids."""
+    matcher = IntentMatcher(lambda: load_entities(get_db_path(), slots=intent_slots()),
+                            lambda: get_schema(get_db_path()))
+    matcher.match("warm up")
+
+    start = time.perf_counter()
+    matches = [matcher.match(q) for q in WORKLOAD]
+    match_ms = 1000 * (time.perf_counter() - start) / len(WORKLOAD)
+    matched = [q for q, m in zip(WORKLOAD, matches) if m]
+
+    model = load_model()
+    generate_sql_queries(matched[:1], model)
+    start = time.perf_counter()
+    for question in matched:
+        generate_sql_queries([question], model)
+    model_ms = 1000 * (time.perf_counter() - start) / max(len(matched), 1)
+
+    print(f"Template coverage: {len(matched)}/{len(WORKLOAD)} questions ({100 * len(matched) / len(WORKLOAD):.0f}%)")
+    print(f"Intent match: {match_ms:.3f} ms/question, model generation: {model_ms:.1f} ms/question")
+    print(f"Latency saved on matched questions: {model_ms - match_ms:.1f} ms each, "
+          f"{(model_ms - match_ms) * len(matched) / len(WORKLOAD):.1f} ms per request on average")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from app import generate_batch, load_model
+from batcher import MicroBatcher
+
+QUESTIONS = [
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Show departments sorted by name",
+    "Who manages Sales?",
+    "List departments whose manager is Sarah",
+    "What is the name of the department with id 2?",
+]
+
+def run_clients(ask, clients: int, requests: int):
+    """Run closed-loop clients; return (questions per second, p50 ms, p99 ms)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        for n in range(requests):
+            question = QUESTIONS[(offset + n) % len(QUESTIONS)]
+            start = time.perf_counter()
+            ask(question)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    p50 = 1000 * latencies[len(latencies) // 2]
+    p99 = 1000 * latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    return len(latencies) / wall, p50, p99
+
+def run_benchmark(concurrency=(1, 4, 16, 32), requests: int = 8, max_wait_ms: float = config.BATCH_MAX_WAIT_MS):
+    """Compare per-request generation against the micro-batcher under concurrent load."""
+    model = load_model()
+    generate_batch(model, QUESTIONS[:1], "greedy")
+
+    print(f"{'clients':>8} {'mode':>10} {'q/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'mean batch':>11}")
+    for clients in concurrency:
+        def direct(question):
+            return generate_batch(model, [question], "greedy")[0]
+
+        qps, p50, p99 = run_clients(direct, clients, requests)
+        print(f"{clients:>8} {'direct':>10} {qps:>8.1f} {p50:>9.1f} {p99:>9.1f} {1.0:>11.1f}")
+
+        batcher = MicroBatcher(lambda questions, decoding: generate_batch(model, questions, decoding,
+                                                                          config.BATCH_MAX_SIZE),
+                               max_batch_size=config.BATCH_MAX_SIZE, max_wait_ms=max_wait_ms)
+        qps, p50, p99 = run_clients(lambda question: batcher.submit(question, "greedy").result(), clients, requests)
+        stats = batcher.stats()
+        print(f"{clients:>8} {'batched':>10} {qps:>8.1f} {p50:>9.1f} {p99:>9.1f} {stats['mean_batch_size']:>11.1f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import clean_sql_query, load_model
+from prompt import get_prompt_encoder
+
+# Fixed question set; greedy decoding so both backends are deterministic
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+    "Who is the manager of Marketing?",
+    "Find manager of Engineering",
+    "Which department does Jane Doe manage?",
+    "Show the manager of HR",
+    "List departments managed by Mike Brown",
+]
+
+def generate_greedy(model, questions):
+    """Generate SQL for each question with greedy decoding."""
+    inputs = get_prompt_encoder(model.tokenizer).encode_batch(questions)
+    output_ids = model.generate(**inputs, do_sample=False, max_length=128)
+    texts = model.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+    return [clean_sql_query(t) for t in texts]
+
+def check_parity() -> bool:
+    """Compare SQL from the torch and ONNX backends on the fixed question set."""
+    torch_sql = generate_greedy(load_model("torch"), QUESTIONS)
+    onnx_sql = generate_greedy(load_model("onnx"), QUESTIONS)
+    mismatches = 0
+    for question, expected, actual in zip(QUESTIONS, torch_sql, onnx_sql):
+        status = "ok" if expected == actual else "MISMATCH"
+        mismatches += expected != actual
+        print(f"[{status}] {question}\n    torch: {expected}\n    onnx:  {actual}")
+    print(f"{len(QUESTIONS) - mismatches}/{len(QUESTIONS)} questions match")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_parity() else 1)
@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The example questions from the README
+README_QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+]
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def measure(backend: str, repeats: int = 5) -> dict:
+    """Load one backend and measure memory, latency and greedy SQL output."""
+    import torch
+    from app import clean_sql_query, load_model
+    from prompt import get_prompt_encoder
+
+    rss_before = rss_mb()
+    model = load_model(backend)
+    rss_after = rss_mb()
+
+    sql = []
+    latencies = []
+    for question in README_QUESTIONS:
+        inputs = get_prompt_encoder(model.tokenizer).encode_batch([question])
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with torch.inference_mode():
+                output_ids = model.generate(**inputs, do_sample=False, max_length=128)
+            latencies.append(time.perf_counter() - start)
+        text = model.tokenizer.decode(output_ids[0], skip_special_tokens=True)
+        sql.append(clean_sql_query(text))
+
+    return {"backend": backend,
+            "rss_mb": rss_after - rss_before,
+            "latency_ms": 1000 * sum(latencies) / len(latencies),
+            "sql": sql}
+
+def run_in_subprocess(backend: str) -> dict:
+    """Measure a backend in a fresh process so RSS numbers do not overlap."""
+    out = subprocess.run([sys.executable, __file__, "--child", backend],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def run_benchmark() -> bool:
+    """Compare the fp32 and int8 torch backends."""
+    fp32 = run_in_subprocess("torch")
+    int8 = run_in_subprocess("torch-int8")
+
+    print(f"{'backend':>11} {'model RSS MB':>13} {'latency ms':>11}")
+    for r in (fp32, int8):
+        print(f"{r['backend']:>11} {r['rss_mb']:>13.0f} {r['latency_ms']:>11.1f}")
+    print(f"RSS delta: {int8['rss_mb'] - fp32['rss_mb']:+.0f} MB "
+          f"({100 * (int8['rss_mb'] / fp32['rss_mb'] - 1):+.0f}%)")
+    print(f"Latency delta: {int8['latency_ms'] - fp32['latency_ms']:+.1f} ms "
+          f"({100 * (int8['latency_ms'] / fp32['latency_ms'] - 1):+.0f}%)")
+
+    unchanged = True
+    for question, a, b in zip(README_QUESTIONS, fp32["sql"], int8["sql"]):
+        if a != b:
+            unchanged = False
+            print(f"SQL changed for '{question}':\n    torch:      {a}\n    torch-int8: {b}")
+    print("Generated SQL unchanged" if unchanged else "Generated SQL differs")
+    return unchanged
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        print(json.dumps(measure(sys.argv[2])))
+    else:
+        sys.exit(0 if run_benchmark() else 1)
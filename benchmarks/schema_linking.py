@@ -0,0 +1,117 @@
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+import config
+from prompt import PromptEncoder
+from schema_linking import get_schema_linker
+
+SUBJECTS = [
+    "Customer", "Order", "Product", "Invoice", "Supplier", "Warehouse", "Shipment", "Employee", "Payment",
+    "Account", "Project", "Ticket", "Vehicle", "Patient", "Course", "Student", "Booking", "Flight", "Contract",
+    "Asset", "Campaign", "Store", "Region", "Review", "Device", "Subscription", "Branch", "Claim", "Recipe",
+    "Event", "Vendor", "Budget", "Lesson", "Machine", "Parcel", "Policy", "Room", "Team", "Trip", "Loan",
+]
+QUALIFIERS = [
+    "", "Archive", "History", "Detail", "Note", "Audit", "Status", "Category", "Log", "Summary", "Schedule",
+    "Rating", "Address", "Contact", "Tag", "Alert", "Quota", "Target", "Snapshot", "Forecast", "Queue",
+    "Batch", "Setting", "Version", "Grant",
+]
+ATTRIBUTES = [
+    "Title", "Amount", "Quantity", "Price", "Created", "Updated", "City", "Country", "Email", "Phone", "Label",
+    "Priority", "Score", "Weight", "Color", "Code", "Owner", "Level", "Duration", "Currency", "Comment",
+]
+CITIES = ["Lisbon", "Osaka", "Denver", "Nairobi", "Quito", "Tallinn", "Perth", "Utrecht"]
+
+def create_schema(path: str, tables: int, seed: int = 0):
+    """Create a database of ``tables`` tables with a few columns and rows each; returns their names."""
+    rng = random.Random(seed)
+    names = [f"{subject}{qualifier}" for qualifier in QUALIFIERS for subject in SUBJECTS][:tables]
+    conn = sqlite3.connect(path)
+    for name in names:
+        columns = ["Id"] + rng.sample(ATTRIBUTES, 5)
+        definitions = ", ".join(f"{column} TEXT" for column in columns[1:])
+        conn.execute(f'CREATE TABLE "{name}" (Id INTEGER PRIMARY KEY, {definitions})')
+        conn.executemany(f'INSERT INTO "{name}" ({", ".join(columns[1:])}) VALUES ({", ".join("?" * 5)})',
+                         [[rng.choice(CITIES) if column == "City" else f"{column.lower()}{i}"
+                           for column in columns[1:]] for i in range(5)])
+    conn.commit()
+    conn.close()
+    return names
+
+def questions_for(path: str, names, count: int, seed: int = 1):
+    """Questions that each refer to one table and one of its columns, with the table.
+
+    Every third question misspells the table, dropping a letter, to exercise fuzzy matching.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    questions = []
+    for name in rng.sample(names, min(count, len(names))):
+        column = rng.choice([row[1] for row in conn.execute(f'PRAGMA table_info("{name}")')][1:])
+        words = " ".join(part.lower() for part in re.findall(r"[A-Z][a-z]+", name))
+        if len(questions) % 3 == 2:
+            drop = rng.randrange(1, len(words) - 1)
+            words = words[:drop] + words[drop + 1:]
+        questions.append((f"What is the {column.lower()} of each {words}?", name))
+    conn.close()
+    return questions
+
+def time_encode(encoder: PromptEncoder, model, questions, max_tokens: int):
+    """Mean prompt tokens, ms to build the prompt ids and ms to run the model encoder, per question.
+
+    The model encoder is skipped (None) for prompts longer than ``max_tokens``.
+    """
+    start = time.perf_counter()
+    prompts = [encoder.encode([question])[0] for question in questions]
+    build_ms = 1000 * (time.perf_counter() - start) / len(questions)
+    encoder_ms = None
+    if max(map(len, prompts)) <= max_tokens:
+        start = time.perf_counter()
+        with torch.no_grad():
+            for ids in prompts:
+                model.get_encoder()(input_ids=torch.tensor([ids]))
+        encoder_ms = 1000 * (time.perf_counter() - start) / len(prompts)
+    return sum(map(len, prompts)) / len(prompts), build_ms, encoder_ms
+
+def run_benchmark(sizes=(1, 10, 100, 1000), questions: int = 50, max_tokens: int = 4096):
+    """Measure prompt length and latency against schema size, with and without schema linking.
+
+    Recall is the share of questions whose table is in the linked schema.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(config.MODEL_NAME)
+    model = AutoModelForSeq2SeqLM.from_pretrained(config.MODEL_NAME).eval()
+    print(f"{'tables':>7} {'full tokens':>12} {'build ms':>9} {'encoder ms':>11} "
+          f"{'linked tokens':>14} {'build ms':>9} {'encoder ms':>11} {'index ms':>9} {'recall':>7}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "schema.db")
+            names = create_schema(path, size)
+            probe = questions_for(path, names, questions)
+            texts = [question for question, _ in probe]
+            start = time.perf_counter()
+            linker = get_schema_linker(path, config.SCHEMA_SAMPLE_VALUES)
+            index_ms = 1000 * (time.perf_counter() - start)
+            found = sum(1 for question, table in probe
+                        if table in linker.link(question, config.SCHEMA_MAX_TABLES, config.SCHEMA_MAX_COLUMNS))
+            full = PromptEncoder(tokenizer, db_path=path)
+            linked = PromptEncoder(tokenizer, db_path=path, max_tables=config.SCHEMA_MAX_TABLES,
+                                   max_columns=config.SCHEMA_MAX_COLUMNS, sample_values=config.SCHEMA_SAMPLE_VALUES)
+            columns = []
+            for encoder in (full, linked):
+                tokens, build_ms, encoder_ms = time_encode(encoder, model, texts, max_tokens)
+                encoder_text = f"{encoder_ms:>11.1f}" if encoder_ms is not None else f"{'-':>11}"
+                columns.append(f"{tokens:>{14 if encoder is linked else 12}.0f} {build_ms:>9.2f} {encoder_text}")
+            print(f"{size:>7} {columns[0]} {columns[1]} {index_ms:>9.0f} {found / len(probe):>7.2f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticCache, embed_question
+
+ENTITIES = {"name": ["Sales", "Marketing", "Engineering", "HR", "Finance"],
+            "manager": ["John Smith", "Jane Doe", "Bob Wilson", "Sarah Johnson", "Mike Brown"]}
+
+QUERIES = ["who runs Sales", "Show every department", "which department does Jane Doe lead",
+           "List department names", "Who heads Finance?"]
+
+def fill(cache: SemanticCache, size: int, chunk: int = 100000):
+    """Fill the index with random unit vectors (embedding 1M questions would dominate the run)."""
+    rng = np.random.default_rng(0)
+    for start in range(0, size, chunk):
+        n = min(chunk, size - start)
+        vectors = rng.standard_normal((n, cache.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for slot in cache._index.add(vectors):
+            cache._entries[slot] = ("SELECT * FROM Departments;", [])
+
+def run_benchmark(sizes=(10000, 1000000), repeats: int = 200):
+    """Measure lookup latency (embedding plus cosine search) at several index sizes."""
+    embed_start = time.perf_counter()
+    for _ in range(repeats):
+        embed_question(QUERIES[0])
+    embed_ms = 1000 * (time.perf_counter() - embed_start) / repeats
+    print(f"embedding only: {embed_ms:.3f} ms")
+
+    print(f"{'entries':>9} {'mean ms':>8} {'p99 ms':>8} {'index MB':>9}")
+    for size in sizes:
+        cache = SemanticCache(lambda: ENTITIES, max_entries=size)
+        fill(cache, size)
+        latencies = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            cache.get(QUERIES[i % len(QUERIES)])
+            latencies.append(1000 * (time.perf_counter() - start))
+        index_mb = cache._index._vectors.nbytes / 2 ** 20
+        print(f"{size:>9} {np.mean(latencies):>8.3f} {np.percentile(latencies, 99):>8.3f} {index_mb:>9.0f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers import T5ForConditionalGeneration
+
+import config
+from app import generate_batch
+from engine import T5Engine
+
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Show departments sorted by name",
+    "What is the name of the department with id 2?",
+    "List departments whose manager is Sarah",
+]
+
+def time_questions(engine: T5Engine, repeats: int):
+    """Generate SQL for every question one at a time; return (SQL per question, mean ms)."""
+    sql = [result.sql or result.error for result in generate_batch(engine, QUESTIONS, "greedy", 1)]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for question in QUESTIONS:
+            generate_batch(engine, [question], "greedy", 1)
+    return sql, 1000 * (time.perf_counter() - start) / (repeats * len(QUESTIONS))
+
+def run_benchmark(draft_model: str = config.DRAFT_MODEL or "google/flan-t5-small", repeats: int = 3):
+    """Compare plain greedy decoding against speculative decoding with a draft model."""
+    base = T5Engine.from_pretrained(config.MODEL_NAME)
+    speculative = T5Engine(base.model, base.tokenizer, draft_tokens=config.DRAFT_TOKENS,
+                           draft_model=T5ForConditionalGeneration.from_pretrained(draft_model))
+
+    base_sql, base_ms = time_questions(base, repeats)
+    speculative_sql, speculative_ms = time_questions(speculative, repeats)
+    stats = speculative.speculative_stats()
+
+    for question, expected, actual in zip(QUESTIONS, base_sql, speculative_sql):
+        print(f"{'same' if expected == actual else 'DIFF'}  {question!r} -> {actual}")
+    print(f"{config.MODEL_NAME}: {base_ms:.1f} ms per question")
+    print(f"{config.MODEL_NAME} + {draft_model} ({config.DRAFT_TOKENS} draft tokens): "
+          f"{speculative_ms:.1f} ms per question, {base_ms / speculative_ms:.2f}x speedup")
+    print(f"accepted {stats['accepted_per_step']:.2f} draft tokens per step "
+          f"({100 * stats['acceptance_rate']:.0f}% of drafted), {stats['tokens_per_step']:.2f} tokens per step")
+    print(f"identical output: {sum(a == b for a, b in zip(base_sql, speculative_sql))}/{len(QUESTIONS)}")
+
+if __name__ == "__main__":
+    run_benchmark()
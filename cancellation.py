@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from transformers import StoppingCriteria
+
+class GenerationCancelled(Exception):
+    """Raised for a generation whose cancel token was set before it finished."""
+
+class CancelToken:
+    """A flag that asks work in progress to stop at its next check."""
+    def __init__(self):
+        self._event = threading.Event()
+        self.cancelled_at: Optional[float] = None
+
+    def cancel(self):
+        if not self._event.is_set():
+            self.cancelled_at = time.perf_counter()
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+class CancelStoppingCriteria(StoppingCriteria):
+    """Stops ``generate`` between decoder steps once every row's cancel token is set.
+
+    Rows of a shared batch can belong to different requests, so one
+    cancelled row does not stop the others.
+    """
+    def __init__(self, tokens: List[CancelToken]):
+        self.tokens = tokens
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return all(token.cancelled for token in self.tokens)
+
+class GenerationJob:
+    """A generation running on a worker thread for one question, with its cancel token."""
+    def __init__(self, question: str, future: Future, token: CancelToken, on_cancel: Callable[[], None]):
+        self.question = question
+        self.future = future
+        self.token = token
+        self._on_cancel = on_cancel
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def cancel(self):
+        """Ask the generation to stop; counted only if it was still running."""
+        if not self.token.cancelled and not self.future.done():
+            self._on_cancel()
+        self.token.cancel()
+
+class JobRunner:
+    """Runs generation jobs on worker threads so that callers can wait, detach and cancel.
+
+    ``fn(token)`` gets the job's CancelToken and is expected to stop soon
+    after it is set, e.g. via CancelStoppingCriteria.
+    """
+    def __init__(self, max_workers: int = 32):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.cancelled = 0
+
+    def _count_cancel(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def submit(self, question: str, fn: Callable[[CancelToken], object]) -> GenerationJob:
+        """Start ``fn`` for a question; returns the job."""
+        token = CancelToken()
+        with self._lock:
+            self.submitted += 1
+        return GenerationJob(question, self._executor.submit(fn, token), token, self._count_cancel)
+
+    def stats(self) -> Dict[str, int]:
+        """Jobs started, and jobs cancelled before they finished."""
+        with self._lock:
+            return {"submitted": self.submitted, "cancelled": self.cancelled}
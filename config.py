@@ -0,0 +1,124 @@
+import os
+
+# All settings can be overridden through environment variables, which is
+# how Render passes configuration (see render.yaml).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_NAME = os.environ.get("NL2SQL_MODEL", "google/flan-t5-base")
+
+# SQLite database questions are answered from; prompts describe its schema
+DB_PATH = os.environ.get("NL2SQL_DB_PATH", os.path.join(BASE_DIR, "database.db"))
+
+# Schema linking: for schemas with more than SCHEMA_MAX_TABLES tables (or
+# tables with more than SCHEMA_MAX_COLUMNS columns), the prompt only lists
+# the tables and columns the question refers to; 0 lists the whole schema
+SCHEMA_MAX_TABLES = int(os.environ.get("NL2SQL_SCHEMA_MAX_TABLES", "8"))
+SCHEMA_MAX_COLUMNS = int(os.environ.get("NL2SQL_SCHEMA_MAX_COLUMNS", "16"))
+SCHEMA_SAMPLE_VALUES = int(os.environ.get("NL2SQL_SCHEMA_SAMPLE_VALUES", "10"))
+
+# Few-shot examples: the EXAMPLES_K examples most similar to the question are
+# retrieved from the EXAMPLES_PATH bank and included within
+# EXAMPLES_TOKEN_BUDGET tokens; 0 uses the fixed few-shot prompt
+EXAMPLES_PATH = os.environ.get("NL2SQL_EXAMPLES_PATH", os.path.join(BASE_DIR, "examples.jsonl"))
+EXAMPLES_K = int(os.environ.get("NL2SQL_EXAMPLES_K", "3"))
+EXAMPLES_TOKEN_BUDGET = int(os.environ.get("NL2SQL_EXAMPLES_TOKEN_BUDGET", "96"))
+
+# Inference backend used by load_model(): "torch", "torch-int8" or "onnx"
+BACKEND = os.environ.get("NL2SQL_BACKEND", "torch")
+
+# Where exported (int8 quantized) ONNX artifacts are written and reused from
+ONNX_DIR = os.environ.get("NL2SQL_ONNX_DIR", os.path.join(BASE_DIR, "onnx_models"))
+
+# Intra-op threads for torch and ONNX Runtime; 0 uses the container's CPU quota
+NUM_THREADS = int(os.environ.get("NL2SQL_NUM_THREADS", "0"))
+
+# Startup autotuning: the first start on a host times each backend in
+# AUTOTUNE_BACKENDS at thread counts up to the CPU quota and each of
+# AUTOTUNE_BATCH_SIZES, and saves the fastest to PROFILE_PATH; later starts
+# with the same model, CPU quota and library versions reuse it. Backend,
+# thread count and batch size set explicitly are not tuned
+AUTOTUNE = os.environ.get("NL2SQL_AUTOTUNE", "1") == "1"
+AUTOTUNE_BACKENDS = os.environ.get("NL2SQL_AUTOTUNE_BACKENDS",
+                                   os.environ.get("NL2SQL_BACKEND", "torch,torch-int8,onnx")).split(",")
+AUTOTUNE_BATCH_SIZES = [int(n) for n in os.environ.get("NL2SQL_AUTOTUNE_BATCH_SIZES",
+                                                       os.environ.get("NL2SQL_BATCH_MAX_SIZE", "1,4,16")).split(",")]
+PROFILE_PATH = os.environ.get("NL2SQL_PROFILE_PATH", os.path.join(BASE_DIR, "host_profile.json"))
+
+# Decoding strategy: "greedy" (default) or "beam" are deterministic, so their
+# output can be cached; "sample" reproduces the original sampling behaviour
+DECODING = os.environ.get("NL2SQL_DECODING", "greedy")
+NUM_BEAMS = int(os.environ.get("NL2SQL_NUM_BEAMS", "3"))
+SEED = int(os.environ.get("NL2SQL_SEED", "42"))
+
+# Decoder token budget: BASE + PER_TOKEN * question tokens, capped at MAX_NEW_TOKENS
+MAX_NEW_TOKENS = int(os.environ.get("NL2SQL_MAX_NEW_TOKENS", "128"))
+TOKEN_BUDGET_BASE = int(os.environ.get("NL2SQL_TOKEN_BUDGET_BASE", "24"))
+TOKEN_BUDGET_PER_TOKEN = float(os.environ.get("NL2SQL_TOKEN_BUDGET_PER_TOKEN", "2"))
+
+# Restrict decoding to SELECT statements over the live database schema
+CONSTRAINED_DECODING = os.environ.get("NL2SQL_CONSTRAINED", "1") == "1"
+
+# Question -> SQL cache: in-memory LRU entries, SQLite file shared by processes
+CACHE_ENABLED = os.environ.get("NL2SQL_CACHE", "1") == "1"
+CACHE_PATH = os.environ.get("NL2SQL_CACHE_PATH", os.path.join(BASE_DIR, "sql_cache.db"))
+CACHE_SIZE = int(os.environ.get("NL2SQL_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("NL2SQL_CACHE_TTL", "86400"))
+
+# Near-duplicate (paraphrase) cache consulted after an exact cache miss
+SEMANTIC_CACHE_ENABLED = os.environ.get("NL2SQL_SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("NL2SQL_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.environ.get("NL2SQL_SEMANTIC_CACHE_SIZE", "100000"))
+
+# Micro-batching: concurrent questions for the default model are collected
+# for up to BATCH_MAX_WAIT_MS (or BATCH_MAX_SIZE questions) and run as one batch
+MICRO_BATCHING = os.environ.get("NL2SQL_MICRO_BATCHING", "1") == "1"
+BATCH_MAX_SIZE = int(os.environ.get("NL2SQL_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("NL2SQL_BATCH_MAX_WAIT_MS", "5"))
+
+# Continuous batching: greedy decoding on the torch backends runs through a
+# scheduler where sequences join and leave the running batch at every step
+CONTINUOUS_BATCHING = os.environ.get("NL2SQL_CONTINUOUS_BATCHING", "1") == "1"
+
+# Admission control: questions that need the model are limited per session
+# to SESSION_RATE per second (bursts of SESSION_BURST), wait in a queue of at
+# most ADMISSION_QUEUE_SIZE shared fairly across sessions, and run at most
+# ADMISSION_CONCURRENCY at a time
+ADMISSION = os.environ.get("NL2SQL_ADMISSION", "1") == "1"
+ADMISSION_QUEUE_SIZE = int(os.environ.get("NL2SQL_ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_CONCURRENCY = int(os.environ.get("NL2SQL_ADMISSION_CONCURRENCY", "16"))
+SESSION_RATE = float(os.environ.get("NL2SQL_SESSION_RATE", "1"))
+SESSION_BURST = float(os.environ.get("NL2SQL_SESSION_BURST", "5"))
+
+# SLO-driven degradation: when the p95 latency of recent answers exceeds
+# SLO_MS, or the admission queue exceeds DEGRADE_QUEUE_DEPTH, questions go to
+# SMALL_MODEL (e.g. google/flan-t5-small; skipped when empty), then only to
+# templates and caches; recovery is one step per DEGRADE_COOLDOWN_S seconds
+DEGRADATION = os.environ.get("NL2SQL_DEGRADATION", "1") == "1"
+SLO_MS = float(os.environ.get("NL2SQL_SLO_MS", "2000"))
+DEGRADE_QUEUE_DEPTH = int(os.environ.get("NL2SQL_DEGRADE_QUEUE_DEPTH", "32"))
+DEGRADE_COOLDOWN_S = float(os.environ.get("NL2SQL_DEGRADE_COOLDOWN_S", "10"))
+SMALL_MODEL = os.environ.get("NL2SQL_SMALL_MODEL", "")
+
+# Speculative greedy decoding: a smaller model sharing the tokenizer (e.g.
+# google/flan-t5-small) proposes DRAFT_TOKENS tokens that the main model
+# checks in one pass. Off when empty; torch backends only
+DRAFT_MODEL = os.environ.get("NL2SQL_DRAFT_MODEL", "")
+DRAFT_TOKENS = int(os.environ.get("NL2SQL_DRAFT_TOKENS", "4"))
+
+# SQL candidates generated per question in one call (beam search when > 1);
+# the first one SQLite can compile is used
+CANDIDATES = int(os.environ.get("NL2SQL_CANDIDATES", "1"))
+DB_POOL_SIZE = int(os.environ.get("NL2SQL_DB_POOL_SIZE", "4"))
+
+# Concurrent identical questions (after normalization), and identical SQL
+# statements, share one in-flight generation or execution
+COALESCING = os.environ.get("NL2SQL_COALESCING", "1") == "1"
+
+# Shared inference server (inference_server.py). When NL2SQL_INFERENCE_URL is
+# set ("http://127.0.0.1:8502" or "unix:///path/to.sock"), the app sends
+# generation there instead of loading its own copy of the model
+INFERENCE_URL = os.environ.get("NL2SQL_INFERENCE_URL", "")
+INFERENCE_TIMEOUT = float(os.environ.get("NL2SQL_INFERENCE_TIMEOUT", "60"))
+SERVER_HOST = os.environ.get("NL2SQL_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("NL2SQL_SERVER_PORT", "8502"))
+SERVER_SOCKET = os.environ.get("NL2SQL_SERVER_SOCKET", "")
@@ -0,0 +1,53 @@
+import contextlib
+import logging
+import queue
+import sqlite3
+import threading
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """A fixed-size pool of read-only SQLite connections shared by threads.
+
+    Connections are opened lazily, up to ``size``; callers beyond that wait
+    for one to be returned.
+    """
+    def __init__(self, db_path: str, size: int = 4):
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        logger.info(f"Opening pooled connection to {self.db_path}")
+        return sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True, check_same_thread=False)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._opened < self.size:
+                    conn = self._open()
+                    self._opened += 1
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def is_valid(self, sql: str) -> bool:
+        """Check that SQLite can compile a statement, without running it."""
+        with self.connection() as conn:
+            try:
+                conn.execute(f"EXPLAIN {sql}")
+                return True
+            except sqlite3.Error as e:
+                logger.info(f"Rejected SQL candidate ({str(e)}): {sql}")
+                return False
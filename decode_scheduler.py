@@ -0,0 +1,250 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, NamedTuple, Optional
+
+import torch
+
+from cancellation import CancelToken, GenerationCancelled
+
+logger = logging.getLogger(__name__)
+
+class DecodeRequest(NamedTuple):
+    input_ids: List[int]
+    max_new_tokens: int
+    prefix_allowed_tokens_fn: Optional[Callable]
+    stop: Optional[Callable[[List[int]], bool]]
+    cancel: Optional[CancelToken]
+    future: Future
+
+class _Batch:
+    """Decoder state of the running sequences, one row per sequence.
+
+    Self-attention caches are left-padded to a common length (T5's relative
+    position bias only depends on distances back from the newest token, so
+    left padding does not change it) and cross-attention caches and encoder
+    states are right-padded like the encoder input.
+    """
+    def __init__(self, requests, tokens, past, self_mask, encoder_states, encoder_mask):
+        self.requests: List[DecodeRequest] = requests
+        self.tokens: List[List[int]] = tokens
+        self.past = past
+        self.self_mask = self_mask
+        self.encoder_states = encoder_states
+        self.encoder_mask = encoder_mask
+
+    def __len__(self):
+        return len(self.requests)
+
+    def select(self, rows: List[int]) -> "_Batch":
+        """Keep only ``rows``, trimming padding no remaining row needs."""
+        index = torch.tensor(rows, device=self.self_mask.device)
+        self_mask = self.self_mask.index_select(0, index)
+        encoder_mask = self.encoder_mask.index_select(0, index)
+        start = int((self_mask.cumsum(1) == 0).sum(1).min())
+        end = int(encoder_mask.sum(1).max())
+        past = tuple((sk.index_select(0, index)[:, :, start:], sv.index_select(0, index)[:, :, start:],
+                      ck.index_select(0, index)[:, :, :end], cv.index_select(0, index)[:, :, :end])
+                     for sk, sv, ck, cv in self.past)
+        return _Batch([self.requests[r] for r in rows], [self.tokens[r] for r in rows], past,
+                      self_mask[:, start:], self.encoder_states.index_select(0, index)[:, :end], encoder_mask[:, :end])
+
+    @staticmethod
+    def merge(a: "_Batch", b: "_Batch") -> "_Batch":
+        """Concatenate two batches, padding their caches to common lengths."""
+        self_length = max(a.self_mask.shape[1], b.self_mask.shape[1])
+        encoder_length = max(a.encoder_mask.shape[1], b.encoder_mask.shape[1])
+
+        def left(t, dim):
+            pad = self_length - t.shape[dim]
+            return t if pad == 0 else torch.cat([t.new_zeros(*t.shape[:dim], pad, *t.shape[dim + 1:]), t], dim)
+
+        def right(t, dim):
+            pad = encoder_length - t.shape[dim]
+            return t if pad == 0 else torch.cat([t, t.new_zeros(*t.shape[:dim], pad, *t.shape[dim + 1:])], dim)
+
+        past = tuple((torch.cat([left(sa, 2), left(sb, 2)]), torch.cat([left(va, 2), left(vb, 2)]),
+                      torch.cat([right(ca, 2), right(cb, 2)]), torch.cat([right(xa, 2), right(xb, 2)]))
+                     for (sa, va, ca, xa), (sb, vb, cb, xb) in zip(a.past, b.past))
+        return _Batch(a.requests + b.requests, a.tokens + b.tokens, past,
+                      torch.cat([left(a.self_mask, 1), left(b.self_mask, 1)]),
+                      torch.cat([right(a.encoder_states, 1), right(b.encoder_states, 1)]),
+                      torch.cat([right(a.encoder_mask, 1), right(b.encoder_mask, 1)]))
+
+class DecodeScheduler:
+    """Greedy decoding with iteration-level (continuous) batching.
+
+    Requests are decoded together, one decoder step at a time, on a single
+    worker thread. A sequence leaves the batch as soon as it finishes (EOS,
+    ``stop`` returns True, or its own ``max_new_tokens`` is reached) and
+    newly submitted questions join at the next step: their encoder pass and
+    first decoder step run as a prefill, then their caches are merged into
+    the running batch. A request whose ``cancel`` token is set leaves at the
+    next step too, its future failing with GenerationCancelled. A request
+    whose ``prefix_allowed_tokens_fn`` or ``stop`` raises leaves with that
+    error while the others keep decoding. Results are the generated ids,
+    without the decoder start token.
+    """
+    def __init__(self, model, max_batch_size: int = 16):
+        self.model = model
+        self.config = model.config
+        self.max_batch_size = max_batch_size
+        self.scale = self.config.d_model ** -0.5 if self.config.tie_word_embeddings else 1.0
+        self._queue: "queue.Queue[DecodeRequest]" = queue.Queue()
+        self.steps = 0
+        self.sequences = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self._worker = threading.Thread(target=self._run, name="decode-scheduler", daemon=True)
+        self._worker.start()
+
+    @property
+    def device(self):
+        return self.model.device
+
+    def submit(self, input_ids: List[int], max_new_tokens: int, prefix_allowed_tokens_fn=None,
+               stop: Optional[Callable[[List[int]], bool]] = None, cancel: Optional[CancelToken] = None) -> Future:
+        """Queue a prompt; the future resolves to its generated token ids.
+
+        ``prefix_allowed_tokens_fn(0, ids)`` gets the decoder ids so far
+        (starting with the decoder start token) like in ``generate``;
+        ``stop(generated_ids)`` ends a sequence early and ``cancel`` drops it.
+        """
+        future = Future()
+        self._queue.put(DecodeRequest(list(input_ids), max_new_tokens, prefix_allowed_tokens_fn, stop, cancel, future))
+        return future
+
+    def _fail(self, request: DecodeRequest, error: Exception):
+        logger.error(f"Decoding a sequence failed: {str(error)}")
+        self.failed += 1
+        request.future.set_exception(error)
+
+    def _next_tokens(self, logits, batch_tokens, requests) -> List[int]:
+        for row, request in enumerate(requests):
+            # A failed row keeps a placeholder token until it is retired
+            if request.prefix_allowed_tokens_fn is not None and not request.future.done():
+                ids = torch.tensor([self.config.decoder_start_token_id] + batch_tokens[row])
+                try:
+                    allowed = request.prefix_allowed_tokens_fn(0, ids)
+                except Exception as e:
+                    self._fail(request, e)
+                    continue
+                mask = torch.full_like(logits[row], float("-inf"))
+                mask[allowed] = 0
+                logits[row] += mask
+        return logits.argmax(-1).tolist()
+
+    def _logits(self, decoder_outputs):
+        return self.model.lm_head(decoder_outputs.last_hidden_state[:, -1] * self.scale)
+
+    def _prefill(self, requests: List[DecodeRequest]) -> _Batch:
+        length = max(len(r.input_ids) for r in requests)
+        input_ids = torch.full((len(requests), length), self.config.pad_token_id, dtype=torch.long)
+        encoder_mask = torch.zeros((len(requests), length), dtype=torch.long)
+        for row, request in enumerate(requests):
+            input_ids[row, :len(request.input_ids)] = torch.tensor(request.input_ids)
+            encoder_mask[row, :len(request.input_ids)] = 1
+        input_ids, encoder_mask = input_ids.to(self.device), encoder_mask.to(self.device)
+        encoder_states = self.model.encoder(input_ids=input_ids, attention_mask=encoder_mask,
+                                            return_dict=True).last_hidden_state
+        start = torch.full((len(requests), 1), self.config.decoder_start_token_id, dtype=torch.long,
+                           device=self.device)
+        decoder_outputs = self.model.decoder(input_ids=start, encoder_hidden_states=encoder_states,
+                                             encoder_attention_mask=encoder_mask, use_cache=True, return_dict=True)
+        tokens = [[token] for token in self._next_tokens(self._logits(decoder_outputs),
+                                                         [[] for _ in requests], requests)]
+        self_mask = torch.ones((len(requests), 1), dtype=torch.long, device=self.device)
+        return _Batch(list(requests), tokens, decoder_outputs.past_key_values, self_mask,
+                      encoder_states, encoder_mask)
+
+    def _step(self, batch: _Batch):
+        last = torch.tensor([tokens[-1] for tokens in batch.tokens], device=self.device).unsqueeze(1)
+        self_mask = torch.cat([batch.self_mask, batch.self_mask.new_ones((len(batch), 1))], 1)
+        decoder_outputs = self.model.decoder(input_ids=last, attention_mask=self_mask,
+                                             encoder_hidden_states=batch.encoder_states,
+                                             encoder_attention_mask=batch.encoder_mask,
+                                             past_key_values=batch.past, use_cache=True, return_dict=True)
+        for tokens, token in zip(batch.tokens, self._next_tokens(self._logits(decoder_outputs),
+                                                                 batch.tokens, batch.requests)):
+            tokens.append(token)
+        batch.past = decoder_outputs.past_key_values
+        batch.self_mask = self_mask
+
+    def _finished(self, request: DecodeRequest, tokens: List[int]) -> bool:
+        return (tokens[-1] == self.config.eos_token_id or len(tokens) >= request.max_new_tokens
+                or (request.stop is not None and request.stop(tokens)))
+
+    def _drop_cancelled(self, request: DecodeRequest) -> bool:
+        if request.cancel is None or not request.cancel.cancelled:
+            return False
+        self.cancelled += 1
+        request.future.set_exception(GenerationCancelled())
+        return True
+
+    def _retire(self, batch: _Batch) -> Optional[_Batch]:
+        keep = []
+        for row, (request, tokens) in enumerate(zip(batch.requests, batch.tokens)):
+            # Done already when it failed this step, or its caller cancelled the future
+            if request.future.done() or self._drop_cancelled(request):
+                continue
+            try:
+                finished = self._finished(request, tokens)
+            except Exception as e:
+                self._fail(request, e)
+                continue
+            if finished:
+                request.future.set_result(tokens)
+            else:
+                keep.append(row)
+        if not keep:
+            return None
+        return batch if len(keep) == len(batch) else batch.select(keep)
+
+    def _admit(self, running: Optional[_Batch]) -> List[DecodeRequest]:
+        free = self.max_batch_size - (len(running) if running else 0)
+        requests = []
+        # Block only when nothing is being decoded
+        if running is None:
+            requests.append(self._queue.get())
+        while len(requests) < free:
+            try:
+                requests.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return [request for request in requests
+                if not request.future.done() and not self._drop_cancelled(request)]
+
+    def _run(self):
+        running: Optional[_Batch] = None
+        while True:
+            requests = self._admit(running)
+            started = time.perf_counter()
+            try:
+                with torch.inference_mode():
+                    joined = None
+                    if requests:
+                        joined = self._retire(self._prefill(requests))
+                        self.sequences += len(requests)
+                    if running is not None:
+                        self._step(running)
+                        self.steps += 1
+                        running = self._retire(running)
+                    if joined is not None:
+                        running = joined if running is None else _Batch.merge(running, joined)
+            except Exception as e:
+                logger.error(f"Decode step failed: {str(e)}")
+                failed = list(requests) + (running.requests if running is not None else [])
+                for request in failed:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                running = None
+            self.busy_time += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        """Get decoder step and sequence counters."""
+        return {"steps": self.steps, "sequences": self.sequences, "cancelled": self.cancelled,
+                "failed": self.failed, "queued": self._queue.qsize(),
+                "busy_seconds": self.busy_time}
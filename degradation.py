@@ -0,0 +1,102 @@
+import collections
+import logging
+import threading
+import time
+from typing import Callable, Deque, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tiers from full service to most degraded; "template" and "cache" answers
+# are recorded too but never chosen, since they are always tried first
+BASE = "base"
+SMALL = "small"
+CACHE_ONLY = "cache-only"
+TIERS = ["template", "cache", SMALL, BASE]
+
+class DegradationRouter:
+    """Chooses how much model to spend on a question from recent latency and load.
+
+    Levels go base model, then the small model (when ``has_small``), then
+    templates and caches only. The router steps one level down when the
+    p95 latency of model answers in the last ``cooldown_s`` seconds exceeds
+    ``slo_ms`` or ``queue_depth()`` exceeds ``max_queue_depth``, and one
+    level back up once both are below half of their limits. Only queue
+    depth steps down to templates and caches only: latency alone means
+    slow questions, not too many, and turning the model off does not help. It takes at
+    most one step per ``cooldown_s`` seconds, so each decision only sees
+    latencies from the level it is judging.
+    """
+    def __init__(self, slo_ms: float, queue_depth: Callable[[], int], max_queue_depth: int,
+                 has_small: Callable[[], bool] = lambda: False, cooldown_s: float = 10):
+        self.slo = slo_ms / 1000
+        self.queue_depth = queue_depth
+        self.max_queue_depth = max_queue_depth
+        self.has_small = has_small
+        self.cooldown = cooldown_s
+        self.level = BASE
+        self._changed = 0.0
+        self._lock = threading.Lock()
+        self._recent: Deque[Tuple[float, float]] = collections.deque(maxlen=1000)
+        self._latencies: Dict[str, Deque[float]] = {tier: collections.deque(maxlen=10000) for tier in TIERS}
+        self._requests: Dict[str, int] = collections.Counter()
+        self._valid: Dict[str, int] = collections.Counter()
+
+    def _levels(self) -> List[str]:
+        return [BASE, SMALL, CACHE_ONLY] if self.has_small() else [BASE, CACHE_ONLY]
+
+    def pressure(self) -> Tuple[float, float]:
+        """Recent p95 latency against the SLO and queue depth against its limit (1 = at the limit)."""
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0][0] < now - self.cooldown:
+                self._recent.popleft()
+            latencies = sorted(latency for _, latency in self._recent)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0
+        return p95 / self.slo, self.queue_depth() / self.max_queue_depth
+
+    def load(self) -> float:
+        """The worse of the two pressure() ratios."""
+        return max(self.pressure())
+
+    def choose(self) -> str:
+        """Get the tier that should answer the next question the templates and caches cannot."""
+        latency, queue = self.pressure()
+        load = max(latency, queue)
+        now = time.monotonic()
+        with self._lock:
+            levels = self._levels()
+            index = levels.index(self.level) if self.level in levels else len(levels) - 1
+            if now - self._changed >= self.cooldown:
+                # Slow answers without a backlog (one user with long questions) never turn the model off
+                if load > 1 and index < len(levels) - 1 and (levels[index + 1] != CACHE_ONLY or queue > 1):
+                    index += 1
+                elif load < 0.5 and index > 0:
+                    index -= 1
+                if levels[index] != self.level:
+                    logger.info(f"Serving level {self.level} -> {levels[index]} (load {load:.2f})")
+                    self.level = levels[index]
+                    self._changed = now
+            return self.level
+
+    def record(self, tier: str, latency: float, valid: bool):
+        """Record which tier answered a question, how long it took and whether its SQL compiles."""
+        with self._lock:
+            if tier in (BASE, SMALL):
+                self._recent.append((time.monotonic(), latency))
+            self._latencies.setdefault(tier, collections.deque(maxlen=10000)).append(latency)
+            self._requests[tier] += 1
+            self._valid[tier] += valid
+
+    def stats(self) -> dict:
+        """Get the current level and, per tier, request count, latency percentiles and valid SQL rate."""
+        with self._lock:
+            tiers = {}
+            for tier, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                if not ordered:
+                    continue
+                tiers[tier] = {"requests": self._requests[tier],
+                               "p50_ms": 1000 * ordered[len(ordered) // 2],
+                               "p99_ms": 1000 * ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))],
+                               "valid": self._valid[tier] / self._requests[tier]}
+            return {"level": self.level, "tiers": tiers}
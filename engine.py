@@ -0,0 +1,256 @@
+import logging
+import threading
+from typing import List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+class T5Engine:
+    """Lean greedy generation engine around T5ForConditionalGeneration.
+
+    Holds the model and fast tokenizer directly instead of a transformers
+    pipeline, runs under ``torch.inference_mode`` and decodes with a tight
+    greedy loop over the KV cache. Input, output and logit-mask buffers are
+    preallocated and reused between calls (generation is serialized by a
+    lock, since the buffers are shared). Sampling and beam search fall back
+    to ``model.generate``.
+
+    With a ``draft_model`` (a smaller T5 sharing the tokenizer), greedy
+    decoding is speculative: the draft proposes up to ``draft_tokens``
+    tokens, the model checks them all in one decoder pass and keeps the
+    longest agreeing prefix plus its own next token, so the output is the
+    model's own greedy output.
+    """
+    def __init__(self, model, tokenizer, max_batch_size: int = 64, max_input_length: int = 512,
+                 max_new_tokens: int = 128, draft_model=None, draft_tokens: int = 4):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.config = model.config
+        self.device = model.device
+        self._lock = threading.Lock()
+        self._allocate(max_batch_size, max_input_length, max_new_tokens)
+        self.draft = draft_model.eval() if draft_model is not None else None
+        self.draft_tokens = draft_tokens
+        if self.draft is not None and self.draft.config.vocab_size != self.config.vocab_size:
+            raise ValueError("The draft model must share the model's vocabulary")
+        self.speculative_steps = 0
+        self.speculative_drafted = 0
+        self.speculative_accepted = 0
+        self.speculative_tokens = 0
+
+    @classmethod
+    def from_pretrained(cls, model_name: str, quantize: bool = False, progress=None,
+                        draft_model_name: Optional[str] = None, **kwargs) -> "T5Engine":
+        """Load the model and fast tokenizer, optionally with dynamic int8 Linear layers.
+
+        ``draft_model_name`` also loads a draft model for speculative
+        decoding; ``progress(fraction, stage)`` is called as loading advances.
+        """
+        from transformers import AutoTokenizer, T5ForConditionalGeneration
+
+        progress = progress or (lambda fraction, stage: None)
+        progress(0.05, "Loading tokenizer")
+        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        progress(0.15, "Loading model weights")
+        model = T5ForConditionalGeneration.from_pretrained(model_name).eval()
+        if quantize:
+            progress(0.8, "Quantizing to int8")
+            # Dynamic int8 quantization of every Linear layer in the T5 stack
+            torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        draft_model = None
+        if draft_model_name:
+            progress(0.85, f"Loading draft model {draft_model_name}")
+            draft_model = T5ForConditionalGeneration.from_pretrained(draft_model_name).eval()
+            if quantize:
+                torch.quantization.quantize_dynamic(draft_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return cls(model, tokenizer, draft_model=draft_model, **kwargs)
+
+    def _allocate(self, batch_size: int, input_length: int, new_tokens: int):
+        vocab_size = self.model.get_output_embeddings().out_features
+        self._input_ids = torch.full((batch_size, input_length), self.config.pad_token_id,
+                                     dtype=torch.long, device=self.device)
+        self._attention_mask = torch.zeros((batch_size, input_length), dtype=torch.long, device=self.device)
+        self._sequences = torch.full((batch_size, new_tokens + 1), self.config.pad_token_id,
+                                     dtype=torch.long, device=self.device)
+        self._logit_mask = torch.empty((batch_size, vocab_size), device=self.device)
+
+    def _ensure_capacity(self, batch_size: int, input_length: int, new_tokens: int):
+        if (batch_size > self._input_ids.shape[0] or input_length > self._input_ids.shape[1]
+                or new_tokens + 1 > self._sequences.shape[1]):
+            self._allocate(max(batch_size, self._input_ids.shape[0]),
+                           max(input_length, self._input_ids.shape[1]),
+                           max(new_tokens, self._sequences.shape[1] - 1))
+
+    def generate(self, input_ids, attention_mask=None, max_new_tokens: Optional[int] = None,
+                 max_length: Optional[int] = None, do_sample: bool = False, num_beams: int = 1,
+                 prefix_allowed_tokens_fn=None, stopping_criteria=None, **kwargs):
+        """Generate output ids; same arguments and result as ``model.generate``."""
+        if max_new_tokens is None:
+            max_new_tokens = (max_length or 20) - 1
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        if do_sample or num_beams > 1:
+            return self.model.generate(input_ids=input_ids, attention_mask=attention_mask,
+                                       max_new_tokens=max_new_tokens, do_sample=do_sample,
+                                       num_beams=num_beams, prefix_allowed_tokens_fn=prefix_allowed_tokens_fn,
+                                       stopping_criteria=stopping_criteria, **kwargs)
+        if self.draft is not None:
+            with torch.inference_mode():
+                return self._speculative_batch(input_ids, attention_mask, max_new_tokens,
+                                               prefix_allowed_tokens_fn, stopping_criteria)
+        with self._lock, torch.inference_mode():
+            return self._greedy(input_ids, attention_mask, max_new_tokens,
+                                prefix_allowed_tokens_fn, stopping_criteria)
+
+    def _greedy(self, input_ids, attention_mask, max_new_tokens: int, prefix_allowed_tokens_fn,
+                stopping_criteria):
+        batch_size, input_length = input_ids.shape
+        self._ensure_capacity(batch_size, input_length, max_new_tokens)
+        ids = self._input_ids[:batch_size, :input_length]
+        ids.copy_(input_ids)
+        mask = self._attention_mask[:batch_size, :input_length]
+        mask.copy_(attention_mask)
+        sequences = self._sequences[:batch_size, :max_new_tokens + 1]
+        sequences.fill_(self.config.pad_token_id)
+        sequences[:, 0] = self.config.decoder_start_token_id
+
+        encoder_hidden_states = self.model.encoder(input_ids=ids, attention_mask=mask,
+                                                   return_dict=True).last_hidden_state
+        scale = self.config.d_model ** -0.5 if self.config.tie_word_embeddings else 1.0
+        finished = torch.zeros(batch_size, dtype=torch.bool, device=self.device)
+        past = None
+        length = 1
+        for step in range(max_new_tokens):
+            decoder_outputs = self.model.decoder(input_ids=sequences[:, step:step + 1],
+                                                 encoder_hidden_states=encoder_hidden_states,
+                                                 encoder_attention_mask=mask,
+                                                 past_key_values=past,
+                                                 use_cache=True,
+                                                 return_dict=True)
+            past = decoder_outputs.past_key_values
+            logits = self.model.lm_head(decoder_outputs.last_hidden_state[:, -1] * scale)
+            if prefix_allowed_tokens_fn is not None:
+                logit_mask = self._logit_mask[:batch_size, :logits.shape[-1]]
+                logit_mask.fill_(float("-inf"))
+                for row in range(batch_size):
+                    logit_mask[row, prefix_allowed_tokens_fn(row, sequences[row, :step + 1])] = 0
+                logits = logits + logit_mask
+
+            next_tokens = logits.argmax(-1)
+            next_tokens.masked_fill_(finished, self.config.pad_token_id)
+            sequences[:, step + 1] = next_tokens
+            finished |= next_tokens == self.config.eos_token_id
+            length = step + 2
+            if finished.all():
+                break
+            if stopping_criteria and stopping_criteria(sequences[:, :length], logits):
+                break
+
+        # The buffer is reused by the next call, so hand back a copy
+        return sequences[:, :length].clone()
+
+    @staticmethod
+    def _pick(logits, tokens: List[int], prefix_allowed_tokens_fn, row: int) -> int:
+        """Greedy token for one position, restricted to the allowed tokens."""
+        if prefix_allowed_tokens_fn is None:
+            return int(logits.argmax())
+        allowed = prefix_allowed_tokens_fn(row, torch.tensor(tokens))
+        return int(allowed[int(logits[allowed].argmax())])
+
+    @staticmethod
+    def _crop(past, length: int):
+        """Drop self-attention cache entries past ``length`` tokens."""
+        return tuple((sk[:, :, :length], sv[:, :, :length], ck, cv) for sk, sv, ck, cv in past)
+
+    def _speculative_batch(self, input_ids, attention_mask, max_new_tokens: int, prefix_allowed_tokens_fn,
+                           stopping_criteria):
+        """Speculative greedy decoding, one sequence at a time, padded like ``model.generate``."""
+        rows = [self._speculative(input_ids[row:row + 1], attention_mask[row:row + 1], row, max_new_tokens,
+                                  prefix_allowed_tokens_fn, stopping_criteria)
+                for row in range(input_ids.shape[0])]
+        sequences = torch.full((len(rows), max(len(tokens) for tokens in rows)), self.config.pad_token_id,
+                               dtype=torch.long, device=self.device)
+        for row, tokens in enumerate(rows):
+            sequences[row, :len(tokens)] = torch.tensor(tokens)
+        return sequences
+
+    def _speculative(self, input_ids, attention_mask, row: int, max_new_tokens: int, prefix_allowed_tokens_fn,
+                     stopping_criteria) -> List[int]:
+        # Tokens already in each KV cache; the last accepted token never is
+        target_cached = draft_cached = 0
+        target_past = draft_past = None
+        target_scale = self.config.d_model ** -0.5 if self.config.tie_word_embeddings else 1.0
+        draft_scale = self.draft.config.d_model ** -0.5 if self.draft.config.tie_word_embeddings else 1.0
+        encoder_states = self.model.encoder(input_ids=input_ids, attention_mask=attention_mask,
+                                            return_dict=True).last_hidden_state
+        draft_states = self.draft.encoder(input_ids=input_ids, attention_mask=attention_mask,
+                                          return_dict=True).last_hidden_state
+        tokens = [self.config.decoder_start_token_id]
+        eos = self.config.eos_token_id
+        # Counted per call and added to the engine's totals once, under the lock
+        steps = drafted = accepted_tokens = 0
+        while len(tokens) - 1 < max_new_tokens:
+            # The draft proposes tokens one at a time
+            proposal = []
+            for _ in range(min(self.draft_tokens, max_new_tokens - len(tokens) + 1)):
+                sequence = tokens + proposal
+                outputs = self.draft.decoder(input_ids=torch.tensor([sequence[draft_cached:]], device=self.device),
+                                             encoder_hidden_states=draft_states, encoder_attention_mask=attention_mask,
+                                             past_key_values=draft_past, use_cache=True, return_dict=True)
+                draft_past, draft_cached = outputs.past_key_values, len(sequence)
+                logits = self.draft.lm_head(outputs.last_hidden_state[0, -1] * draft_scale)
+                proposal.append(self._pick(logits, sequence, prefix_allowed_tokens_fn, row))
+                if proposal[-1] == eos:
+                    break
+
+            # The model scores every proposed position in one pass
+            outputs = self.model.decoder(input_ids=torch.tensor([(tokens + proposal)[target_cached:]],
+                                                                device=self.device),
+                                         encoder_hidden_states=encoder_states, encoder_attention_mask=attention_mask,
+                                         past_key_values=target_past, use_cache=True, return_dict=True)
+            target_past, target_cached = outputs.past_key_values, len(tokens) + len(proposal)
+            logits = self.model.lm_head(outputs.last_hidden_state[0, -(len(proposal) + 1):] * target_scale)
+            accepted = []
+            for j in range(len(proposal) + 1):
+                accepted.append(self._pick(logits[j], tokens + proposal[:j], prefix_allowed_tokens_fn, row))
+                if j == len(proposal) or accepted[-1] != proposal[j] or accepted[-1] == eos:
+                    break
+            steps += 1
+            drafted += len(proposal)
+            accepted_tokens += len(accepted) - 1
+
+            done = False
+            for token in accepted:
+                tokens.append(token)
+                if (token == eos or len(tokens) - 1 >= max_new_tokens
+                        or (stopping_criteria and stopping_criteria(torch.tensor([tokens]), None))):
+                    done = True
+                    break
+            if done:
+                break
+            # Rejected proposals are dropped from both caches
+            target_cached = min(target_cached, len(tokens) - 1)
+            draft_cached = min(draft_cached, len(tokens) - 1)
+            target_past = self._crop(target_past, target_cached)
+            draft_past = self._crop(draft_past, draft_cached)
+        with self._lock:
+            self.speculative_steps += steps
+            self.speculative_drafted += drafted
+            self.speculative_accepted += accepted_tokens
+            self.speculative_tokens += len(tokens) - 1
+        return tokens
+
+    def speculative_stats(self) -> dict:
+        """Get accepted draft tokens and generated tokens per model decoder pass."""
+        with self._lock:
+            steps, drafted = self.speculative_steps, self.speculative_drafted
+            accepted, tokens = self.speculative_accepted, self.speculative_tokens
+        return {
+            "steps": steps,
+            "drafted": drafted,
+            "accepted": accepted,
+            "acceptance_rate": accepted / drafted if drafted else 0.0,
+            "accepted_per_step": accepted / steps if steps else 0.0,
+            "tokens_per_step": tokens / steps if steps else 0.0,
+        }
@@ -0,0 +1,176 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from semantic_cache import embed_question
+from sql_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+class Example(NamedTuple):
+    """A question with the SQL that answers it."""
+    question: str
+    sql: str
+
+# Used when no example file exists; the four examples of the original prompt
+DEFAULT_EXAMPLES = [
+    Example("Who manages Sales?", "SELECT Manager FROM Departments WHERE Name = 'Sales';"),
+    Example("Show all departments", "SELECT * FROM Departments;"),
+    Example("List department names", "SELECT Name FROM Departments;"),
+    Example("Find manager of Marketing", "SELECT Manager FROM Departments WHERE Name = 'Marketing';"),
+]
+
+class IVFIndex:
+    """Inverted-file approximate nearest neighbour index over unit vectors.
+
+    Vectors are clustered into about sqrt(n) cells by spherical k-means and
+    a query only scans the ``nprobe`` cells whose centroids are closest.
+    Below ``min_train`` vectors every vector is scanned, which is exact.
+    The cells are re-clustered whenever the index has doubled since the
+    last training; vectors added in between go to their nearest cell.
+    """
+    def __init__(self, dim: int, nprobe: int = 8, min_train: int = 1024, iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.iterations = iterations
+        self.seed = seed
+        self._vectors = np.zeros((64, dim), dtype=np.float32)
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._cells: List[List[int]] = []
+        self._cell_arrays: List[Optional[np.ndarray]] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, vectors: np.ndarray) -> List[int]:
+        """Add row vectors; returns their ids."""
+        vectors = np.atleast_2d(vectors).astype(np.float32)
+        if self._size + len(vectors) > len(self._vectors):
+            grown = np.zeros((max(2 * len(self._vectors), self._size + len(vectors)), self.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+        ids = list(range(self._size, self._size + len(vectors)))
+        self._vectors[self._size:self._size + len(vectors)] = vectors
+        self._size += len(vectors)
+        if self._size >= self.min_train and self._size >= 2 * self._trained_size:
+            self.train()
+        elif self._centroids is not None:
+            for i, cell in zip(ids, (vectors @ self._centroids.T).argmax(1)):
+                self._cells[cell].append(i)
+                self._cell_arrays[cell] = None
+        return ids
+
+    def train(self):
+        """Cluster the stored vectors into cells."""
+        vectors = self._vectors[:self._size]
+        count = max(1, int(np.sqrt(self._size)))
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(self._size, count, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = (vectors @ centroids.T).argmax(1)
+            for cell in range(count):
+                members = vectors[assignment == cell]
+                if len(members):
+                    centroid = members.sum(0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[cell] = centroid / norm if norm else centroid
+                else:
+                    centroids[cell] = vectors[rng.integers(self._size)]
+        assignment = (vectors @ centroids.T).argmax(1)
+        self._centroids = centroids
+        self._cells = [np.flatnonzero(assignment == cell).tolist() for cell in range(count)]
+        self._cell_arrays = [None] * count
+        self._trained_size = self._size
+        logger.info(f"Trained IVF index: {self._size} vectors in {count} cells")
+
+    def _candidates(self, vector: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.arange(self._size)
+        probe = np.argsort(self._centroids @ vector)[-self.nprobe:]
+        for cell in probe:
+            if self._cell_arrays[cell] is None:
+                self._cell_arrays[cell] = np.array(self._cells[cell], dtype=np.int64)
+        return np.concatenate([self._cell_arrays[cell] for cell in probe])
+
+    def search(self, vector: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Get up to ``k`` (id, cosine similarity) pairs, most similar first."""
+        if not self._size:
+            return []
+        ids = self._candidates(vector)
+        scores = self._vectors[ids] @ vector
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(ids))
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+class ExampleStore:
+    """Question/SQL example pairs with an IVF index over their questions.
+
+    Examples are kept in a JSON lines file (one ``{"question", "sql"}``
+    object per line) that ``add`` appends to, so the bank can grow to many
+    thousands of pairs.
+    """
+    def __init__(self, path: Optional[str] = None, examples: Optional[List[Example]] = None, **index_kwargs):
+        self.path = path
+        self.examples: List[Example] = []
+        self.index = IVFIndex(dim=256, **index_kwargs)
+        self._digest = hashlib.sha256()
+        self._lock = threading.Lock()
+        if examples is None:
+            examples = self._load(path) if path and os.path.exists(path) else DEFAULT_EXAMPLES
+        self._extend(examples)
+
+    @staticmethod
+    def _load(path: str) -> List[Example]:
+        with open(path) as f:
+            return [Example(**json.loads(line)) for line in f if line.strip()]
+
+    def _extend(self, examples: List[Example]):
+        if not examples:
+            return
+        vectors = np.stack([embed_question(normalize_question(e.question)) for e in examples])
+        with self._lock:
+            self.examples.extend(examples)
+            self.index.add(vectors)
+            for example in examples:
+                self._digest.update(f"{example.question}\t{example.sql}\n".encode())
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def add(self, question: str, sql: str):
+        """Add an example, appending it to the example file."""
+        example = Example(question, sql)
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(example._asdict()) + "\n")
+        self._extend([example])
+
+    def search(self, question: str, k: int) -> List[Example]:
+        """Get up to ``k`` examples with the most similar questions, most similar first."""
+        vector = embed_question(normalize_question(question))
+        with self._lock:
+            return [self.examples[i] for i, _ in self.index.search(vector, k)]
+
+    def fingerprint(self) -> str:
+        """Hash of every example, which changes whenever the prompt examples may."""
+        with self._lock:
+            return self._digest.copy().hexdigest()[:16]
+
+@functools.lru_cache(maxsize=None)
+def get_example_store(path: str) -> ExampleStore:
+    """Get the shared example store for a file, loading it once."""
+    store = ExampleStore(path)
+    logger.info(f"Loaded {len(store)} few-shot examples from {path if os.path.exists(path) else 'defaults'}")
+    return store
@@ -0,0 +1,88 @@
+import http.client
+import json
+import logging
+import socket
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+class ServerNotReady(Exception):
+    """The inference server is up but its model is still loading."""
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket."""
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+class InferenceClient:
+    """Thin client for inference_server.py.
+
+    ``url`` is ``http://host:port`` or ``unix:///path/to.sock``. A new
+    connection is opened per request, so one client can be shared by threads.
+    """
+    def __init__(self, url: str, timeout: float = 60):
+        self.url = url
+        self.timeout = timeout
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            self._socket_path = parsed.path
+        elif parsed.scheme == "http":
+            self._socket_path = None
+            self._host = parsed.hostname
+            self._port = parsed.port or 80
+        else:
+            raise ValueError(f"Unsupported inference server URL: {url}")
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._socket_path:
+            return UnixHTTPConnection(self._socket_path, self.timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None) -> Tuple[int, dict]:
+        conn = self._connection()
+        try:
+            body = json.dumps(payload).encode() if payload is not None else None
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+
+    def health(self) -> bool:
+        """Whether the server process is up."""
+        try:
+            return self._request("GET", "/healthz")[0] == 200
+        except OSError:
+            return False
+
+    def readiness(self) -> dict:
+        """Get the server's readiness: ``ready``, ``progress`` and ``stage``."""
+        try:
+            return self._request("GET", "/readyz")[1]
+        except OSError as e:
+            return {"ready": False, "progress": 0.0, "stage": f"Unreachable: {str(e)}"}
+
+    def generate(self, questions: List[str], decoding: str) -> List[dict]:
+        """Generate SQL for questions; one ``{sql, error, cacheable, tier, valid}`` dict per question.
+
+        Raises ServerNotReady while the server's model is loading.
+        """
+        try:
+            status, body = self._request("POST", "/generate", {"questions": questions, "decoding": decoding})
+            if status == 503:
+                raise ServerNotReady(body.get("stage", "Model is loading"))
+            if status != 200:
+                raise RuntimeError(body.get("error", f"HTTP {status}"))
+            return body["results"]
+        except ServerNotReady:
+            raise
+        except Exception as e:
+            logger.error(f"Inference server error: {str(e)}")
+            raise
@@ -0,0 +1,155 @@
+import argparse
+import json
+import logging
+import os
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import config
+from batcher import MicroBatcher
+from model_loader import ModelLoader
+
+logger = logging.getLogger(__name__)
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """Serves generation for one shared model.
+
+    ``GET /healthz`` is 200 while the process is up, ``GET /readyz`` is 200
+    once the model is loaded (503 before), ``GET /metrics`` returns the
+    micro-batcher's statistics, and ``POST /generate`` takes
+    ``{"questions": [...], "decoding": "greedy"}`` and returns ``{"results":
+    [{"sql", "error", "cacheable", "tier", "valid"}, ...]}``. Questions
+    from concurrent requests are batched together.
+    """
+    server_version = "NL2SQLInference/1.0"
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _readiness(self) -> dict:
+        loader = self.server.loader
+        return {"ready": loader.ready, "progress": loader.progress, "stage": loader.stage,
+                "error": str(loader.error) if loader.error else None}
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/readyz":
+            readiness = self._readiness()
+            self._send(200 if readiness["ready"] else 503, readiness)
+        elif self.path == "/metrics":
+            self._send(200, self.server.batcher.stats())
+        else:
+            self._send(404, {"error": f"Not found: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._send(404, {"error": f"Not found: {self.path}"})
+            return
+        if not self.server.loader.ready:
+            self._send(503, self._readiness())
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            questions = request["questions"]
+            decoding = request.get("decoding", config.DECODING)
+            if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+                raise ValueError("'questions' must be a list of strings")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"Bad request: {str(e)}"})
+            return
+        try:
+            results = self.server.generate(questions, decoding)
+            self._send(200, {"results": [r._asdict() for r in results]})
+        except Exception as e:
+            logger.error(f"Inference error: {str(e)}")
+            self._send(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.command} {self.path}: " + format % args)
+
+class _ServerMixin:
+    daemon_threads = True
+
+    def attach(self, loader: ModelLoader, batcher: MicroBatcher, generate):
+        self.loader = loader
+        self.batcher = batcher
+        self.generate = generate
+
+class InferenceHTTPServer(_ServerMixin, ThreadingHTTPServer):
+    """Threaded inference server on a localhost TCP port."""
+
+class InferenceUnixServer(_ServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded inference server on a Unix domain socket."""
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("local", 0)
+
+def create_server(host: str = config.SERVER_HOST, port: int = config.SERVER_PORT, socket_path: str = "",
+                  backend: Optional[str] = None):
+    """Create the inference server and start loading its model in the background.
+
+    The server binds immediately, so health checks pass while the model
+    loads; readiness turns on once it has loaded. Without a ``backend``,
+    the host profile picks it (see app.load_default_model()).
+    """
+    # Imported here so the app's module-level setup only runs in the server process
+    from app import generate_sql_queries, load_default_model, uses_continuous_batching
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = InferenceUnixServer(socket_path, InferenceHandler)
+        logger.info(f"Inference server listening on unix://{socket_path}")
+    else:
+        server = InferenceHTTPServer((host, port), InferenceHandler)
+        logger.info(f"Inference server listening on http://{host}:{server.server_address[1]}")
+    batcher = MicroBatcher(lambda questions, decoding: generate_sql_queries(
+                               questions, loader.model, batch_size=config.BATCH_MAX_SIZE, decoding=decoding),
+                           max_batch_size=config.BATCH_MAX_SIZE,
+                           max_wait_ms=config.BATCH_MAX_WAIT_MS)
+
+    def load(progress):
+        model = load_default_model(progress, backend)
+        # The host profile may have tuned the batch size
+        batcher.max_batch_size = config.BATCH_MAX_SIZE
+        return model
+
+    loader = ModelLoader(load)
+
+    def generate(questions, decoding):
+        # The decode scheduler already batches concurrent requests step by step
+        if uses_continuous_batching(loader.model, decoding):
+            return generate_sql_queries(questions, loader.model, decoding=decoding)
+        return batcher.submit_many(questions, decoding)
+
+    server.attach(loader, batcher, generate)
+    loader.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve text-to-SQL generation from one shared model.")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--socket", default=config.SERVER_SOCKET, help="Unix domain socket path (overrides host/port)")
+    parser.add_argument("--backend", default=None,
+                        help="Inference backend (default: the host profile, or NL2SQL_BACKEND without autotuning)")
+    args = parser.parse_args()
+    server = create_server(args.host, args.port, args.socket, args.backend)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
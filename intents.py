@@ -0,0 +1,128 @@
+import logging
+import re
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (intent name, question pattern, SQL template). Patterns are matched against
+# the whole question, case-insensitively and without trailing punctuation.
+# Named groups are entity slots (semantic_cache.entity_slot()); their values
+# must exist in that column. A template only matches when its tables exist.
+INTENTS: List[Tuple[str, str, str]] = [
+    ("list_department_names",
+     r"(?:list|show|get|give me|what are)\s+(?:all\s+)?(?:the\s+)?(?:department\s+names|names\s+of\s+(?:all\s+)?(?:the\s+)?departments)",
+     "SELECT Name FROM Departments;"),
+    ("show_all_departments",
+     r"(?:show|list|display|get|give me)\s+(?:me\s+)?(?:all\s+)?(?:the\s+)?departments",
+     "SELECT * FROM Departments;"),
+    ("manager_of_department",
+     r"(?:who\s+(?:is\s+)?(?:the\s+)?manager\s+(?:of|for)|who\s+(?:manages|runs|heads|leads)"
+     r"|(?:find|show|get)\s+(?:me\s+)?(?:the\s+)?manager\s+(?:of|for))\s+(?:the\s+)?(?P<departments_name>.+?)(?:\s+department)?",
+     "SELECT Manager FROM Departments WHERE Name = ?;"),
+    ("department_managed_by",
+     r"(?:(?:which|what)\s+department\s+(?:is\s+managed\s+by|does)|(?:list|show)\s+(?:the\s+)?departments?\s+managed\s+by)"
+     r"\s+(?P<departments_manager>.+?)(?:\s+manage)?",
+     "SELECT Name FROM Departments WHERE Manager = ?;"),
+]
+
+def intent_slots(intents=INTENTS) -> List[str]:
+    """Get the entity slots the intent patterns bind, in order of first use."""
+    slots: List[str] = []
+    for _, pattern, _ in intents:
+        for slot in re.findall(r"\(\?P<(\w+)>", pattern):
+            if slot not in slots:
+                slots.append(slot)
+    return slots
+
+class IntentMatch(NamedTuple):
+    """A question answered by a template instead of the model."""
+    intent: str
+    template: str
+    params: Tuple[str, ...]
+
+    @property
+    def sql(self) -> str:
+        """The template with its parameters inlined as quoted literals.
+
+        Parameters are always exact values read from the database, so
+        inlining them (with quotes doubled) is safe.
+        """
+        sql = self.template
+        for value in self.params:
+            sql = sql.replace("?", "'" + value.replace("'", "''") + "'", 1)
+        return sql
+
+class IntentMatcher:
+    """Matches template questions in one pass of a single compiled regex.
+
+    ``entities`` returns the valid slot values keyed by slot name, as
+    returned by semantic_cache.load_entities(); it is re-read at most every
+    ``entity_refresh`` seconds. ``schema`` returns the live ``{table:
+    [columns]}``; templates over tables it lacks never match, so a database
+    without them falls through to the model.
+    """
+    def __init__(self, entities: Callable[[], Dict[str, List[str]]],
+                 schema: Optional[Callable[[], Dict[str, List[str]]]] = None, intents=INTENTS,
+                 entity_refresh: float = 60):
+        self.entities = entities
+        self.schema = schema
+        self.entity_refresh = entity_refresh
+        self.hits = 0
+        self.misses = 0
+        self._intents = intents
+        self._tables = [{t.lower() for t in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)", template, re.IGNORECASE)}
+                        for _, _, template in intents]
+        # Group names must be unique across alternatives, so slots are suffixed with the intent index
+        alternatives = []
+        for i, (_, pattern, _) in enumerate(intents):
+            pattern = re.sub(r"\(\?P<(\w+)>", rf"(?P<\1__{i}>", pattern)
+            alternatives.append(f"(?P<intent{i}>{pattern})")
+        self._pattern = re.compile(r"^(?:" + "|".join(alternatives) + r")$", re.IGNORECASE)
+        self._values: Dict[str, Dict[str, str]] = {}
+        self._values_loaded = 0.0
+        self._lock = threading.Lock()
+
+    def _slot_values(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            now = time.time()
+            if now - self._values_loaded > self.entity_refresh:
+                self._values = {slot: {v.lower(): v for v in values}
+                                for slot, values in self.entities().items()}
+                self._values_loaded = now
+            return self._values
+
+    def match(self, question: str) -> Optional[IntentMatch]:
+        """Get the template match for a question, or None if it needs the model."""
+        text = re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip()
+        m = self._pattern.match(text)
+        result = None
+        if m:
+            i = next(i for i in range(len(self._intents)) if m.group(f"intent{i}") is not None)
+            name, _, template = self._intents[i]
+            params = []
+            values = self._slot_values()
+            for group, value in m.groupdict().items():
+                if value is None or not group.endswith(f"__{i}"):
+                    continue
+                slot = group[:-len(f"__{i}")]
+                canonical = values.get(slot, {}).get(value.strip().lower())
+                if canonical is None:
+                    params = None
+                    break
+                params.append(canonical)
+            tables_exist = self.schema is None or self._tables[i] <= {t.lower() for t in self.schema()}
+            if params is not None and tables_exist:
+                result = IntentMatch(name, template, tuple(params))
+
+        if result:
+            self.hits += 1
+            logger.info(f"Intent '{result.intent}' matched: {question}")
+        else:
+            self.misses += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses}
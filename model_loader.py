@@ -0,0 +1,62 @@
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[float, str], None]
+
+class ModelLoader:
+    """Loads the model on a background thread and exposes its readiness.
+
+    ``load`` receives a progress callback taking a fraction in [0, 1] and a
+    short stage description. ``ready`` is the flag other components check
+    before relying on the model; ``get()`` blocks until it is loaded.
+    """
+    def __init__(self, load: Callable[[ProgressCallback], Any]):
+        self._load = load
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.model = None
+        self.error: Optional[Exception] = None
+        self.progress = 0.0
+        self.stage = "Waiting to start"
+
+    def start(self) -> "ModelLoader":
+        """Start loading, once; later calls do nothing."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def _report(self, progress: float, stage: str):
+        self.progress = progress
+        self.stage = stage
+        logger.info(f"Model loading {100 * progress:.0f}%: {stage}")
+
+    def _run(self):
+        try:
+            self.model = self._load(self._report)
+            self._report(1.0, "Ready")
+        except Exception as e:
+            logger.error(f"Model loading error: {str(e)}")
+            self.error = e
+            self.stage = "Failed"
+        finally:
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the model is loaded and usable."""
+        return self.model is not None
+
+    def get(self, timeout: Optional[float] = None):
+        """Wait for the model and return it; raises if loading failed or timed out."""
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError("Model is still loading")
+        if self.error is not None:
+            raise RuntimeError(f"Model failed to load: {str(self.error)}") from self.error
+        return self.model
@@ -0,0 +1,286 @@
+import inspect
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+ENCODER_FILE = "encoder.onnx"
+DECODER_INIT_FILE = "decoder_init.onnx"
+DECODER_FILE = "decoder.onnx"
+ONNX_FILES = [ENCODER_FILE, DECODER_INIT_FILE, DECODER_FILE]
+KV_NAMES = ["self_key", "self_value", "cross_key", "cross_value"]
+
+def artifact_dir(model_name: str, onnx_dir: str) -> str:
+    """Get the directory holding the exported artifacts for a model."""
+    return os.path.join(onnx_dir, model_name.replace("/", "--"))
+
+def _past_names(prefix: str, num_layers: int) -> List[str]:
+    return [f"{prefix}.{i}.{kv}" for i in range(num_layers) for kv in KV_NAMES]
+
+def _flatten_past(past_key_values) -> tuple:
+    return tuple(t for layer in past_key_values for t in layer)
+
+class _EncoderWrapper(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.get_encoder()
+
+    def forward(self, input_ids, attention_mask):
+        return self.encoder(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+class _DecoderInitWrapper(torch.nn.Module):
+    """First decoder step: no past, returns logits and the full KV cache."""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, decoder_input_ids, encoder_attention_mask, encoder_hidden_states):
+        out = self.model(decoder_input_ids=decoder_input_ids,
+                         attention_mask=encoder_attention_mask,
+                         encoder_outputs=(encoder_hidden_states,),
+                         use_cache=True,
+                         return_dict=True)
+        return (out.logits,) + _flatten_past(out.past_key_values)
+
+class _DecoderWithPastWrapper(torch.nn.Module):
+    """Later decoder steps: one new token plus the KV cache from the last step."""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.num_layers = model.config.num_decoder_layers
+
+    def forward(self, decoder_input_ids, encoder_attention_mask, encoder_hidden_states, *past_flat):
+        past = tuple(tuple(past_flat[i * 4:(i + 1) * 4]) for i in range(self.num_layers))
+        out = self.model(decoder_input_ids=decoder_input_ids,
+                         attention_mask=encoder_attention_mask,
+                         encoder_outputs=(encoder_hidden_states,),
+                         past_key_values=past,
+                         use_cache=True,
+                         return_dict=True)
+        return (out.logits,) + _flatten_past(out.past_key_values)
+
+def export_onnx_model(model_name: str, output_dir: str, opset: int = 13, quantize: bool = True):
+    """Export encoder and decoder (with past key/values) to ONNX and quantize them to int8.
+
+    With ``quantize`` off, the fp32 graphs are kept as they are.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer, T5ForConditionalGeneration
+
+    os.makedirs(output_dir, exist_ok=True)
+    logger.info(f"Exporting {model_name} to ONNX in {output_dir}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = T5ForConditionalGeneration.from_pretrained(model_name).eval()
+    config = model.config
+    num_layers = config.num_decoder_layers
+
+    input_ids = tokenizer(["Show all departments"], return_tensors="pt").input_ids
+    attention_mask = torch.ones_like(input_ids)
+    decoder_input_ids = torch.full((1, 1), config.decoder_start_token_id, dtype=torch.long)
+
+    with torch.no_grad():
+        encoder_hidden_states = _EncoderWrapper(model)(input_ids, attention_mask)
+        init_outputs = _DecoderInitWrapper(model)(decoder_input_ids, attention_mask, encoder_hidden_states)
+    past_flat = init_outputs[1:]
+
+    past_axes = {}
+    for name in _past_names("past_key_values", num_layers):
+        past_axes[name] = {0: "batch", 2: "encoder_sequence" if "cross" in name else "past_sequence"}
+    present_axes = {}
+    for name in _past_names("present", num_layers):
+        present_axes[name] = {0: "batch", 2: "encoder_sequence" if "cross" in name else "past_sequence + 1"}
+
+    # torch 2.x can default to the dynamo exporter, which does not take dynamic_axes
+    export_kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    fp32_paths = {}
+    with torch.no_grad():
+        fp32_paths[ENCODER_FILE] = os.path.join(output_dir, "fp32_" + ENCODER_FILE)
+        torch.onnx.export(
+            _EncoderWrapper(model), (input_ids, attention_mask), fp32_paths[ENCODER_FILE],
+            input_names=["input_ids", "attention_mask"],
+            output_names=["encoder_hidden_states"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "encoder_sequence"},
+                          "attention_mask": {0: "batch", 1: "encoder_sequence"},
+                          "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"}},
+            opset_version=opset, **export_kwargs)
+
+        common_axes = {"decoder_input_ids": {0: "batch", 1: "decoder_sequence"},
+                       "encoder_attention_mask": {0: "batch", 1: "encoder_sequence"},
+                       "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"},
+                       "logits": {0: "batch", 1: "decoder_sequence"}}
+
+        fp32_paths[DECODER_INIT_FILE] = os.path.join(output_dir, "fp32_" + DECODER_INIT_FILE)
+        torch.onnx.export(
+            _DecoderInitWrapper(model), (decoder_input_ids, attention_mask, encoder_hidden_states),
+            fp32_paths[DECODER_INIT_FILE],
+            input_names=["decoder_input_ids", "encoder_attention_mask", "encoder_hidden_states"],
+            output_names=["logits"] + _past_names("present", num_layers),
+            dynamic_axes={**common_axes, **present_axes},
+            opset_version=opset, **export_kwargs)
+
+        fp32_paths[DECODER_FILE] = os.path.join(output_dir, "fp32_" + DECODER_FILE)
+        next_ids = init_outputs[0][:, -1:].argmax(-1)
+        torch.onnx.export(
+            _DecoderWithPastWrapper(model),
+            (next_ids, attention_mask, encoder_hidden_states) + tuple(past_flat),
+            fp32_paths[DECODER_FILE],
+            input_names=(["decoder_input_ids", "encoder_attention_mask", "encoder_hidden_states"]
+                         + _past_names("past_key_values", num_layers)),
+            output_names=["logits"] + _past_names("present", num_layers),
+            dynamic_axes={**common_axes, **past_axes, **present_axes},
+            opset_version=opset, **export_kwargs)
+
+    for name, fp32_path in fp32_paths.items():
+        if quantize:
+            quantize_dynamic(fp32_path, os.path.join(output_dir, name), weight_type=QuantType.QInt8)
+            os.remove(fp32_path)
+        else:
+            os.replace(fp32_path, os.path.join(output_dir, name))
+
+    tokenizer.save_pretrained(output_dir)
+    config.save_pretrained(output_dir)
+    logger.info(f"Exported {'int8' if quantize else 'fp32'} ONNX model to {output_dir}")
+
+class OnnxT5ForConditionalGeneration:
+    """Runs T5 generation through onnxruntime sessions with a KV cache.
+
+    Sampling draws from a generator reseeded with ``seed`` on every
+    ``generate`` call, so sampled output is reproducible for a given batch.
+    """
+    def __init__(self, model_dir: str, session_options=None, seed: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoConfig
+
+        self.config = AutoConfig.from_pretrained(model_dir)
+        self.seed = seed
+        self.num_layers = self.config.num_decoder_layers
+        providers = ["CPUExecutionProvider"]
+        self.encoder = ort.InferenceSession(os.path.join(model_dir, ENCODER_FILE), session_options, providers=providers)
+        self.decoder_init = ort.InferenceSession(os.path.join(model_dir, DECODER_INIT_FILE), session_options, providers=providers)
+        self.decoder = ort.InferenceSession(os.path.join(model_dir, DECODER_FILE), session_options, providers=providers)
+        # The exporter drops graph inputs that end up unused, so only feed what each session declares
+        self._inputs = {id(s): {i.name for i in s.get_inputs()}
+                        for s in (self.encoder, self.decoder_init, self.decoder)}
+        self._past_names = _past_names("past_key_values", self.num_layers)
+
+    def _run(self, session, feeds: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        names = self._inputs[id(session)]
+        return session.run(None, {k: v for k, v in feeds.items() if k in names})
+
+    def _next_tokens(self, logits: np.ndarray, do_sample: bool, temperature: float,
+                     top_p: float, rng: np.random.Generator) -> np.ndarray:
+        if not do_sample:
+            return logits.argmax(-1)
+        logits = logits / max(temperature, 1e-5)
+        probs = np.exp(logits - logits.max(-1, keepdims=True))
+        probs /= probs.sum(-1, keepdims=True)
+        next_tokens = np.empty(len(probs), dtype=np.int64)
+        for row, p in enumerate(probs):
+            order = np.argsort(-p)
+            cumulative = np.cumsum(p[order])
+            keep = order[:int(np.searchsorted(cumulative, top_p)) + 1]
+            next_tokens[row] = rng.choice(keep, p=p[keep] / p[keep].sum())
+        return next_tokens
+
+    def generate(self, input_ids, attention_mask=None, max_length: int = 20,
+                 max_new_tokens: Optional[int] = None, do_sample: bool = False,
+                 temperature: float = 1.0, top_p: float = 1.0, seed: Optional[int] = None,
+                 num_beams: int = 1, num_return_sequences: int = 1, prefix_allowed_tokens_fn=None,
+                 stopping_criteria=None, **kwargs):
+        """Generate output ids; mirrors the subset of ``generate`` arguments the app uses.
+
+        ``seed`` overrides the model's seed for this call. Beam search is
+        not implemented, so ``num_beams`` or ``num_return_sequences`` above
+        1 raise ValueError.
+        """
+        if num_beams > 1 or num_return_sequences > 1:
+            raise ValueError(f"ONNX backend does not support num_beams={num_beams} "
+                             f"or num_return_sequences={num_return_sequences}")
+        input_ids = np.asarray(input_ids, dtype=np.int64)
+        if attention_mask is None:
+            attention_mask = np.ones_like(input_ids)
+        attention_mask = np.asarray(attention_mask, dtype=np.int64)
+        batch_size = input_ids.shape[0]
+        steps = max_new_tokens if max_new_tokens is not None else max_length - 1
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        eos_id = self.config.eos_token_id
+        pad_id = self.config.pad_token_id
+
+        encoder_hidden_states = self._run(self.encoder, {"input_ids": input_ids,
+                                                         "attention_mask": attention_mask})[0]
+        sequences = np.full((batch_size, 1), self.config.decoder_start_token_id, dtype=np.int64)
+        feeds = {"decoder_input_ids": sequences,
+                 "encoder_attention_mask": attention_mask,
+                 "encoder_hidden_states": encoder_hidden_states}
+        outputs = self._run(self.decoder_init, feeds)
+        finished = np.zeros(batch_size, dtype=bool)
+
+        for _ in range(steps):
+            logits = outputs[0][:, -1, :]
+            if prefix_allowed_tokens_fn is not None:
+                mask = np.full_like(logits, -np.inf)
+                for row in range(batch_size):
+                    mask[row, prefix_allowed_tokens_fn(row, torch.from_numpy(sequences[row]))] = 0
+                logits = logits + mask
+            next_tokens = self._next_tokens(logits, do_sample, temperature, top_p, rng)
+            next_tokens = np.where(finished, pad_id, next_tokens)
+            sequences = np.concatenate([sequences, next_tokens[:, None]], axis=1)
+            finished |= next_tokens == eos_id
+            if finished.all():
+                break
+            if stopping_criteria and any(c(torch.from_numpy(sequences), None) for c in stopping_criteria):
+                break
+            feeds["decoder_input_ids"] = next_tokens[:, None]
+            feeds.update(zip(self._past_names, outputs[1:]))
+            outputs = self._run(self.decoder, feeds)
+
+        return torch.from_numpy(sequences)
+
+class OnnxText2TextPipeline:
+    """ONNX counterpart of T5Engine, also callable like a ``text2text-generation`` pipeline."""
+    def __init__(self, model: OnnxT5ForConditionalGeneration, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = torch.device("cpu")
+
+    def generate(self, input_ids, attention_mask=None, **generate_kwargs):
+        """Generate output ids; same contract as T5Engine.generate."""
+        return self.model.generate(input_ids, attention_mask, **generate_kwargs)
+
+    def __call__(self, text, **generate_kwargs):
+        texts = [text] if isinstance(text, str) else list(text)
+        inputs = self.tokenizer(texts, padding=True, return_tensors="np")
+        output_ids = self.model.generate(inputs["input_ids"], inputs["attention_mask"], **generate_kwargs)
+        decoded = self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+        return [{"generated_text": t} for t in decoded]
+
+def load_onnx_pipeline(model_name: str, onnx_dir: str, progress=None, threads: int = 0,
+                       seed: int = 0) -> OnnxText2TextPipeline:
+    """Load the int8 ONNX pipeline, exporting it first if no artifacts are on disk.
+
+    ``progress(fraction, stage)`` is called as loading advances. ``threads``
+    sets each session's intra-op thread count (0 lets ONNX Runtime choose),
+    and ``seed`` seeds sampling.
+    """
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+
+    progress = progress or (lambda fraction, stage: None)
+    model_dir = artifact_dir(model_name, onnx_dir)
+    if not all(os.path.exists(os.path.join(model_dir, f)) for f in ONNX_FILES):
+        progress(0.05, "Exporting the model to int8 ONNX (first start only)")
+        export_onnx_model(model_name, model_dir)
+    else:
+        logger.info(f"Reusing ONNX artifacts from {model_dir}")
+
+    progress(0.7, "Starting ONNX Runtime sessions")
+    session_options = ort.SessionOptions()
+    if threads:
+        session_options.intra_op_num_threads = threads
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return OnnxText2TextPipeline(OnnxT5ForConditionalGeneration(model_dir, session_options, seed), tokenizer)
@@ -0,0 +1,185 @@
+import functools
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import config
+from examples import Example, ExampleStore, get_example_store
+from schema import get_schema, get_schema_version, render_schema
+from schema_linking import get_schema_linker
+
+# Few-shot context with simple examples; {schema} is filled in from the live database
+FEW_SHOT_TEMPLATE = """
+        Convert to simple SQL. {schema}
+        
+        Examples:
+        Question: Who manages Sales?
+        SQL: SELECT Manager FROM Departments WHERE Name = 'Sales';
+        
+        Question: Show all departments
+        SQL: SELECT * FROM Departments;
+        
+        Question: List department names
+        SQL: SELECT Name FROM Departments;
+        
+        Question: Find manager of Marketing
+        SQL: SELECT Manager FROM Departments WHERE Name = 'Marketing';
+        
+        Current question: """
+
+# Pieces of the retrieval prompt, each tokenized once: the header with the
+# schema, then the retrieved examples, then the question lead and the question
+PROMPT_HEADER = "Convert to simple SQL. {schema}\n\nExamples:"
+EXAMPLE_FORMAT = "Question: {question}\nSQL: {sql}"
+QUESTION_LEAD = "Current question:"
+
+def build_prompt(nl_query: str, db_path: str = config.DB_PATH) -> str:
+    """Build the full static few-shot prompt for a question."""
+    return FEW_SHOT_TEMPLATE.format(schema=render_schema(get_schema(db_path))) + nl_query
+
+class PromptEncoder:
+    """Builds model input ids from pre-tokenized prompt pieces.
+
+    The schema section is rendered from the database at ``db_path``; it
+    and the text around it are tokenized once per ``PRAGMA schema_version``.
+    Schemas larger than ``max_tables`` tables or ``max_columns`` columns per
+    table are pruned to what each question refers to (see ``SchemaLinker``),
+    and the sections for the most recent ``section_cache_size`` prunings kept.
+    Without an example ``store``, that is the whole static few-shot prefix.
+    With one, the ``k`` examples whose questions are most similar to the
+    question are retrieved and included while they fit in ``token_budget``
+    tokens; the lead and each example are tokenized once and reused. Either
+    way each request only tokenizes its question.
+    """
+    def __init__(self, tokenizer, store: Optional[ExampleStore] = None, k: int = 3, token_budget: int = 96,
+                 db_path: str = config.DB_PATH, max_tables: int = 0, max_columns: int = 0,
+                 sample_values: int = 10, section_cache_size: int = 1024):
+        self.tokenizer = tokenizer
+        self.store = store
+        self.k = k
+        self.token_budget = token_budget
+        self.db_path = db_path
+        self.lead_ids = self._tokenize(QUESTION_LEAD)
+        self._example_ids: Dict[Example, List[int]] = {}
+        self.max_tables = max_tables
+        self.max_columns = max_columns
+        self.sample_values = sample_values
+        self.section_cache_size = section_cache_size
+        self._schema_key = None
+        self._sections: "OrderedDict[tuple, Tuple[str, List[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokenize(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False).input_ids
+
+    def _ids(self, example: Example) -> List[int]:
+        ids = self._example_ids.get(example)
+        if ids is None:
+            ids = self._example_ids[example] = self._tokenize(EXAMPLE_FORMAT.format(**example._asdict()))
+        return ids
+
+    def schema_section(self, nl_query: str = "") -> Tuple[str, List[int]]:
+        """Get the prompt text before the examples or question, and its token ids.
+
+        Only ``PRAGMA schema_version`` is read per call, plus schema linking
+        for large schemas; a section is rendered and tokenized again when
+        the version changes.
+        """
+        key = get_schema_version(self.db_path)
+        if self.max_tables > 0:
+            linker = get_schema_linker(self.db_path, self.sample_values)
+            schema = linker.link(nl_query, self.max_tables, self.max_columns)
+            pruned = None if schema is linker.schema else tuple((t, tuple(c)) for t, c in schema.items())
+        else:
+            schema, pruned = None, None
+        with self._lock:
+            if key != self._schema_key:
+                self._sections.clear()
+                self._schema_key = key
+            section = self._sections.get(pruned)
+            if section is not None:
+                self._sections.move_to_end(pruned)
+                return section
+        text = render_schema(schema if pruned is not None else get_schema(self.db_path))
+        if self.store is None:
+            # The question is tokenized on its own, which gives its first word the
+            # leading-space marker, so the prefix must not keep its trailing space
+            text = FEW_SHOT_TEMPLATE.format(schema=text)
+            section = (text, self._tokenize(text.rstrip()))
+        else:
+            text = PROMPT_HEADER.format(schema=text)
+            section = (text, self._tokenize(text))
+        with self._lock:
+            if key == self._schema_key:
+                self._sections[pruned] = section
+                if len(self._sections) > self.section_cache_size:
+                    self._sections.popitem(last=False)
+        return section
+
+    def select_examples(self, nl_query: str) -> List[Example]:
+        """Get the retrieved examples that fit the token budget, most similar last."""
+        selected = []
+        used = 0
+        for example in self.store.search(nl_query, self.k):
+            length = len(self._ids(example))
+            if used + length <= self.token_budget:
+                selected.append(example)
+                used += length
+        # The most similar example goes right before the question
+        return selected[::-1]
+
+    def prefix_for(self, nl_query: str) -> List[int]:
+        """Get the prompt ids that go before a question."""
+        text, ids = self.schema_section(nl_query)
+        if self.store is None:
+            return ids
+        ids = list(ids)
+        for example in self.select_examples(nl_query):
+            ids += self._ids(example)
+        return ids + self.lead_ids
+
+    def prompt_text(self, nl_query: str) -> str:
+        """Get the prompt as text, e.g. for a pipeline that tokenizes it itself."""
+        text, _ = self.schema_section(nl_query)
+        if self.store is None:
+            return text + nl_query
+        examples = [EXAMPLE_FORMAT.format(**e._asdict()) for e in self.select_examples(nl_query)]
+        return "\n\n".join([text] + examples + [f"{QUESTION_LEAD} {nl_query}"])
+
+    def encode_with_lengths(self, nl_queries: List[str]) -> Tuple[List[List[int]], List[int]]:
+        """Get the full prompt input ids and the question's own token count for each question."""
+        question_ids = self.tokenizer(list(nl_queries)).input_ids
+        prompts = [self.prefix_for(q) + ids for q, ids in zip(nl_queries, question_ids)]
+        return prompts, [len(ids) for ids in question_ids]
+
+    def encode(self, nl_queries: List[str]) -> List[List[int]]:
+        """Get the full prompt input ids for each question."""
+        return self.encode_with_lengths(nl_queries)[0]
+
+    def pad(self, prompts: List[List[int]]):
+        """Get padded ``input_ids``/``attention_mask`` tensors for prompt ids."""
+        return self.tokenizer.pad({"input_ids": prompts}, return_tensors="pt")
+
+    def encode_batch(self, nl_queries: List[str]):
+        """Get padded ``input_ids``/``attention_mask`` tensors for a batch of questions."""
+        return self.pad(self.encode(nl_queries))
+
+def get_example_retrieval_store() -> Optional[ExampleStore]:
+    """Get the configured example store, or None when retrieval is off."""
+    return get_example_store(config.EXAMPLES_PATH) if config.EXAMPLES_K > 0 else None
+
+@functools.lru_cache(maxsize=None)
+def get_prompt_encoder(tokenizer) -> PromptEncoder:
+    """Get the prompt encoder for a tokenizer, tokenizing the prompt pieces on first use."""
+    return PromptEncoder(tokenizer, get_example_retrieval_store(), config.EXAMPLES_K, config.EXAMPLES_TOKEN_BUDGET,
+                         config.DB_PATH, config.SCHEMA_MAX_TABLES, config.SCHEMA_MAX_COLUMNS,
+                         config.SCHEMA_SAMPLE_VALUES)
+
+def prompt_fingerprint() -> str:
+    """Identify what prompts are built from, for caches of generated SQL."""
+    store = get_example_retrieval_store()
+    linking = f"{config.SCHEMA_MAX_TABLES}/{config.SCHEMA_MAX_COLUMNS}/{config.SCHEMA_SAMPLE_VALUES}"
+    if store is None:
+        return "\n".join([FEW_SHOT_TEMPLATE, linking])
+    return "\n".join([PROMPT_HEADER, EXAMPLE_FORMAT, QUESTION_LEAD, store.fingerprint(),
+                      str(config.EXAMPLES_K), str(config.EXAMPLES_TOKEN_BUDGET), linking])
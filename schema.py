@@ -0,0 +1,43 @@
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+
+_schemas: Dict[Tuple[str, int], Dict[str, List[str]]] = {}
+_local = threading.local()
+
+def read_schema(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Read table names and their column names from a database."""
+    tables = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    return {table: [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')] for table in tables}
+
+def _connection(db_path: str) -> sqlite3.Connection:
+    """Get this thread's connection to a database, opening it on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+    return conn
+
+def get_schema_version(db_path: str) -> Tuple[str, int]:
+    """Get a key that changes whenever the database schema does: (path, ``PRAGMA schema_version``)."""
+    return db_path, _connection(db_path).execute("PRAGMA schema_version").fetchone()[0]
+
+def get_schema(db_path: str) -> Dict[str, List[str]]:
+    """Get the live schema of a database as ``{table: [columns]}``.
+
+    Only ``PRAGMA schema_version`` is read per call, on a connection kept
+    per thread; tables and columns are re-read when that version changes.
+    """
+    key = get_schema_version(db_path)
+    if key not in _schemas:
+        _schemas[key] = read_schema(_connection(db_path))
+    return _schemas[key]
+
+def render_schema(schema: Dict[str, List[str]]) -> str:
+    """Describe tables and their columns for the prompt."""
+    return ". ".join(f"Use table '{table}' with columns: {', '.join(columns)}"
+                     for table, columns in schema.items())
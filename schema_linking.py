@@ -0,0 +1,225 @@
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from schema import get_schema_version
+
+logger = logging.getLogger(__name__)
+
+# How much a match on each kind of term counts towards a table or column
+NAME_WEIGHT = 1.0
+COLUMN_WEIGHT = 0.8
+VALUE_WEIGHT = 0.7
+COMMENT_WEIGHT = 0.5
+
+STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "by", "can", "do", "does", "each", "every", "find", "for", "from",
+    "get", "give", "has", "have", "how", "in", "is", "it", "list", "many", "me", "much", "of", "on", "or",
+    "show", "than", "that", "the", "their", "there", "to", "was", "were", "what", "which", "who", "whose",
+    "with",
+}
+
+_linkers: Dict[Tuple[str, int], "SchemaLinker"] = {}
+_lock = threading.Lock()
+
+def split_words(text: str) -> List[str]:
+    """Split text or an identifier (``snake_case``, ``CamelCase``) into lowercase words, plurals stemmed."""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+def trigrams(word: str) -> Set[str]:
+    """Character trigrams of a word, padded so that short words have some."""
+    word = f" {word} "
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def read_comments(create_sql: str) -> Tuple[str, Dict[str, str]]:
+    """Get the ``--`` comments of a CREATE TABLE statement: the table's and each column's."""
+    table_comment = ""
+    columns = {}
+    for line in (create_sql or "").splitlines():
+        code, _, comment = line.partition("--")
+        comment = comment.strip()
+        if not comment:
+            continue
+        match = re.match(r'\s*["`\[]?(\w+)["`\]]?\s', code)
+        if match and not code.lstrip().upper().startswith(("CREATE", "PRIMARY", "FOREIGN", "UNIQUE", "CHECK")):
+            columns[match.group(1)] = comment
+        else:
+            table_comment = comment
+    return table_comment, columns
+
+class SchemaLinker:
+    """Picks the tables and columns of a large schema that a question refers to.
+
+    Table and column names, ``--`` comments in their CREATE TABLE statements
+    and up to ``sample_values`` distinct text values per column are split
+    into words and indexed. Question words match those terms exactly or,
+    failing that, fuzzily by character trigram overlap (Dice coefficient of
+    at least ``min_similarity``), which tolerates plurals and typos. Matches
+    are weighted by the kind of term and by how few tables share it, so a
+    word like "name" that most tables have counts for little. Tables are
+    ranked by their summed scores; tables linked to the chosen ones by
+    foreign keys fill any remaining room, since joins go through them.
+    """
+    def __init__(self, conn: sqlite3.Connection, sample_values: int = 10, min_similarity: float = 0.6):
+        self.min_similarity = min_similarity
+        self.schema: Dict[str, List[str]] = {}
+        self.keys: Dict[str, Set[str]] = {}
+        self.links: Dict[str, Set[str]] = {}
+        # term -> [(table, column or None, weight)]
+        self._postings: Dict[str, List[Tuple[str, Optional[str], float]]] = {}
+        self._grams: Dict[str, List[str]] = {}
+        self._gram_counts: Dict[str, int] = {}
+        self._matches: Dict[str, List[Tuple[str, float]]] = {}
+        self._read(conn, sample_values)
+        tables_per_term: Dict[str, Set[str]] = {}
+        for term, postings in self._postings.items():
+            tables_per_term[term] = {table for table, _, _ in postings}
+            grams = trigrams(term)
+            self._gram_counts[term] = len(grams)
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(term)
+        self._idf = {term: math.log(1 + len(self.schema) / len(tables))
+                     for term, tables in tables_per_term.items()}
+
+    def _index(self, text: str, table: str, column: Optional[str], weight: float):
+        for word in split_words(text):
+            if word not in STOPWORDS:
+                self._postings.setdefault(word, []).append((table, column, weight))
+
+    def _read(self, conn: sqlite3.Connection, sample_values: int):
+        tables = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        ).fetchall()
+        for table, create_sql in tables:
+            info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+            self.schema[table] = [row[1] for row in info]
+            self.keys[table] = {row[1] for row in info if row[5]}
+            self.links.setdefault(table, set())
+            for row in conn.execute(f'PRAGMA foreign_key_list("{table}")'):
+                self.links[table].add(row[2])
+                self.links.setdefault(row[2], set()).add(table)
+                self.keys[table].add(row[3])
+            table_comment, comments = read_comments(create_sql)
+            self._index(table, table, None, NAME_WEIGHT)
+            self._index(table_comment, table, None, COMMENT_WEIGHT)
+            for column in self.schema[table]:
+                self._index(column, table, column, COLUMN_WEIGHT)
+                self._index(comments.get(column, ""), table, column, COMMENT_WEIGHT)
+                if sample_values > 0:
+                    values = conn.execute(
+                        f'SELECT DISTINCT "{column}" FROM "{table}" WHERE typeof("{column}") = \'text\' LIMIT ?',
+                        (sample_values,))
+                    for (value,) in values:
+                        self._index(value, table, column, VALUE_WEIGHT)
+
+    def match(self, word: str) -> List[Tuple[str, float]]:
+        """Get the indexed terms a question word matches, with their similarity."""
+        matches = self._matches.get(word)
+        if matches is not None:
+            return matches
+        if word in self._postings:
+            matches = [(word, 1.0)]
+        elif len(word) < 4:
+            matches = []
+        else:
+            grams = trigrams(word)
+            shared: Dict[str, int] = {}
+            for gram in grams:
+                for term in self._grams.get(gram, ()):
+                    shared[term] = shared.get(term, 0) + 1
+            matches = []
+            for term, count in shared.items():
+                similarity = 2 * count / (len(grams) + self._gram_counts[term])
+                if similarity >= self.min_similarity:
+                    matches.append((term, similarity))
+        if len(self._matches) > 10000:
+            self._matches.clear()
+        self._matches[word] = matches
+        return matches
+
+    def score(self, question: str) -> Tuple[Dict[str, float], Dict[Tuple[str, str], float]]:
+        """Score the tables and the columns a question refers to."""
+        tables: Dict[str, float] = {}
+        columns: Dict[Tuple[str, str], float] = {}
+        for word in set(split_words(question)) - STOPWORDS:
+            best_tables: Dict[str, float] = {}
+            best_columns: Dict[Tuple[str, str], float] = {}
+            for term, similarity in self.match(word):
+                idf = self._idf[term]
+                for table, column, weight in self._postings[term]:
+                    score = similarity * weight * idf
+                    best_tables[table] = max(best_tables.get(table, 0.0), score)
+                    if column is not None:
+                        best_columns[table, column] = max(best_columns.get((table, column), 0.0), score)
+            # Each question word counts once per table and column, however many terms it matches
+            for table, score in best_tables.items():
+                tables[table] = tables.get(table, 0.0) + score
+            for key, score in best_columns.items():
+                columns[key] = columns.get(key, 0.0) + score
+        return tables, columns
+
+    def link(self, question: str, max_tables: int, max_columns: int) -> Dict[str, List[str]]:
+        """Get the part of the schema relevant to a question as ``{table: [columns]}``.
+
+        Returns the whole schema, as the same object, when it already has at
+        most ``max_tables`` tables of at most ``max_columns`` columns (0 for
+        no column limit).
+        """
+        if len(self.schema) <= max_tables and (
+                max_columns <= 0 or all(len(c) <= max_columns for c in self.schema.values())):
+            return self.schema
+        table_scores, column_scores = self.score(question)
+        ranked = sorted(table_scores, key=lambda t: (-table_scores[t], t))[:max_tables]
+        if not ranked:
+            ranked = list(self.schema)[:max_tables]
+        chosen = set(ranked)
+        neighbours: Dict[str, int] = {}
+        for table in ranked:
+            for other in self.links.get(table, ()):
+                if other not in chosen and other in self.schema:
+                    neighbours[other] = neighbours.get(other, 0) + 1
+        for other in sorted(neighbours, key=lambda t: (-neighbours[t], t))[:max_tables - len(ranked)]:
+            ranked.append(other)
+        linked = {}
+        for table in ranked:
+            columns = self.schema[table]
+            if 0 < max_columns < len(columns):
+                # Keys first, then the columns the question refers to, then declaration order
+                order = sorted(range(len(columns)), key=lambda i: (
+                    columns[i] not in self.keys[table], -column_scores.get((table, columns[i]), 0.0), i))
+                keep = set(order[:max_columns])
+                columns = [column for i, column in enumerate(columns) if i in keep]
+            linked[table] = columns
+        return linked
+
+def get_schema_linker(db_path: str, sample_values: int = 10) -> SchemaLinker:
+    """Get the schema linker for a database, re-indexing it when ``PRAGMA schema_version`` changes."""
+    key = get_schema_version(db_path)
+    linker = _linkers.get(key)
+    if linker is None:
+        with _lock:
+            linker = _linkers.get(key)
+            if linker is None:
+                start = time.perf_counter()
+                conn = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+                try:
+                    linker = SchemaLinker(conn, sample_values)
+                finally:
+                    conn.close()
+                for stale in [k for k in _linkers if k[0] == db_path]:
+                    del _linkers[stale]
+                _linkers[key] = linker
+                logger.info(f"Indexed {len(linker.schema)} tables of {db_path} for schema linking "
+                            f"in {1000 * (time.perf_counter() - start):.0f}ms")
+    return linker
@@ -0,0 +1,252 @@
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from schema import get_schema
+from sql_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+def entity_slot(table: str, column: str) -> str:
+    """Name the slot holding a column's values, e.g. ``departments_name``."""
+    return f"{table}_{column}".lower()
+
+def load_entities(db_path: str, max_values: int = 1000,
+                  slots: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+    """Get the literal values questions may mention, keyed by slot name.
+
+    Every text column of the live schema is a slot (see entity_slot())
+    holding up to ``max_values`` of its distinct text values, so a database
+    without text columns simply has no slots. ``slots`` limits this to the
+    named columns, e.g. those the intent templates bind.
+    """
+    wanted = None if slots is None else {slot.lower() for slot in slots}
+    entities = {}
+    conn = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+    try:
+        for table, columns in get_schema(db_path).items():
+            for column in columns:
+                slot = entity_slot(table, column)
+                if wanted is not None and slot not in wanted:
+                    continue
+                values = [r[0] for r in conn.execute(
+                    f'SELECT DISTINCT "{column}" FROM "{table}" WHERE typeof("{column}") = \'text\' LIMIT ?',
+                    (max_values,))]
+                if values:
+                    entities[slot] = values
+        return entities
+    finally:
+        conn.close()
+
+def compile_entities(entities: Dict[str, List[str]]) -> Dict[str, Tuple[Pattern, Dict[str, str]]]:
+    """Compile each slot's values into one regex, for mask_entities().
+
+    Values are tried longest first, so "Sales Ops" wins over "Sales"; the
+    map gives each lowercased value its canonical database spelling.
+    """
+    compiled = {}
+    for slot, values in entities.items():
+        canonical = {v.lower(): v for v in values if v.strip()}
+        if canonical:
+            alternatives = "|".join(re.escape(v) for v in sorted(canonical, key=len, reverse=True))
+            compiled[slot] = (re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE), canonical)
+    return compiled
+
+def mask_entities(question: str, patterns: Dict[str, Tuple[Pattern, Dict[str, str]]]
+                  ) -> Tuple[str, List[Tuple[str, str]]]:
+    """Replace known entity values with ``__slot__`` placeholders.
+
+    ``patterns`` comes from compile_entities(). Where values of different
+    slots overlap, the longest one is masked. Returns the masked question
+    and the (slot, value) bindings in the order they appear, with values in
+    their canonical database spelling.
+    """
+    candidates = [(m.start(), m.end(), slot, canonical[m.group(0).lower()])
+                  for slot, (pattern, canonical) in patterns.items() for m in pattern.finditer(question)]
+    candidates.sort(key=lambda c: (c[0] - c[1], c[0]))
+    found = []
+    for start, end, slot, value in candidates:
+        if all(end <= s or start >= e for s, e, _, _ in found):
+            found.append((start, end, slot, value))
+    found.sort()
+    for start, end, slot, _ in reversed(found):
+        question = question[:start] + f"__{slot}__" + question[end:]
+    return question, [(slot, value) for _, _, slot, value in found]
+
+def rebind_sql(sql: str, old: List[Tuple[str, str]], new: List[Tuple[str, str]]) -> Optional[str]:
+    """Swap the literals bound from the cached question for those of the new one.
+
+    Every quoted literal is rewritten in one pass, so swapped values stay
+    swapped. Returns None when the old values cannot be mapped exactly: one
+    value bound to two new ones, or a value missing from the SQL's literals.
+    """
+    mapping: Dict[str, str] = {}
+    for (_, old_value), (_, new_value) in zip(old, new):
+        if mapping.setdefault(old_value.lower(), new_value) != new_value:
+            return None
+    rebound = set()
+
+    def replace(match) -> str:
+        value = match.group(1).replace("''", "'").lower()
+        if value not in mapping:
+            return match.group(0)
+        rebound.add(value)
+        return "'" + mapping[value].replace("'", "''") + "'"
+
+    sql = re.sub(r"'((?:[^']|'')*)'", replace, sql)
+    return sql if rebound == set(mapping) else None
+
+def embed_question(text: str, dim: int = 256, ngram_range: Tuple[int, int] = (3, 5)) -> np.ndarray:
+    """Embed text as an L2-normalized hashed character n-gram vector.
+
+    Uses sublinear term frequencies and a signed hash (crc32, so vectors are
+    stable across processes) to keep collisions from biasing similarity.
+    """
+    text = " " + re.sub(r"\s+", " ", text.lower().strip()) + " "
+    counts: Dict[int, float] = {}
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(text) - n + 1):
+            h = zlib.crc32(text[i:i + n].encode())
+            bucket = (h % dim) if h & 0x80000000 == 0 else -(h % dim) - 1
+            counts[bucket] = counts.get(bucket, 0) + 1
+    vector = np.zeros(dim, dtype=np.float32)
+    for bucket, count in counts.items():
+        weight = 1 + math.log(count)
+        if bucket >= 0:
+            vector[bucket] += weight
+        else:
+            vector[-bucket - 1] -= weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class VectorIndex:
+    """Append-only matrix of unit vectors with vectorized cosine search.
+
+    Holds at most ``max_entries`` rows; once full, the oldest rows are overwritten.
+    """
+    def __init__(self, dim: int, max_entries: int = 100000, initial_capacity: int = 1024):
+        self.dim = dim
+        self.max_entries = max_entries
+        self._vectors = np.zeros((min(initial_capacity, max_entries), dim), dtype=np.float32)
+        self._size = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, vectors: np.ndarray) -> List[int]:
+        """Add row vectors; returns the slot each one was stored in."""
+        vectors = np.atleast_2d(vectors)
+        slots = []
+        for vector in vectors:
+            if self._next >= len(self._vectors) and len(self._vectors) < self.max_entries:
+                grown = np.zeros((min(2 * len(self._vectors), self.max_entries), self.dim), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            slot = self._next
+            self._vectors[slot] = vector
+            slots.append(slot)
+            self._size = max(self._size, slot + 1)
+            self._next = (slot + 1) % self.max_entries
+        return slots
+
+    def search(self, vector: np.ndarray) -> Tuple[int, float]:
+        """Get the slot and cosine similarity of the nearest stored vector."""
+        if not self._size:
+            return -1, 0.0
+        scores = self._vectors[:self._size] @ vector
+        best = int(scores.argmax())
+        return best, float(scores[best])
+
+class SemanticCache:
+    """Near-duplicate question cache backed by a NumPy vector index.
+
+    Questions are normalized as for the exact cache and entity values
+    (department names, managers) are masked out before embedding, so "who
+    runs Sales" can hit an entry cached for "who manages Marketing"; the
+    cached SQL then has its literals re-bound to the new question's values.
+    As in SQLCache, every entry is dropped when the schema fingerprint
+    returned by ``fingerprint`` changes.
+    """
+    def __init__(self, entities: Callable[[], Dict[str, List[str]]], threshold: float = 0.92,
+                 dim: int = 256, max_entries: int = 100000, entity_refresh: float = 60,
+                 fingerprint: Optional[Callable[[], str]] = None):
+        self.entities = entities
+        self.fingerprint = fingerprint
+        self.threshold = threshold
+        self.dim = dim
+        self.entity_refresh = entity_refresh
+        self.hits = 0
+        self.misses = 0
+        self._index = VectorIndex(dim, max_entries)
+        self._entries: Dict[int, Tuple[str, List[Tuple[str, str]]]] = {}
+        self._entity_patterns: Dict[str, Tuple[Pattern, Dict[str, str]]] = {}
+        self._entities_loaded = 0.0
+        self._schema: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _check_schema(self):
+        """Drop every entry built from another schema."""
+        if self.fingerprint is None:
+            return
+        schema = self.fingerprint()
+        if schema != self._schema:
+            if self._schema is not None:
+                logger.info("Schema changed, invalidating semantic cache")
+            self._reset()
+            self._schema = schema
+
+    def _reset(self):
+        self._index = VectorIndex(self.dim, self._index.max_entries)
+        self._entries.clear()
+
+    def _mask(self, question: str) -> Tuple[str, List[Tuple[str, str]]]:
+        now = time.time()
+        if now - self._entities_loaded > self.entity_refresh:
+            self._entity_patterns = compile_entities(self.entities())
+            self._entities_loaded = now
+        masked, bindings = mask_entities(question, self._entity_patterns)
+        return normalize_question(masked), bindings
+
+    def get(self, question: str) -> Optional[str]:
+        """Get SQL cached for a similar enough question, or None."""
+        with self._lock:
+            self._check_schema()
+            masked, bindings = self._mask(question)
+            slot, score = self._index.search(embed_question(masked, self.dim))
+            entry = self._entries.get(slot)
+            sql = None
+            if (entry is not None and score >= self.threshold
+                    and [s for s, _ in entry[1]] == [s for s, _ in bindings]):
+                sql = rebind_sql(entry[0], entry[1], bindings)
+            if sql is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            logger.info(f"Semantic cache hit (similarity {score:.2f}) for: {question}")
+            return sql
+
+    def put(self, question: str, sql: str):
+        """Cache the SQL generated for a question."""
+        with self._lock:
+            self._check_schema()
+            masked, bindings = self._mask(question)
+            slot = self._index.add(embed_question(masked, self.dim))[0]
+            self._entries[slot] = (sql, bindings)
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss counters and the number of cached entries."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._index)}
@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Shares one in-flight computation among concurrent callers with the same key.
+
+    The first caller for a key runs the computation; callers arriving while
+    it runs wait for it and get its result, or its exception, instead of
+    repeating the work. Nothing is kept once it finishes, so later callers
+    compute afresh (caching is left to the caches).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Get ``fn()``, sharing a run already in flight for ``key``."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+        return future.result()
+
+    def stats(self) -> Dict[str, int]:
+        """Computations run, requests that shared one, and keys in flight."""
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
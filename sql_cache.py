@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Words that mean the same thing for our schema are folded onto one form
+SYNONYMS = {
+    "show": "list", "display": "list", "get": "list", "give": "list", "find": "list",
+    "manages": "manager", "manage": "manager", "managed": "manager", "managing": "manager",
+    "managers": "manager", "head": "manager", "heads": "manager",
+    "runs": "manager", "run": "manager", "leads": "manager", "lead": "manager", "oversees": "manager",
+    "departments": "department", "dept": "department", "depts": "department",
+    "names": "name",
+}
+STOPWORDS = {"a", "an", "the", "all", "every", "please", "me", "us", "of", "is", "are", "for", "in"}
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for cache lookup (case, whitespace, punctuation, synonyms)."""
+    words = re.sub(r"[^\w\s]", " ", question.lower()).split()
+    return " ".join(SYNONYMS.get(w, w) for w in words if w not in STOPWORDS)
+
+def normalize_sql(sql: str) -> str:
+    """Normalize SQL for coalescing identical statements (whitespace and trailing semicolons outside literals)."""
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";").strip())
+    return "".join(part if i % 2 else " ".join(part.split()) for i, part in enumerate(parts))
+
+_fingerprints: Dict[Tuple[str, int], str] = {}
+
+def schema_fingerprint(db_path: str, prompt: str) -> str:
+    """Fingerprint the database schema and the prompt SQL was generated from.
+
+    Only ``PRAGMA schema_version`` is read per call; the schema itself is
+    re-read and hashed when that version changes.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        key = (db_path, version)
+        if key not in _fingerprints:
+            rows = conn.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY name").fetchall()
+            digest = hashlib.sha256(prompt.encode())
+            for (sql,) in rows:
+                digest.update(sql.encode())
+            _fingerprints[key] = digest.hexdigest()[:16]
+        return _fingerprints[key]
+    finally:
+        conn.close()
+
+class SQLCache:
+    """Question to SQL cache: an in-memory LRU tier backed by a SQLite table.
+
+    The SQLite tier survives restarts and is shared by every process using the
+    same file. Entries expire after ``ttl`` seconds and are dropped when the
+    schema fingerprint returned by ``fingerprint`` changes.
+    """
+    def __init__(self, path: str, fingerprint: Callable[[], str], capacity: int = 1024,
+                 ttl: float = 86400, max_rows: int = 10000):
+        self.fingerprint = fingerprint
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._schema: Optional[str] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS sql_cache (
+            key TEXT PRIMARY KEY,
+            schema TEXT NOT NULL,
+            sql TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )""")
+        self._conn.commit()
+
+    def _check_schema(self) -> str:
+        """Drop every entry built from another schema; returns the current fingerprint."""
+        schema = self.fingerprint()
+        if schema != self._schema:
+            if self._schema is not None:
+                logger.info("Schema changed, invalidating SQL cache")
+            self._memory.clear()
+            self._conn.execute("DELETE FROM sql_cache WHERE schema != ?", (schema,))
+            self._conn.commit()
+            self._schema = schema
+        return schema
+
+    def get(self, question: str) -> Optional[str]:
+        """Get the cached SQL for a question, or None."""
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            schema = self._check_schema()
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            row = self._conn.execute(
+                "SELECT sql, created_at FROM sql_cache WHERE key = ? AND schema = ? AND created_at > ?",
+                (key, schema, now - self.ttl)).fetchone()
+            if row is None:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE sql_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def put(self, question: str, sql: str):
+        """Cache the SQL generated for a question."""
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            schema = self._check_schema()
+            self._remember(key, sql, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sql_cache (key, schema, sql, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, schema, sql, now, now))
+            # Keep the table small: drop the least recently used rows beyond max_rows
+            self._conn.execute(
+                "DELETE FROM sql_cache WHERE key IN "
+                "(SELECT key FROM sql_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,))
+            self._conn.commit()
+
+    def _remember(self, key: str, sql: str, created_at: float):
+        self._memory[key] = (sql, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss counters and the in-memory tier size."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._memory)}
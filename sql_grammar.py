@@ -0,0 +1,200 @@
+import functools
+import logging
+from typing import Callable, Dict, List, Tuple
+
+from transformers import StoppingCriteria
+
+logger = logging.getLogger(__name__)
+
+# Parser states of the SELECT grammar below
+START, SELECT_FIRST, SELECT_COLUMN, SELECT_NEXT, SELECT_STAR, FROM, TABLE, CONDITION, \
+    CONDITION_COLUMN, OPERATOR, LITERAL, CONDITION_DONE, END = range(13)
+
+def statement_end(text: str) -> int:
+    """Get the index of the ``;`` that terminates the first statement, or -1."""
+    in_literal = False
+    for i, char in enumerate(text):
+        if char == "'":
+            in_literal = not in_literal
+        elif char == ";" and not in_literal:
+            return i
+    return -1
+
+class SQLGrammar:
+    """A small SELECT grammar over a live schema, in canonical spacing.
+
+        query     := SELECT ( * | column {, column} ) FROM table [WHERE cond {(AND|OR) cond}] ;
+        cond      := column (= | LIKE) 'literal'
+
+    A literal is non-empty and, as in SQL, writes a quote as ``''``.
+
+    Selected columns restrict FROM to tables that have them all, and WHERE
+    columns must belong to the chosen table.
+    """
+    def __init__(self, schema: Dict[str, List[str]]):
+        self.schema = schema
+        self.columns = sorted({c for columns in schema.values() for c in columns})
+
+    def _options(self, state: int, selected: Tuple[str, ...], table: str):
+        """Yield (terminal, next state, selected columns, table) for a state."""
+        if state == START:
+            yield " SELECT", SELECT_FIRST, selected, table
+        elif state == SELECT_FIRST:
+            yield " *", SELECT_STAR, selected, table
+            for column in self.columns:
+                yield f" {column}", SELECT_COLUMN, selected + (column,), table
+        elif state == SELECT_NEXT:
+            for column in self.columns:
+                yield f" {column}", SELECT_COLUMN, selected + (column,), table
+        elif state == SELECT_COLUMN:
+            yield ",", SELECT_NEXT, selected, table
+            yield " FROM", FROM, selected, table
+        elif state == SELECT_STAR:
+            yield " FROM", FROM, selected, table
+        elif state == FROM:
+            for name, columns in self.schema.items():
+                if set(selected) <= set(columns):
+                    yield f" {name}", TABLE, selected, name
+        elif state == TABLE:
+            yield " WHERE", CONDITION, selected, table
+            yield ";", END, selected, table
+        elif state == CONDITION:
+            for column in self.schema[table]:
+                yield f" {column}", CONDITION_COLUMN, selected, table
+        elif state == CONDITION_COLUMN:
+            yield " =", OPERATOR, selected, table
+            yield " LIKE", OPERATOR, selected, table
+        elif state == OPERATOR:
+            yield " '", LITERAL, selected, table
+        elif state == CONDITION_DONE:
+            yield " AND", CONDITION, selected, table
+            yield " OR", CONDITION, selected, table
+            yield ";", END, selected, table
+
+    def frontier(self, text: str, state: int = START, selected: Tuple[str, ...] = (), table: str = "") -> list:
+        """Get what may follow ``text``, which must be a valid prefix.
+
+        Returns a list of ``("terminal", rest)`` (the unfinished remainder of a
+        terminal), ``("literal", nonempty)`` (inside a quoted literal),
+        ``("escape",)`` (after a quote that may be the first of ``''``) and
+        ``("end",)`` items; an empty list means ``text`` is not a valid prefix.
+        """
+        if state == END:
+            return [("end",)] if not text else []
+        if state == LITERAL:
+            start = 0
+            while True:
+                quote = text.find("'", start)
+                if quote == -1:
+                    return [("literal", bool(text))]
+                if quote == len(text) - 1:
+                    # Either the closing quote or the first of an escaped ''
+                    return [("escape",)] + (self.frontier("", CONDITION_DONE, selected, table) if quote else [])
+                if text[quote + 1] != "'":
+                    break
+                start = quote + 2
+            if quote == 0:
+                return []
+            return self.frontier(text[quote + 1:], CONDITION_DONE, selected, table)
+
+        results = []
+        for terminal, next_state, next_selected, next_table in self._options(state, selected, table):
+            if text.startswith(terminal):
+                results += self.frontier(text[len(terminal):], next_state, next_selected, next_table)
+            elif terminal.startswith(text):
+                results.append(("terminal", terminal[len(text):]))
+        return results
+
+class SQLConstraint:
+    """``prefix_allowed_tokens_fn`` that keeps generation inside an SQLGrammar.
+
+    At every step only tokens that extend the decoded text to a valid
+    prefix of the grammar are allowed, and EOS only after the closing ``;``.
+    """
+    def __init__(self, tokenizer, schema: Dict[str, List[str]], cache_size: int = 4096):
+        self.grammar = SQLGrammar(schema)
+        self.eos_token_id = tokenizer.eos_token_id
+        self.cache_size = cache_size
+        special = set(tokenizer.all_special_ids)
+        self.piece_text: Dict[int, str] = {}
+        self.by_text: Dict[str, List[int]] = {}
+        self.literal_ids: List[int] = []        # no quote: the literal continues
+        self.closing_ids: List[int] = []        # text then a final quote: closes a non-empty literal
+        self.escape_ids: List[int] = []         # a quote then text: completes an escaped ''
+        for token_id, piece in enumerate(tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))):
+            if token_id in special or piece is None:
+                continue
+            text = piece.replace("▁", " ")
+            self.piece_text[token_id] = text
+            self.by_text.setdefault(text, []).append(token_id)
+            if "'" not in text:
+                self.literal_ids.append(token_id)
+            elif text.index("'") == len(text) - 1 and not text[:-1].endswith(" "):
+                self.closing_ids.append(token_id)
+            if text.startswith("'") and "'" not in text[1:]:
+                self.escape_ids.append(token_id)
+        # A literal may not start with whitespace or be empty
+        self.literal_start_ids = [t for t in self.literal_ids if not self.piece_text[t].startswith(" ")]
+        self.closing_start_ids = [t for t in self.closing_ids
+                                  if self.piece_text[t] != "'" and not self.piece_text[t].startswith(" ")]
+        self._allowed_cache: Dict[str, List[int]] = {}
+
+    def decode(self, token_ids) -> str:
+        """Concatenate token texts the way the grammar sees them."""
+        return "".join(self.piece_text.get(int(t), "") for t in token_ids)
+
+    def allowed_tokens(self, text: str) -> List[int]:
+        """Get the token ids that may follow the decoded text."""
+        allowed = self._allowed_cache.get(text)
+        if allowed is not None:
+            return allowed
+        ids = set()
+        for item in self.grammar.frontier(text):
+            if item[0] == "terminal":
+                rest = item[1]
+                for k in range(1, len(rest) + 1):
+                    ids.update(self.by_text.get(rest[:k], ()))
+            elif item[0] == "literal":
+                if item[1]:
+                    ids.update(self.literal_ids)
+                    ids.update(self.closing_ids)
+                else:
+                    ids.update(self.literal_start_ids)
+                    ids.update(self.closing_start_ids)
+            elif item[0] == "escape":
+                ids.update(self.escape_ids)
+            else:
+                ids.add(self.eos_token_id)
+        # Never leave a step with nothing allowed; ending is always safe
+        allowed = sorted(ids) or [self.eos_token_id]
+        if len(self._allowed_cache) < self.cache_size:
+            self._allowed_cache[text] = allowed
+        return allowed
+
+    def __call__(self, batch_id: int, input_ids) -> List[int]:
+        # input_ids starts with the decoder start token, which decodes to ""
+        return self.allowed_tokens(self.decode(input_ids.tolist()))
+
+@functools.lru_cache(maxsize=8)
+def _cached_constraint(tokenizer, schema_items: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> SQLConstraint:
+    logger.info(f"Building SQL decoding constraint for {len(schema_items)} tables")
+    return SQLConstraint(tokenizer, {table: list(columns) for table, columns in schema_items})
+
+def get_sql_constraint(tokenizer, schema: Dict[str, List[str]]) -> SQLConstraint:
+    """Get the decoding constraint for a tokenizer and schema, building it once."""
+    return _cached_constraint(tokenizer, tuple((t, tuple(c)) for t, c in sorted(schema.items())))
+
+class StatementStoppingCriteria(StoppingCriteria):
+    """Stop generating once every sequence has finished a statement.
+
+    A sequence is finished when it has emitted EOS or a ``;`` outside a
+    quoted literal, so decoding does not run on to ``max_new_tokens`` when
+    the model fails to emit EOS right after the SQL.
+    """
+    def __init__(self, decode: Callable[[List[int]], str], eos_token_id: int):
+        self.decode = decode
+        self.eos_token_id = eos_token_id
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return all(self.eos_token_id in ids or statement_end(self.decode(ids)) != -1
+                   for ids in input_ids.tolist())
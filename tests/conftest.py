@@ -0,0 +1,74 @@
+import os
+import random
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+DEPARTMENTS = [
+    ("Sales", "John Smith"),
+    ("Marketing", "Jane Doe"),
+    ("Engineering", "Bob Wilson"),
+    ("HR", "Sarah Johnson"),
+    ("Finance", "Mike Brown"),
+]
+
+# Words the tiny tokenizer is trained on: the prompt, the schema and SQL
+WORDS = ("Convert to simple SQL Use table with columns Examples Question Current question SELECT FROM WHERE "
+         "AND OR LIKE COUNT ORDER BY Departments Name Manager Who manages Show all departments List department "
+         "names Find manager of is the which does manage").split()
+
+@pytest.fixture(scope="session")
+def db_path(tmp_path_factory) -> str:
+    """A Departments database with the rows setup_db.py creates."""
+    path = str(tmp_path_factory.mktemp("db") / "database.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Departments (Name TEXT PRIMARY KEY, Manager TEXT NOT NULL)")
+    conn.executemany("INSERT INTO Departments (Name, Manager) VALUES (?, ?)", DEPARTMENTS)
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture(scope="session")
+def tiny_model_name(tmp_path_factory) -> str:
+    """A randomly initialized two-layer T5 with its own small vocabulary, saved to a local directory.
+
+    Its output is nonsense, but it runs every code path of the real model in well under a second.
+    """
+    spm = pytest.importorskip("sentencepiece")
+    import torch
+    from transformers import T5Config, T5ForConditionalGeneration, T5Tokenizer, T5TokenizerFast
+
+    model_dir = tmp_path_factory.mktemp("tiny_t5")
+    rng = random.Random(0)
+    corpus = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(2000)]
+    corpus += [f"'{name}' '{manager}'" for name, manager in DEPARTMENTS]
+    corpus += ["abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ 0123456789 ' ; * = , ( ) . ? : - _ !"] * 50
+    (model_dir / "corpus.txt").write_text("\n".join(corpus))
+    spm.SentencePieceTrainer.train(input=str(model_dir / "corpus.txt"), model_prefix=str(model_dir / "spiece"),
+                                   vocab_size=140, pad_id=0, eos_id=1, unk_id=2, bos_id=-1,
+                                   character_coverage=1.0)
+    T5Tokenizer(str(model_dir / "spiece.model"), extra_ids=0).save_pretrained(str(model_dir))
+    tokenizer = T5TokenizerFast.from_pretrained(str(model_dir))
+    tokenizer.save_pretrained(str(model_dir))
+    torch.manual_seed(0)
+    model = T5ForConditionalGeneration(T5Config(
+        vocab_size=len(tokenizer), d_model=32, d_kv=8, d_ff=64, num_layers=2, num_decoder_layers=2, num_heads=4,
+        decoder_start_token_id=0, pad_token_id=0, eos_token_id=1, feed_forward_proj="gated-gelu",
+        tie_word_embeddings=False))
+    model.save_pretrained(str(model_dir))
+    return str(model_dir)
+
+@pytest.fixture(scope="session", autouse=True)
+def settings(db_path, tmp_path_factory):
+    """Point every file the app writes at a temporary directory, and skip host calibration."""
+    state = tmp_path_factory.mktemp("state")
+    config.DB_PATH = db_path
+    config.ONNX_DIR = str(state / "onnx_models")
+    config.CACHE_PATH = str(state / "sql_cache.db")
+    config.PROFILE_PATH = str(state / "host_profile.json")
+    config.AUTOTUNE = False
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from admission import Busy, FairScheduler, TokenBucket
+
+def test_token_bucket_allows_a_burst_then_waits():
+    bucket = TokenBucket(rate=1, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert 0 < bucket.take() <= 1
+
+def test_rate_limit_rejects_only_that_session():
+    scheduler = FairScheduler(concurrency=1, rate=0.001, burst=1)
+    assert scheduler.run("a", lambda: 1) == 1
+    with pytest.raises(Busy) as e:
+        scheduler.run("a", lambda: 2)
+    assert e.value.reason == "rate limit" and e.value.session == "a"
+    assert scheduler.run("b", lambda: 3) == 3
+
+def test_full_queue_rejects():
+    scheduler = FairScheduler(concurrency=1, max_queue=1, burst=10)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(10)
+        return "done"
+
+    running = scheduler.submit("a", block)
+    assert started.wait(10)
+    queued = scheduler.submit("b", lambda: "queued")
+    with pytest.raises(Busy) as e:
+        scheduler.submit("c", lambda: "rejected")
+    assert e.value.reason == "queue full" and e.value.session == "c"
+    release.set()
+    assert running.result(10) == "done" and queued.result(10) == "queued"
+    assert scheduler.stats()["rejected_queue"] == 1
+
+def test_failure_reaches_the_caller():
+    scheduler = FairScheduler(concurrency=1)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        scheduler.run("a", fail)
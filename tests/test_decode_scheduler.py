@@ -0,0 +1,41 @@
+import pytest
+
+from app import load_model
+from decode_scheduler import DecodeScheduler
+from prompt import get_prompt_encoder
+
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+]
+
+@pytest.fixture
+def scheduler(tiny_model_name):
+    engine = load_model("torch", draft_model="", model_name=tiny_model_name)
+    prompts, _ = get_prompt_encoder(engine.tokenizer).encode_with_lengths(QUESTIONS)
+    return DecodeScheduler(engine.model), prompts
+
+def test_failing_callback_only_fails_its_own_request(scheduler):
+    scheduler, prompts = scheduler
+    expected = [future.result(timeout=60) for future in [scheduler.submit(p, 12) for p in prompts]]
+
+    def broken_allowed_tokens(batch_id, ids):
+        if len(ids) > 3:
+            raise RuntimeError("broken constraint")
+        return list(range(scheduler.config.vocab_size))
+
+    def broken_stop(ids):
+        raise RuntimeError("broken stop")
+
+    futures = [scheduler.submit(prompts[0], 12),
+               scheduler.submit(prompts[1], 12, broken_allowed_tokens),
+               scheduler.submit(prompts[2], 12, stop=broken_stop)]
+    assert futures[0].result(timeout=60) == expected[0]
+    with pytest.raises(RuntimeError, match="broken constraint"):
+        futures[1].result(timeout=60)
+    with pytest.raises(RuntimeError, match="broken stop"):
+        futures[2].result(timeout=60)
+    assert scheduler.stats()["failed"] == 2
+    # The scheduler keeps serving afterwards
+    assert scheduler.submit(prompts[2], 12).result(timeout=60) == expected[2]
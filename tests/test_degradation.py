@@ -0,0 +1,39 @@
+import pytest
+
+import degradation
+from degradation import BASE, CACHE_ONLY, SMALL, DegradationRouter
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(degradation.time, "monotonic", lambda: now[0])
+    return now
+
+def make_router(queue_depth=0, has_small=False):
+    depth = [queue_depth]
+    router = DegradationRouter(slo_ms=100, queue_depth=lambda: depth[0], max_queue_depth=10,
+                               has_small=lambda: has_small, cooldown_s=10)
+    return router, depth
+
+def test_single_slow_user_keeps_the_base_model(clock):
+    router, _ = make_router()
+    for _ in range(5):
+        router.record(BASE, 1.0, True)
+        assert router.choose() == BASE
+        clock[0] += 5
+
+def test_slow_answers_step_down_to_the_small_model_only(clock):
+    router, _ = make_router(has_small=True)
+    for _ in range(5):
+        router.record(BASE, 1.0, True)
+        router.choose()
+        clock[0] += 5
+    assert router.level == SMALL
+
+def test_queue_pressure_steps_down_to_cache_only_and_recovers(clock):
+    router, depth = make_router(queue_depth=20)
+    assert router.choose() == CACHE_ONLY
+    depth[0] = 0
+    assert router.choose() == CACHE_ONLY
+    clock[0] += 10
+    assert router.choose() == BASE
@@ -0,0 +1,86 @@
+import socket
+import threading
+
+import pytest
+
+import app
+import config
+from inference_client import InferenceClient, ServerNotReady
+from inference_server import create_server
+
+QUESTIONS = [
+    "How many departments are there?",
+    "Which managers have a J in their name?",
+    "Who manages Sales?",
+]
+
+@pytest.fixture
+def serve(tiny_model_name, monkeypatch):
+    """Start inference servers on the tiny model; each is shut down after the test."""
+    monkeypatch.setattr(config, "MODEL_NAME", tiny_model_name)
+    monkeypatch.setattr(config, "DRAFT_MODEL", "")
+    servers = []
+
+    def start(**kwargs):
+        server = create_server(backend="torch", **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def check_endpoints(server, url: str):
+    client = InferenceClient(url)
+    assert client.health()
+    assert server.loader.get(timeout=120) is not None
+    assert client.readiness()["ready"]
+
+    results = client.generate(QUESTIONS, "greedy")
+    assert len(results) == len(QUESTIONS)
+    for result in results:
+        assert set(result) == {"sql", "error", "cacheable", "tier", "valid"}
+        assert result["sql"] or result["error"]
+
+def test_tcp_endpoints(serve):
+    server = serve(host="127.0.0.1", port=0)
+    check_endpoints(server, f"http://127.0.0.1:{server.server_address[1]}")
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix domain sockets are not available")
+def test_unix_socket_endpoints(serve, tmp_path):
+    socket_path = str(tmp_path / "nl2sql.sock")
+    server = serve(socket_path=socket_path)
+    check_endpoints(server, f"unix://{socket_path}")
+
+def test_not_ready_while_loading(serve, monkeypatch):
+    loaded = threading.Event()
+    load_default_model = app.load_default_model
+
+    def slow_load(progress, backend):
+        loaded.wait(60)
+        return load_default_model(progress, backend)
+
+    monkeypatch.setattr(app, "load_default_model", slow_load)
+    server = serve(host="127.0.0.1", port=0)
+    client = InferenceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        assert client.health()
+        status, readiness = client._request("GET", "/readyz")
+        assert status == 503 and not readiness["ready"]
+        with pytest.raises(ServerNotReady):
+            client.generate(QUESTIONS[:1], "greedy")
+    finally:
+        loaded.set()
+    assert server.loader.get(timeout=120) is not None
+    assert client._request("GET", "/readyz")[0] == 200
+
+def test_bad_requests(serve):
+    server = serve(host="127.0.0.1", port=0)
+    server.loader.get(timeout=120)
+    client = InferenceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    assert client._request("POST", "/generate", {"questions": "not a list"})[0] == 400
+    assert client._request("POST", "/generate", {})[0] == 400
+    assert client._request("GET", "/nowhere")[0] == 404
+    assert client._request("GET", "/metrics")[0] == 200
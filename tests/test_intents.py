@@ -0,0 +1,33 @@
+from intents import IntentMatcher, intent_slots
+
+ENTITIES = {
+    "departments_name": ["Sales", "Marketing", "O'Brien Ops"],
+    "departments_manager": ["John Smith"],
+}
+SCHEMA = {"Departments": ["Name", "Manager"]}
+
+def make_matcher(schema=SCHEMA):
+    return IntentMatcher(lambda: ENTITIES, lambda: schema)
+
+def test_intent_slots():
+    assert intent_slots() == ["departments_name", "departments_manager"]
+
+def test_slot_value_is_canonicalized():
+    match = make_matcher().match("who is the manager of the  sales department?")
+    assert match.intent == "manager_of_department"
+    assert match.sql == "SELECT Manager FROM Departments WHERE Name = 'Sales';"
+
+def test_slot_value_with_a_quote():
+    assert make_matcher().match("Who manages O'Brien Ops").sql == (
+        "SELECT Manager FROM Departments WHERE Name = 'O''Brien Ops';")
+
+def test_unknown_slot_value_is_rejected():
+    matcher = make_matcher()
+    assert matcher.match("Who manages Narnia?") is None
+    assert matcher.match("Which department does Jane Doe manage?") is None
+    assert matcher.stats() == {"hits": 0, "misses": 2}
+
+def test_missing_table_falls_through():
+    matcher = make_matcher({"Teams": ["Name"]})
+    assert matcher.match("Show all departments") is None
+    assert matcher.match("Who manages Sales?") is None
@@ -0,0 +1,55 @@
+import logging
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+from transformers import AutoTokenizer
+
+from app import load_model
+from onnx_backend import OnnxT5ForConditionalGeneration, OnnxText2TextPipeline, export_onnx_model
+from prompt import get_prompt_encoder
+
+# Fixed question set; greedy decoding so both backends are deterministic
+QUESTIONS = [
+    "Show all departments",
+    "Who manages Sales?",
+    "List all department names",
+    "Who is the manager of Marketing?",
+    "Find manager of Engineering",
+    "Which department does Jane Doe manage?",
+    "Show the manager of HR",
+    "List departments managed by Mike Brown",
+]
+
+def generate_greedy(model, questions):
+    """Generate text for each question with greedy decoding."""
+    inputs = get_prompt_encoder(model.tokenizer).encode_batch(questions)
+    output_ids = model.generate(**inputs, do_sample=False, max_length=32)
+    return model.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+def test_fp32_onnx_matches_torch(tiny_model_name, tmp_path):
+    # Without quantization the graphs compute what torch does, so greedy output is identical
+    export_onnx_model(tiny_model_name, str(tmp_path), quantize=False)
+    onnx_model = OnnxText2TextPipeline(OnnxT5ForConditionalGeneration(str(tmp_path)),
+                                       AutoTokenizer.from_pretrained(str(tmp_path)))
+    torch_model = load_model("torch", draft_model="", model_name=tiny_model_name)
+    assert generate_greedy(onnx_model, QUESTIONS) == generate_greedy(torch_model, QUESTIONS)
+
+def test_int8_onnx_backend_exports_then_reuses_artifacts(tiny_model_name, caplog):
+    first = generate_greedy(load_model("onnx", draft_model="", model_name=tiny_model_name), QUESTIONS)
+    load_model.clear()
+    with caplog.at_level(logging.INFO, logger="onnx_backend"):
+        second = generate_greedy(load_model("onnx", draft_model="", model_name=tiny_model_name), QUESTIONS)
+    assert "Reusing ONNX artifacts" in caplog.text
+    assert second == first and len(first) == len(QUESTIONS)
+
+def test_onnx_sampling_is_seeded_and_beams_raise(tiny_model_name):
+    model = load_model("onnx", draft_model="", model_name=tiny_model_name)
+    inputs = get_prompt_encoder(model.tokenizer).encode_batch(QUESTIONS)
+    sampled = model.generate(**inputs, do_sample=True, top_p=0.8, max_length=16)
+    assert sampled.tolist() == model.generate(**inputs, do_sample=True, top_p=0.8, max_length=16).tolist()
+    with pytest.raises(ValueError):
+        model.generate(**inputs, num_beams=3)
+    with pytest.raises(ValueError):
+        model.generate(**inputs, num_return_sequences=2)
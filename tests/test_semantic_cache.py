@@ -0,0 +1,50 @@
+from semantic_cache import SemanticCache, compile_entities, load_entities, mask_entities, rebind_sql
+
+ENTITIES = {
+    "departments_name": ["Sales", "Sales Ops", "Marketing", "HR"],
+    "departments_manager": ["John Smith", "Jane Doe"],
+}
+
+def test_load_entities_limits_slots(db_path):
+    entities = load_entities(db_path, slots=["departments_name"])
+    assert list(entities) == ["departments_name"]
+    assert "Sales" in entities["departments_name"]
+
+def test_mask_prefers_the_longest_value():
+    masked, bindings = mask_entities("Does sales ops report to Sales?", compile_entities(ENTITIES))
+    assert masked == "Does __departments_name__ report to __departments_name__?"
+    assert bindings == [("departments_name", "Sales Ops"), ("departments_name", "Sales")]
+
+def test_rebind_swapped_literals():
+    sql = "SELECT * FROM Departments WHERE Name = 'Sales' OR Name = 'HR';"
+    old = [("departments_name", "Sales"), ("departments_name", "HR")]
+    new = [("departments_name", "HR"), ("departments_name", "Sales")]
+    assert rebind_sql(sql, old, new) == "SELECT * FROM Departments WHERE Name = 'HR' OR Name = 'Sales';"
+
+def test_rebind_overlapping_literals():
+    sql = "SELECT * FROM Departments WHERE Name = 'Sales Ops' OR Name = 'Sales';"
+    old = [("departments_name", "Sales Ops"), ("departments_name", "Sales")]
+    new = [("departments_name", "Marketing"), ("departments_name", "Sales Ops")]
+    assert rebind_sql(sql, old, new) == "SELECT * FROM Departments WHERE Name = 'Marketing' OR Name = 'Sales Ops';"
+
+def test_rebind_escapes_quotes():
+    sql = "SELECT Manager FROM Departments WHERE Name = 'Sales';"
+    assert rebind_sql(sql, [("departments_name", "Sales")], [("departments_name", "O'Brien")]) == (
+        "SELECT Manager FROM Departments WHERE Name = 'O''Brien';")
+
+def test_rebind_rejects_inexact_mappings():
+    sql = "SELECT * FROM Departments WHERE Name = 'Sales';"
+    # One old value bound to two new ones
+    assert rebind_sql(sql, [("departments_name", "Sales")] * 2,
+                      [("departments_name", "HR"), ("departments_name", "Marketing")]) is None
+    # An old value that is not a literal of the SQL
+    assert rebind_sql(sql, [("departments_name", "HR")], [("departments_name", "Marketing")]) is None
+
+def test_paraphrase_hit_rebinds_and_schema_change_clears():
+    fingerprint = ["v1"]
+    cache = SemanticCache(lambda: ENTITIES, fingerprint=lambda: fingerprint[0])
+    cache.put("Who manages Sales?", "SELECT Manager FROM Departments WHERE Name = 'Sales';")
+    assert cache.get("who manages marketing") == "SELECT Manager FROM Departments WHERE Name = 'Marketing';"
+    fingerprint[0] = "v2"
+    assert cache.get("who manages marketing") is None
+    assert cache.stats()["size"] == 0
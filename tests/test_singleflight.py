@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+FOLLOWERS = 4
+
+def run_concurrently(flight: SingleFlight, fn):
+    """Start a leader blocked in ``fn`` and FOLLOWERS callers for the same key; returns their outcomes."""
+    release = threading.Event()
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(flight.do("key", lambda: fn(release)))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(FOLLOWERS + 1)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 10
+    while flight.stats()["coalesced"] < FOLLOWERS and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight()
+    calls = []
+
+    def compute(release):
+        calls.append(1)
+        release.wait(10)
+        return "sql"
+
+    assert run_concurrently(flight, compute) == ["sql"] * (FOLLOWERS + 1)
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "coalesced": FOLLOWERS, "in_flight": 0}
+
+def test_followers_share_the_leaders_exception():
+    flight = SingleFlight()
+
+    def fail(release):
+        release.wait(10)
+        raise RuntimeError("boom")
+
+    outcomes = run_concurrently(flight, fail)
+    assert len(outcomes) == FOLLOWERS + 1
+    assert all(isinstance(e, RuntimeError) and str(e) == "boom" for e in outcomes)
+
+def test_finished_calls_run_again():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.stats()["executed"] == 2
+
+def test_keys_do_not_share():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    with pytest.raises(KeyError):
+        flight.do("b", lambda: {}["missing"])
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,44 @@
+import sqlite3
+
+from sql_cache import SQLCache, normalize_sql, schema_fingerprint
+
+SQL = "SELECT Manager FROM Departments WHERE Name = 'Sales';"
+
+def test_paraphrases_share_an_entry(tmp_path):
+    cache = SQLCache(str(tmp_path / "cache.db"), lambda: "schema")
+    cache.put("Who manages Sales?", SQL)
+    assert cache.get("who runs  the sales") == SQL
+    assert cache.stats()["hits"] == 1
+
+def test_schema_change_invalidates_both_tiers(tmp_path):
+    db = str(tmp_path / "database.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE Departments (Name TEXT, Manager TEXT)")
+    conn.commit()
+    path = str(tmp_path / "cache.db")
+    cache = SQLCache(path, lambda: schema_fingerprint(db, "prompt"))
+    cache.put("Who manages Sales?", SQL)
+    assert cache.get("Who manages Sales?") == SQL
+
+    conn.execute("ALTER TABLE Departments ADD COLUMN Budget INTEGER")
+    conn.commit()
+    conn.close()
+    assert cache.get("Who manages Sales?") is None
+    # Another process sharing the file sees the same invalidation
+    assert SQLCache(path, lambda: schema_fingerprint(db, "prompt")).get("Who manages Sales?") is None
+
+def test_prompt_change_invalidates(tmp_path):
+    fingerprint = ["v1"]
+    cache = SQLCache(str(tmp_path / "cache.db"), lambda: fingerprint[0])
+    cache.put("Who manages Sales?", SQL)
+    fingerprint[0] = "v2"
+    assert cache.get("Who manages Sales?") is None
+
+def test_expired_entries_miss(tmp_path):
+    cache = SQLCache(str(tmp_path / "cache.db"), lambda: "schema", ttl=0)
+    cache.put("Who manages Sales?", SQL)
+    assert cache.get("Who manages Sales?") is None
+
+def test_normalize_sql_ignores_spacing_outside_literals():
+    assert normalize_sql("SELECT  *\nFROM t WHERE a = 'x';;") == normalize_sql("SELECT * FROM t WHERE a = 'x'")
+    assert normalize_sql("SELECT * FROM t WHERE a = 'x  y'") != normalize_sql("SELECT * FROM t WHERE a = 'x y'")